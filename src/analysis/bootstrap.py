@@ -0,0 +1,303 @@
+"""分析共通の bootstrap（リサンプリングをまとめて行列演算で計算する）
+
+各リサンプルを「元の行が何回選ばれたか」の多項分布の件数行列 C（リサンプル数 × 行数）
+で表すと、列ごとの平均は C @ X / n の1回の行列積で求まる。統計量はこの平均
+（例: 対応のある2列の差）の関数として与える。C はメモリ上限に収まる件数ずつ
+作って捨てる。
+
+リサンプルの行は rng.integers(0, n, size=n) を1回ずつ引いた場合と同じ乱数列から
+作るため、同じ rng なら1件ずつループした結果と一致し、チャンクの大きさにもよらない。
+層別（strata）の場合は層ごとに層内でリサンプルし、各層の件数は固定する。
+区間は percentile と BCa（jackknife による加速度補正）を返せる。
+
+複数のグループ（predictor、入れ替えの向き、層など）の計算は `map_groups` で
+プロセスプールに分散する。各グループの乱数は (シード, グループのキー, 計算の種類) から
+SeedSequence の spawn_key で作る独立なストリームを使うため、結果はグループを処理する
+順番やプロセス数によらず一致する。
+"""
+
+import argparse
+import hashlib
+from collections.abc import Callable, Hashable
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from typing import Any, Final
+
+import numpy as np
+from scipy import stats
+
+from core.ingest import default_workers
+
+N_BOOTSTRAP: Final = 10_000
+N_PERMUTATIONS: Final = 10_000
+CONFIDENCE: Final = 0.95
+CI_METHODS: Final = ("percentile", "bca")
+# 1チャンクで作る件数行列のセル数の上限（int64 で約32MB）
+MAX_CHUNK_CELLS: Final = 1 << 22
+
+# 列ごとの平均 (..., k) から統計量 (...) を求める関数
+Statistic = Callable[[np.ndarray], np.ndarray]
+
+
+def first_column(means: np.ndarray) -> np.ndarray:
+    return means[..., 0]
+
+
+def column_difference(means: np.ndarray) -> np.ndarray:
+    return means[..., 0] - means[..., 1]
+
+
+def resample_counts(n: int, n_resamples: int, rng: np.random.Generator) -> np.ndarray:
+    """n 行から復元抽出した n_resamples 回分の件数行列（n_resamples × n）を返す。"""
+    idx = rng.integers(0, n, size=(n_resamples, n))
+    offsets = (idx + np.arange(n_resamples)[:, None] * n).ravel()
+    return np.bincount(offsets, minlength=n_resamples * n).reshape(n_resamples, n)
+
+
+def resampled_sums(
+    values: np.ndarray,
+    rng: np.random.Generator,
+    n_resamples: int = N_BOOTSTRAP,
+    max_chunk_cells: int = MAX_CHUNK_CELLS,
+) -> np.ndarray:
+    """各リサンプルでの列ごとの合計（n_resamples × k）を返す。"""
+    n = len(values)
+    sums = np.empty((n_resamples, values.shape[1]))
+    chunk = max(1, max_chunk_cells // max(n, 1))
+    for start in range(0, n_resamples, chunk):
+        stop = min(start + chunk, n_resamples)
+        sums[start:stop] = resample_counts(n, stop - start, rng) @ values
+    return sums
+
+
+def resampled_means(
+    values: np.ndarray,
+    rng: np.random.Generator,
+    n_resamples: int = N_BOOTSTRAP,
+    strata: np.ndarray | None = None,
+) -> np.ndarray:
+    """各リサンプルでの列ごとの平均（n_resamples × k）を返す。
+
+    strata を渡すと、層ごとに層内の行だけからリサンプルする（層の順は値の昇順）。
+    """
+    values = np.asarray(values, dtype=float)
+    if values.ndim == 1:
+        values = values[:, None]
+    if strata is None:
+        return resampled_sums(values, rng, n_resamples) / len(values)
+    sums = np.zeros((n_resamples, values.shape[1]))
+    for stratum in np.unique(strata):
+        sums += resampled_sums(values[strata == stratum], rng, n_resamples)
+    return sums / len(values)
+
+
+def jackknife(values: np.ndarray, statistic: Statistic) -> np.ndarray:
+    """1行ずつ除いた統計量（n 件）を返す。"""
+    values = np.asarray(values, dtype=float)
+    if values.ndim == 1:
+        values = values[:, None]
+    n = len(values)
+    return statistic((values.sum(axis=0) - values) / (n - 1))
+
+
+def percentile_interval(
+    replicates: np.ndarray, confidence: float = CONFIDENCE
+) -> tuple[float, float]:
+    alpha = (1 - confidence) / 2
+    lower, upper = np.percentile(replicates, [100 * alpha, 100 * (1 - alpha)])
+    return float(lower), float(upper)
+
+
+def bca_interval(
+    replicates: np.ndarray,
+    observed: float,
+    jackknife_values: np.ndarray,
+    confidence: float = CONFIDENCE,
+) -> tuple[float, float]:
+    """BCa 区間を返す（補正量が求まらない場合は percentile 区間）。"""
+    below = np.mean(replicates < observed)
+    deviations = jackknife_values.mean() - jackknife_values
+    denominator = 6 * np.sum(deviations**2) ** 1.5
+    if not 0 < below < 1 or denominator == 0:
+        return percentile_interval(replicates, confidence)
+    z0 = stats.norm.ppf(below)
+    acceleration = np.sum(deviations**3) / denominator
+    alpha = (1 - confidence) / 2
+    z = stats.norm.ppf([alpha, 1 - alpha])
+    levels = stats.norm.cdf(z0 + (z0 + z) / (1 - acceleration * (z0 + z)))
+    lower, upper = np.percentile(replicates, 100 * levels)
+    return float(lower), float(upper)
+
+
+def bootstrap_ci(
+    values: np.ndarray,
+    rng: np.random.Generator,
+    statistic: Statistic = first_column,
+    *,
+    n_resamples: int = N_BOOTSTRAP,
+    strata: np.ndarray | None = None,
+    method: str = "percentile",
+    confidence: float = CONFIDENCE,
+) -> tuple[float, float, float]:
+    """列平均の関数である統計量の (観測値, 下限, 上限) を返す。
+
+    Args:
+        values: 行 = 観測単位、列 = 平均をとる量（1次元なら1列）
+        rng: リサンプルに使う乱数生成器
+        statistic: 列ごとの平均 (..., k) から統計量を求める関数
+        n_resamples: リサンプル数
+        strata: 行ごとの層（層内でリサンプルする）
+        method: "percentile" または "bca"
+        confidence: 信頼水準
+    """
+    if method not in CI_METHODS:
+        raise ValueError(f"Unknown CI method: {method}. Available: {CI_METHODS}")
+    values = np.asarray(values, dtype=float)
+    if values.ndim == 1:
+        values = values[:, None]
+    observed = float(statistic(values.mean(axis=0)))
+    replicates = statistic(resampled_means(values, rng, n_resamples, strata))
+    if method == "bca" and len(values) > 1:
+        lower, upper = bca_interval(
+            replicates, observed, jackknife(values, statistic), confidence
+        )
+    else:
+        lower, upper = percentile_interval(replicates, confidence)
+    return observed, lower, upper
+
+
+def paired_difference_ci(
+    a: np.ndarray,
+    b: np.ndarray,
+    rng: np.random.Generator,
+    **kwargs: Any,
+) -> tuple[float, float, float]:
+    """対応のある2系列の平均の差 mean(a) - mean(b) の (観測値, 下限, 上限)。"""
+    return bootstrap_ci(np.column_stack([a, b]), rng, column_difference, **kwargs)
+
+
+def unpaired_difference_ci(
+    a: np.ndarray,
+    b: np.ndarray,
+    rng: np.random.Generator,
+    **kwargs: Any,
+) -> tuple[float, float, float]:
+    """独立な2群の平均の差 mean(a) - mean(b) の (観測値, 下限, 上限)。
+
+    各群の件数を固定して群ごとにリサンプルする（群を層とした層別 bootstrap）。
+    """
+    n_a, n_b = len(a), len(b)
+    # 列: a の値, a の指示変数, b の値, b の指示変数
+    # （群の平均 = 値の列の平均 / 指示変数の列の平均）
+    values = np.zeros((n_a + n_b, 4))
+    values[:n_a, 0] = a
+    values[:n_a, 1] = 1
+    values[n_a:, 2] = b
+    values[n_a:, 3] = 1
+    group = np.repeat([0, 1], [n_a, n_b])
+
+    def difference(means: np.ndarray) -> np.ndarray:
+        return means[..., 0] / means[..., 1] - means[..., 2] / means[..., 3]
+
+    return bootstrap_ci(values, rng, difference, strata=group, **kwargs)
+
+
+def paired_permutation_test(
+    a: np.ndarray,
+    b: np.ndarray,
+    rng: np.random.Generator,
+    *,
+    n_resamples: int = N_PERMUTATIONS,
+    max_chunk_cells: int = MAX_CHUNK_CELLS,
+) -> float:
+    """対応のある差 mean(a) - mean(b) = 0 の両側 permutation 検定の p 値。
+
+    ペアごとに a と b を入れ替える（差の符号を反転する）。
+    """
+    diffs = np.asarray(a, dtype=float) - np.asarray(b, dtype=float)
+    n = len(diffs)
+    observed = abs(diffs.mean())
+    # 浮動小数点の丸めで観測値と等しい並べ替えを取りこぼさないための許容幅
+    tolerance = 1e-12 * max(1.0, observed)
+    n_extreme = 0
+    chunk = max(1, max_chunk_cells // max(n, 1))
+    for start in range(0, n_resamples, chunk):
+        size = min(chunk, n_resamples - start)
+        signs = rng.integers(0, 2, size=(size, n), dtype=np.int8) * 2 - 1
+        means = np.abs(signs @ diffs) / n
+        n_extreme += int(np.sum(means >= observed - tolerance))
+    return (n_extreme + 1) / (n_resamples + 1)
+
+
+def group_rng(seed: int, key: tuple, stream: str = "") -> np.random.Generator:
+    """グループのキー（と計算の種類）ごとに独立な乱数生成器を作る。
+
+    他のグループの有無や順番によらず、同じ (seed, key, stream) なら同じ乱数列になる。
+    """
+    words = tuple(
+        int.from_bytes(
+            hashlib.blake2b(repr(part).encode(), digest_size=8).digest(), "little"
+        )
+        for part in (*key, stream)
+    )
+    return np.random.default_rng(np.random.SeedSequence(seed, spawn_key=words))
+
+
+def _run_group(
+    item: tuple[tuple, dict[str, Any]],
+    func: Callable[..., Any],
+    seed: int,
+    common: dict[str, Any],
+) -> Any:
+    key, arguments = item
+    rng = group_rng(seed, key, func.__name__)
+    return func(rng=rng, **arguments, **common)
+
+
+def map_groups(
+    func: Callable[..., Any],
+    groups: dict[tuple[Hashable, ...], dict[str, Any]],
+    seed: int,
+    *,
+    workers: int | None = None,
+    **common: Any,
+) -> dict[tuple[Hashable, ...], Any]:
+    """グループごとに func(rng=..., **引数, **common) を実行し、キー → 結果を返す。
+
+    Args:
+        func: `paired_difference_ci` などのモジュールレベルの関数（プロセス間で渡す）
+        groups: グループのキー → そのグループの引数（配列など）
+        seed: 乱数シード（グループごとの乱数は `group_rng` で作る）
+        workers: プロセス数（既定: CPUコア数。1なら同じプロセスで実行）
+        common: 全グループに共通の引数（n_resamples, method など）
+    """
+    run = partial(_run_group, func=func, seed=seed, common=common)
+    items = list(groups.items())
+    workers = min(max(1, workers or default_workers()), len(items))
+    if workers <= 1:
+        results = [run(item) for item in items]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(run, items))
+    return {key: result for (key, _), result in zip(items, results, strict=True)}
+
+
+def add_bootstrap_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument(
+        "--n-bootstrap",
+        type=int,
+        default=N_BOOTSTRAP,
+        help=f"Number of bootstrap resamples (default: {N_BOOTSTRAP})",
+    )
+    parser.add_argument(
+        "--ci-method",
+        choices=CI_METHODS,
+        default="percentile",
+        help="Bootstrap interval method (default: percentile)",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=None,
+        help="Processes for per-group resampling (default: CPU count)",
+    )
@@ -5,7 +5,6 @@ predictor_modelごとに P(HIGH|Info+) - P(HIGH|Info-) の
 """
 
 import argparse
-import json
 import sys
 from pathlib import Path
 
@@ -13,43 +12,30 @@ import numpy as np
 import pandas as pd
 
 sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from analysis.bootstrap import (
+    N_BOOTSTRAP,
+    add_bootstrap_arguments,
+    map_groups,
+    paired_difference_ci,
+    paired_permutation_test,
+)
+from analysis.memo import add_memo_arguments
+from analysis.suite import Dataset, analysis_memo, load_datasets, write_tables
 
-N_BOOTSTRAP = 10_000
 RANDOM_SEED = 42
 
 
-def load_prediction_rows(predictions_dir: Path) -> list[dict]:
-    """predictions/{info_plus|info_minus}/.../*.json から結果を読み込む。"""
-    rows: list[dict] = []
-    for variant in ["info_plus", "info_minus"]:
-        variant_dir = predictions_dir / variant
-        if not variant_dir.exists():
-            continue
-        for json_file in variant_dir.glob("*/*/*.json"):
-            try:
-                with open(json_file, encoding="utf-8") as f:
-                    data = json.load(f)
-                condition = data["condition"]
-                rows.append(
-                    {
-                        "variant": variant,
-                        "predictor_model": condition["predictor_model_id"],
-                        "generator_model": condition["generator_model_id"],
-                        "source_unique_id": condition["source_unique_id"],
-                        "expected_judgment": condition["expected_judgment"],
-                        "predicted_judgment": data["predicted_judgment"],
-                        "is_high": data["predicted_judgment"] == "HIGH",
-                    }
-                )
-            except Exception:
-                continue
-    return rows
-
-
-def compute_p_high_delta(df: pd.DataFrame) -> pd.DataFrame:
-    """predictor_modelごとに P(HIGH|Info+) - P(HIGH|Info-) を算出する。"""
-    rng = np.random.default_rng(RANDOM_SEED)
-    rows = []
+def compute_p_high_delta(
+    df: pd.DataFrame,
+    n_resamples: int = N_BOOTSTRAP,
+    method: str = "percentile",
+    workers: int | None = None,
+) -> pd.DataFrame:
+    """predictor_modelごとに P(HIGH|Info+) - P(HIGH|Info-) を算出する。
+
+    p_value は対応のある permutation 検定（delta = 0）の両側 p 値。
+    """
+    groups: dict[tuple, dict[str, np.ndarray]] = {}
 
     for predictor in sorted(df["predictor_model"].unique()):
         df_pred = df[df["predictor_model"] == predictor]
@@ -80,39 +66,48 @@ def compute_p_high_delta(df: pd.DataFrame) -> pd.DataFrame:
         if not common_ids:
             continue
 
-        plus_arr = np.array([plus_map[uid] for uid in common_ids])
-        minus_arr = np.array([minus_map[uid] for uid in common_ids])
-
-        p_high_plus = float(plus_arr.mean())
-        p_high_minus = float(minus_arr.mean())
-        observed_delta = p_high_plus - p_high_minus
-
-        # Bootstrap CI
-        n = len(common_ids)
-        deltas = np.empty(N_BOOTSTRAP)
-        for i in range(N_BOOTSTRAP):
-            idx = rng.integers(0, n, size=n)
-            deltas[i] = plus_arr[idx].mean() - minus_arr[idx].mean()
-
-        ci_lower = float(np.percentile(deltas, 2.5))
-        ci_upper = float(np.percentile(deltas, 97.5))
+        groups[(predictor,)] = {
+            "a": np.array([plus_map[uid] for uid in common_ids]),
+            "b": np.array([minus_map[uid] for uid in common_ids]),
+        }
+
+    # Bootstrap CI and permutation test, one independent stream per predictor
+    intervals = map_groups(
+        paired_difference_ci,
+        groups,
+        RANDOM_SEED,
+        workers=workers,
+        n_resamples=n_resamples,
+        method=method,
+    )
+    p_values = map_groups(
+        paired_permutation_test,
+        groups,
+        RANDOM_SEED,
+        workers=workers,
+        n_resamples=n_resamples,
+    )
 
+    rows = []
+    for key, (observed_delta, ci_lower, ci_upper) in intervals.items():
+        plus_arr, minus_arr = groups[key]["a"], groups[key]["b"]
         rows.append(
             {
-                "predictor_model": predictor,
-                "p_high_info_plus": round(p_high_plus, 4),
-                "p_high_info_minus": round(p_high_minus, 4),
+                "predictor_model": key[0],
+                "p_high_info_plus": round(float(plus_arr.mean()), 4),
+                "p_high_info_minus": round(float(minus_arr.mean()), 4),
                 "delta": round(observed_delta, 4),
                 "ci_lower": round(ci_lower, 4),
                 "ci_upper": round(ci_upper, 4),
-                "n_pairs": n,
+                "n_pairs": len(plus_arr),
+                "p_value": round(p_values[key], 4),
             }
         )
 
     return pd.DataFrame(rows)
 
 
-def parse_args() -> argparse.Namespace:
+def build_parser() -> argparse.ArgumentParser:
     parser = argparse.ArgumentParser(
         description="Experiment A analysis: Info+/Info- P(HIGH) delta"
     )
@@ -128,31 +123,59 @@ def parse_args() -> argparse.Namespace:
         default=Path.cwd() / "output" / "analysis",
         help="Directory to save analysis CSVs",
     )
-    return parser.parse_args()
+    add_bootstrap_arguments(parser)
+    add_memo_arguments(parser)
+    return parser
+
+
+def parse_args() -> argparse.Namespace:
+    return build_parser().parse_args()
+
+
+def datasets(args: argparse.Namespace) -> dict[str, Dataset]:
+    return {
+        "predictions": ("experiment_a", args.experiment_a_output_dir / "predictions")
+    }
+
+
+def output_names(args: argparse.Namespace) -> list[str]:
+    return ["experiment_a_p_high_delta.csv"]
+
+
+def analyze(
+    args: argparse.Namespace, data: dict[str, pd.DataFrame]
+) -> dict[str, pd.DataFrame]:
+    """読み込んだ予測結果から出力CSVの表（ファイル名 → 表）を作る。"""
+    df = data["predictions"]
+    print(f"Loaded {len(df)} prediction rows")
+    if df.empty:
+        print("No data to analyze.")
+        return {}
+
+    delta_df = compute_p_high_delta(
+        df,
+        n_resamples=args.n_bootstrap,
+        method=args.ci_method,
+        workers=args.workers,
+    )
+    return {"experiment_a_p_high_delta.csv": delta_df}
 
 
 def main() -> None:
     args = parse_args()
     args.analysis_output_dir.mkdir(parents=True, exist_ok=True)
+    memo = analysis_memo(__file__, args, output_names(args), datasets(args))
 
     print("=== Experiment A Analysis ===")
-
-    predictions_dir = args.experiment_a_output_dir / "predictions"
-    raw_rows = load_prediction_rows(predictions_dir)
-    print(f"Loaded {len(raw_rows)} prediction rows")
-
-    if not raw_rows:
-        print("No data to analyze.")
+    if memo.skip(args.force):
         return
 
-    df = pd.DataFrame(raw_rows)
-
-    delta_df = compute_p_high_delta(df)
-    delta_path = args.analysis_output_dir / "experiment_a_p_high_delta.csv"
-    delta_df.to_csv(delta_path, index=False)
-    print(f"Saved: {delta_path}")
-    print("\n--- P(HIGH) Delta (Info+ - Info-) ---")
-    print(delta_df.to_string(index=False))
+    tables = analyze(args, load_datasets(datasets(args)))
+    write_tables(tables, args.analysis_output_dir)
+    memo.record()
+    if tables:
+        print("\n--- P(HIGH) Delta (Info+ - Info-) ---")
+        print(tables["experiment_a_p_high_delta.csv"].to_string(index=False))
 
 
 if __name__ == "__main__":
@@ -6,7 +6,6 @@
 """
 
 import argparse
-import json
 import sys
 from collections import Counter
 from pathlib import Path
@@ -16,40 +15,34 @@ import pandas as pd
 from sklearn.metrics import balanced_accuracy_score, f1_score
 
 sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from analysis.bootstrap import (
+    N_BOOTSTRAP,
+    add_bootstrap_arguments,
+    map_groups,
+    paired_difference_ci,
+    paired_permutation_test,
+)
+from analysis.memo import add_memo_arguments
+from analysis.suite import Dataset, analysis_memo, load_datasets, write_tables
 
-N_BOOTSTRAP = 10_000
 RANDOM_SEED = 42
 
 
-def load_result_rows(result_dir: Path) -> list[dict]:
-    """JSON結果ファイルからフラットな辞書リストを読み込む。"""
-    rows: list[dict] = []
-    for json_file in result_dir.glob("*/*/*/*.json"):
-        try:
-            with open(json_file, encoding="utf-8") as f:
-                data = json.load(f)
-            condition = data["condition"]
-            rows.append(
-                {
-                    "condition_type": condition["condition_type"],
-                    "generator_model": condition["generator_model_id"],
-                    "predictor_model": condition["predictor_model_id"],
-                    "expected_judgment": condition["expected_judgment"],
-                    "predicted_judgment": data["predicted_judgment"],
-                    "is_correct": bool(data["is_correct"]),
-                    "source_unique_id": condition.get("source_unique_id", ""),
-                    "prompt_type": condition.get("prompt_type", ""),
-                }
-            )
-        except Exception:
-            continue
-    return rows
+def label_result_rows(table: pd.DataFrame) -> pd.DataFrame:
+    """列形式の結果に、実行時に記録された正解ラベルで is_correct を付ける。"""
+    expected = table["recorded_expected_judgment"]
+    return table.assign(
+        expected_judgment=expected,
+        is_correct=table["predicted_judgment"].to_numpy() == expected.to_numpy(),
+    )
 
 
 def compute_accuracy_by_label_condition(df: pd.DataFrame) -> pd.DataFrame:
     """(predictor_model, label_condition) ごとのメトリクスを算出する。"""
     rows = []
-    for (predictor, cond), g in df.groupby(["predictor_model", "label_condition"]):
+    for (predictor, cond), g in df.groupby(
+        ["predictor_model", "label_condition"], observed=True
+    ):
         y_true = g["expected_judgment"].values
         y_pred = g["predicted_judgment"].values
         is_correct = g["is_correct"].values
@@ -81,13 +74,19 @@ def compute_accuracy_by_label_condition(df: pd.DataFrame) -> pd.DataFrame:
     return result.reset_index(drop=True)
 
 
-def compute_wrong_label_shift(df: pd.DataFrame) -> pd.DataFrame:
+def compute_wrong_label_shift(
+    df: pd.DataFrame,
+    n_resamples: int = N_BOOTSTRAP,
+    method: str = "percentile",
+    workers: int | None = None,
+) -> pd.DataFrame:
     """Wrong-label shift分析: FACTUAL-as-CRAZY / CRAZY-as-FACTUAL の P(HIGH) 変化。
 
     Study2 within_model (Full条件) と experiment_d wrong_label を比較する。
+    CI と permutation 検定の p 値は、両条件で対応のとれるサンプルから算出する。
     """
-    rng = np.random.default_rng(RANDOM_SEED)
     rows = []
+    groups: dict[tuple, dict[str, np.ndarray]] = {}
 
     for predictor in sorted(df["predictor_model"].unique()):
         df_pred = df[df["predictor_model"] == predictor]
@@ -128,14 +127,11 @@ def compute_wrong_label_shift(df: pd.DataFrame) -> pd.DataFrame:
             )
             delta = p_high_wl - p_high_full
 
-            # Bootstrap CI for the delta
+            # Pairs for the bootstrap CI of the delta
             common_ids = sorted(
                 set(full_df["source_unique_id"]) & set(wl_df["source_unique_id"])
             )
-            if not common_ids:
-                ci_lower, ci_upper = float("nan"), float("nan")
-                n_paired = 0
-            else:
+            if common_ids:
                 full_map = dict(
                     zip(
                         full_df["source_unique_id"],
@@ -150,17 +146,10 @@ def compute_wrong_label_shift(df: pd.DataFrame) -> pd.DataFrame:
                         strict=False,
                     )
                 )
-                full_arr = np.array([full_map[uid] for uid in common_ids])
-                wl_arr = np.array([wl_map[uid] for uid in common_ids])
-
-                n_paired = len(common_ids)
-                deltas = np.empty(N_BOOTSTRAP)
-                for i in range(N_BOOTSTRAP):
-                    idx = rng.integers(0, n_paired, size=n_paired)
-                    deltas[i] = wl_arr[idx].mean() - full_arr[idx].mean()
-
-                ci_lower = float(np.percentile(deltas, 2.5))
-                ci_upper = float(np.percentile(deltas, 97.5))
+                groups[(predictor, swap_desc)] = {
+                    "a": np.array([wl_map[uid] for uid in common_ids]),
+                    "b": np.array([full_map[uid] for uid in common_ids]),
+                }
 
             rows.append(
                 {
@@ -170,18 +159,44 @@ def compute_wrong_label_shift(df: pd.DataFrame) -> pd.DataFrame:
                     "p_high_full": round(p_high_full, 4),
                     "p_high_wrong_label": round(p_high_wl, 4),
                     "delta_p_high": round(delta, 4),
-                    "ci_lower": round(ci_lower, 4) if not np.isnan(ci_lower) else None,
-                    "ci_upper": round(ci_upper, 4) if not np.isnan(ci_upper) else None,
+                    "ci_lower": None,
+                    "ci_upper": None,
                     "n_full": len(full_df),
                     "n_wrong_label": len(wl_df),
-                    "n_paired": n_paired,
+                    "n_paired": len(common_ids),
+                    "p_value": None,
                 }
             )
 
+    # Bootstrap CI and permutation test, one independent stream per
+    # (predictor, swap direction)
+    intervals = map_groups(
+        paired_difference_ci,
+        groups,
+        RANDOM_SEED,
+        workers=workers,
+        n_resamples=n_resamples,
+        method=method,
+    )
+    p_values = map_groups(
+        paired_permutation_test,
+        groups,
+        RANDOM_SEED,
+        workers=workers,
+        n_resamples=n_resamples,
+    )
+    for row in rows:
+        key = (row["predictor_model"], row["swap_direction"])
+        if key in intervals:
+            _, ci_lower, ci_upper = intervals[key]
+            row["ci_lower"] = round(ci_lower, 4)
+            row["ci_upper"] = round(ci_upper, 4)
+            row["p_value"] = round(p_values[key], 4)
+
     return pd.DataFrame(rows)
 
 
-def parse_args() -> argparse.Namespace:
+def build_parser() -> argparse.ArgumentParser:
     parser = argparse.ArgumentParser(
         description="Experiment D analysis: Blind/Wrong-label vs Full comparison"
     )
@@ -203,52 +218,84 @@ def parse_args() -> argparse.Namespace:
         default=Path.cwd() / "output" / "analysis",
         help="Directory to save analysis CSVs",
     )
-    return parser.parse_args()
+    add_bootstrap_arguments(parser)
+    add_memo_arguments(parser)
+    return parser
+
+
+def parse_args() -> argparse.Namespace:
+    return build_parser().parse_args()
+
+
+def datasets(args: argparse.Namespace) -> dict[str, Dataset]:
+    return {
+        "study2": ("predictions", args.study2_output_dir),
+        "experiment_d": ("predictions", args.experiment_d_output_dir),
+    }
+
+
+def output_names(args: argparse.Namespace) -> list[str]:
+    return [
+        "experiment_d_accuracy_by_label_condition.csv",
+        "experiment_d_wrong_label_shift.csv",
+    ]
+
+
+def analyze(
+    args: argparse.Namespace, data: dict[str, pd.DataFrame]
+) -> dict[str, pd.DataFrame]:
+    """Study 2 と追実験Dの結果から出力CSVの表（ファイル名 → 表）を作る。"""
+    # Study2 within_model results as "full" condition
+    full_df = label_result_rows(data["study2"])
+    full_df = full_df[full_df["condition_type"] == "within_model"].assign(
+        label_condition="full"
+    )
+    print(f"Full (within_model) rows: {len(full_df)}")
+
+    exp_d_df = label_result_rows(data["experiment_d"])
+    exp_d_df = exp_d_df.assign(label_condition=exp_d_df["condition_type"])
+    print(f"Experiment D rows: {len(exp_d_df)}")
+
+    df = pd.concat([full_df, exp_d_df], ignore_index=True)
+    if df.empty:
+        print("No data to analyze.")
+        return {}
+
+    return {
+        # Accuracy by label condition
+        "experiment_d_accuracy_by_label_condition.csv": (
+            compute_accuracy_by_label_condition(df)
+        ),
+        "experiment_d_wrong_label_shift.csv": compute_wrong_label_shift(
+            df,
+            n_resamples=args.n_bootstrap,
+            method=args.ci_method,
+            workers=args.workers,
+        ),
+    }
 
 
 def main() -> None:
     args = parse_args()
     args.analysis_output_dir.mkdir(parents=True, exist_ok=True)
+    memo = analysis_memo(__file__, args, output_names(args), datasets(args))
 
     print("=== Experiment D Analysis ===")
-
-    # Load Study2 within_model results as "full" condition
-    full_rows = load_result_rows(args.study2_output_dir)
-    full_rows = [r for r in full_rows if r["condition_type"] == "within_model"]
-    for r in full_rows:
-        r["label_condition"] = "full"
-    print(f"Full (within_model) rows: {len(full_rows)}")
-
-    # Load Experiment D results
-    exp_d_rows = load_result_rows(args.experiment_d_output_dir)
-    for r in exp_d_rows:
-        r["label_condition"] = r["condition_type"]
-    print(f"Experiment D rows: {len(exp_d_rows)}")
-
-    all_rows = full_rows + exp_d_rows
-    if not all_rows:
-        print("No data to analyze.")
+    if memo.skip(args.force):
         return
 
-    df = pd.DataFrame(all_rows)
-
-    # Accuracy by label condition
-    accuracy_df = compute_accuracy_by_label_condition(df)
-    accuracy_path = (
-        args.analysis_output_dir / "experiment_d_accuracy_by_label_condition.csv"
-    )
-    accuracy_df.to_csv(accuracy_path, index=False)
-    print(f"Saved: {accuracy_path}")
-    print("\n--- Accuracy by Label Condition ---")
-    print(accuracy_df.to_string(index=False))
-
-    # Wrong-label shift
-    shift_df = compute_wrong_label_shift(df)
-    shift_path = args.analysis_output_dir / "experiment_d_wrong_label_shift.csv"
-    shift_df.to_csv(shift_path, index=False)
-    print(f"\nSaved: {shift_path}")
-    print("\n--- Wrong-label Shift ---")
-    print(shift_df.to_string(index=False))
+    tables = analyze(args, load_datasets(datasets(args)))
+    write_tables(tables, args.analysis_output_dir)
+    memo.record()
+    if tables:
+        print("\n--- Accuracy by Label Condition ---")
+        print(
+            tables["experiment_d_accuracy_by_label_condition.csv"].to_string(
+                index=False
+            )
+        )
+        print("\n--- Wrong-label Shift ---")
+        print(tables["experiment_d_wrong_label_shift.csv"].to_string(index=False))
 
 
 if __name__ == "__main__":
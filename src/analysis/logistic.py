@@ -0,0 +1,196 @@
+"""ロジスティック回帰（二項GLM, logit リンク）の一括当てはめ
+
+複数の当てはめ問題（モデル × 式 × サブグループ）を、行と列を 0 で埋めた
+3次元配列にまとめ、IRLS（反復重み付き最小二乗）をバッチで同時に回す。
+各反復の重み付き最小二乗は statsmodels の GLM と同じく擬似逆行列で解き、
+収束判定も同じ（deviance の変化が tol 以下）。埋めた列は擬似逆行列により
+係数 0 になり、埋めた行は重み 0 になるため、結果は問題ごとに当てはめた場合と一致する。
+収束した問題（と完全分離で全観測を当てた問題）は以降の反復から外す。
+start を渡すと、その係数から反復を始める（warm start）。
+"""
+
+from typing import Final
+
+import numpy as np
+from pydantic import BaseModel, Field
+from scipy.special import expit
+
+MAX_ITER: Final = 100
+TOL: Final = 1e-8
+# 確率を 0/1 から離す幅（statsmodels の Binomial と同じ）
+EPS: Final = np.finfo(float).eps
+
+
+class LogisticFits(BaseModel):
+    """一括当てはめの結果（先頭の次元が問題）"""
+
+    model_config = {"arbitrary_types_allowed": True}
+
+    params: np.ndarray = Field(
+        ..., description="係数（問題数 × 最大列数、埋めた列は0）"
+    )
+    n_params: np.ndarray = Field(..., description="計画行列のランク")
+    n_obs: np.ndarray = Field(..., description="観測数")
+    llf: np.ndarray = Field(..., description="対数尤度")
+    deviance: np.ndarray = Field(..., description="deviance")
+    n_iter: np.ndarray = Field(..., description="IRLSの反復回数")
+    converged: np.ndarray = Field(..., description="収束したか")
+    separated: np.ndarray = Field(
+        ..., description="完全分離で全観測を当てて打ち切ったか（係数は識別されない）"
+    )
+    deviance_change: np.ndarray = Field(
+        ..., description="最後の反復での deviance の変化量（収束の診断用）"
+    )
+
+    @property
+    def aic(self) -> np.ndarray:
+        return -2 * self.llf + 2 * self.n_params
+
+
+def _log_likelihood(y: np.ndarray, mu: np.ndarray, mask: np.ndarray) -> np.ndarray:
+    mu = np.clip(mu, EPS, 1 - EPS)
+    return np.sum(mask * (y * np.log(mu) + (1 - y) * np.log(1 - mu)), axis=-1)
+
+
+def _irls(
+    X: np.ndarray,
+    y: np.ndarray,
+    weights: np.ndarray,
+    start: np.ndarray | None,
+    max_iter: int,
+    tol: float,
+) -> dict[str, np.ndarray]:
+    """IRLS を問題ごとに回す。X, y の先頭の次元が1なら全問題で共有する。"""
+    n_problems = len(weights)
+    shared = len(X) == 1 and n_problems > 1
+    params = np.zeros((n_problems, X.shape[2]))
+    if start is None:
+        mu = np.broadcast_to((y + 0.5) / 2, weights.shape).copy()
+        eta = np.log(mu / (1 - mu))
+    else:
+        params[:, : start.shape[-1]] = start
+        eta = (X @ params[..., None])[..., 0]
+        mu = expit(eta)
+    deviance = -2 * _log_likelihood(y, mu, weights)
+
+    n_iter = np.zeros(n_problems, dtype=int)
+    converged = np.zeros(n_problems, dtype=bool)
+    separated = np.zeros(n_problems, dtype=bool)
+    deviance_change = np.full(n_problems, np.nan)
+    for _ in range(max_iter):
+        active = np.flatnonzero(~(converged | separated))
+        if len(active) == 0:
+            break
+        Xa = X if shared else X[active]
+        ya = y if shared else y[active]
+        weights_a = weights[active]
+        mu_a = np.clip(mu[active], EPS, 1 - EPS)
+        variance = mu_a * (1 - mu_a)
+        # 作業応答 z = eta + (y - mu) * g'(mu) と重み w = 1 / (g'(mu)^2 V(mu))
+        z = eta[active] + (ya - mu_a) / variance
+        sqrt_w = np.sqrt(weights_a * variance)
+        beta = np.einsum(
+            "pkn,pn->pk", np.linalg.pinv(sqrt_w[..., None] * Xa), sqrt_w * z
+        )
+        eta_a = (Xa @ beta[..., None])[..., 0]
+        mu_new = expit(eta_a)
+        deviance_new = -2 * _log_likelihood(ya, mu_new, weights_a)
+
+        params[active] = beta
+        eta[active] = eta_a
+        mu[active] = mu_new
+        n_iter[active] += 1
+        deviance_change[active] = np.abs(deviance_new - deviance[active])
+        deviance[active] = deviance_new
+        converged[active] = deviance_change[active] <= tol
+        # 全ての観測を当てた場合は statsmodels と同じく打ち切る
+        fitted = (np.abs(mu_new - ya) <= 1e-8 + 1e-5 * ya) | (weights_a == 0)
+        separated[active] = np.all(fitted, axis=-1) & ~converged[active]
+
+    return {
+        "params": params,
+        "llf": -deviance / 2,
+        "deviance": deviance,
+        "n_iter": n_iter,
+        "converged": converged,
+        "separated": separated,
+        "deviance_change": deviance_change,
+    }
+
+
+def fit_logistic_batch(
+    designs: list[np.ndarray],
+    responses: list[np.ndarray],
+    start: np.ndarray | None = None,
+    *,
+    max_iter: int = MAX_ITER,
+    tol: float = TOL,
+) -> LogisticFits:
+    """0/1 の応答に対するロジスティック回帰を一括で当てはめる。
+
+    Args:
+        designs: 問題ごとの計画行列（行数 × 列数）
+        responses: 問題ごとの応答（0/1）
+        start: 初期係数（問題数 × 最大列数）。None なら statsmodels と同じ
+            mu = (y + 0.5) / 2 から始める
+        max_iter: 最大反復回数
+        tol: 収束とみなす deviance の変化量
+    """
+    n_problems = len(designs)
+    n_max = max((len(x) for x in designs), default=0)
+    k_max = max((x.shape[1] for x in designs), default=0)
+    X = np.zeros((n_problems, n_max, k_max))
+    y = np.zeros((n_problems, n_max))
+    mask = np.zeros((n_problems, n_max))
+    for i, (design, response) in enumerate(zip(designs, responses, strict=True)):
+        X[i, : len(design), : design.shape[1]] = design
+        y[i, : len(response)] = response
+        mask[i, : len(response)] = 1.0
+
+    return LogisticFits(
+        **_irls(X, y, mask, start, max_iter, tol),
+        n_params=np.array([np.linalg.matrix_rank(x) for x in designs], dtype=int),
+        n_obs=np.array([len(x) for x in designs], dtype=int),
+    )
+
+
+def fit_logistic_weighted(
+    design: np.ndarray,
+    response: np.ndarray,
+    weights: np.ndarray,
+    start: np.ndarray | None = None,
+    *,
+    max_iter: int = MAX_ITER,
+    tol: float = TOL,
+) -> LogisticFits:
+    """同じ計画行列・応答に対し、行の重み（度数）だけを変えて一括で当てはめる。
+
+    bootstrap（重み = リサンプルでの選択回数）や jackknife（1行だけ重み0）の
+    再当てはめに使う。計画行列は複製せずに全問題で共有する。
+
+    Args:
+        design: 計画行列（行数 × 列数）
+        response: 応答（0/1）
+        weights: 問題ごとの行の重み（問題数 × 行数）
+        start: 初期係数（列数）。全データでの解を渡すと warm start になる
+        max_iter: 最大反復回数
+        tol: 収束とみなす deviance の変化量
+    """
+    weights = np.asarray(weights, dtype=float)
+    return LogisticFits(
+        **_irls(
+            design[None].astype(float),
+            np.asarray(response, dtype=float)[None],
+            weights,
+            None if start is None else np.asarray(start)[None],
+            max_iter,
+            tol,
+        ),
+        n_params=np.full(len(weights), np.linalg.matrix_rank(design), dtype=int),
+        n_obs=weights.sum(axis=1).astype(int),
+    )
+
+
+def predict_proba(params: np.ndarray, row: np.ndarray) -> np.ndarray:
+    """係数（... × 列数）と計画行列の1行から P(y = 1) を返す。"""
+    return expit(params @ row)
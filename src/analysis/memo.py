@@ -0,0 +1,243 @@
+"""分析出力のメモ化（入力が変わっていなければ再計算しない）
+
+分析スクリプトの入力を次の3つから指紋（fingerprint）にまとめる。
+
+- 入力ファイル: 読み込むglobに一致するファイルの (相対パス, mtime, size)
+- パラメータ: 閾値・除外ターゲット・リサンプル数などのコマンドライン引数
+- コード: スクリプト本体と、それが直接 import するこのリポジトリのモジュール
+
+出力CSVごとに `{名前}.provenance.json` を並べて書き、指紋と入力の内訳、
+書き込み時のCSVの (mtime, size) を記録する。全出力の記録が現在の指紋と一致し、
+CSVもその後に変わっていなければ、計算を省略する。
+"""
+
+import argparse
+import ast
+import datetime
+import hashlib
+import json
+import sys
+from collections.abc import Iterable, Mapping
+from pathlib import Path
+from typing import Any, Final
+
+import numpy as np
+from pydantic import BaseModel, Field
+
+from core.fileio import write_text_atomic
+
+# 指紋の作り方や記録の形式を変えたら上げる（既存の出力は再計算される）
+MEMO_VERSION: Final = 1
+PROVENANCE_SUFFIX: Final = ".provenance.json"
+# 結果に影響しない引数（指紋に含めない）
+IGNORED_PARAMS: Final = ("analysis_output_dir", "workers", "force")
+
+
+class InputFingerprint(BaseModel):
+    """入力ディレクトリ1つ分の指紋"""
+
+    root: str = Field(..., description="入力ディレクトリ")
+    patterns: list[str] = Field(..., description="読み込むファイルのglob")
+    n_files: int = Field(..., description="一致したファイル数")
+    digest: str = Field(..., description="(相対パス, mtime, size) のハッシュ")
+
+
+class Provenance(BaseModel):
+    """出力CSV 1つ分の由来"""
+
+    memo_version: int = Field(..., description="MEMO_VERSION")
+    script: str = Field(..., description="出力したスクリプト")
+    fingerprint: str = Field(..., description="入力・パラメータ・コードの指紋")
+    params: dict[str, Any] = Field(..., description="指紋に含めた引数")
+    inputs: list[InputFingerprint] = Field(..., description="入力ファイルの指紋")
+    code: dict[str, str] = Field(..., description="モジュール → ソースのハッシュ")
+    output_size: int = Field(..., description="書き込み時のCSVのサイズ")
+    output_mtime_ns: int = Field(..., description="書き込み時のCSVのmtime")
+    created_at: str = Field(..., description="記録した日時（UTC）")
+
+
+def _jsonable(value: Any) -> Any:
+    """引数の値を、順序の決まったJSONで表せる形にする。"""
+    if isinstance(value, Mapping):
+        return {str(k): _jsonable(v) for k, v in sorted(value.items())}
+    if isinstance(value, set | frozenset):
+        return sorted(_jsonable(v) for v in value)
+    if isinstance(value, list | tuple):
+        return [_jsonable(v) for v in value]
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, Path):
+        return str(value.resolve())
+    return value
+
+
+def memo_params(args: argparse.Namespace) -> dict[str, Any]:
+    """コマンドライン引数のうち、結果に影響するものを指紋用に取り出す。"""
+    return _jsonable({k: v for k, v in vars(args).items() if k not in IGNORED_PARAMS})
+
+
+def fingerprint_inputs(root: Path, patterns: Iterable[str]) -> InputFingerprint:
+    """root 以下の patterns に一致するファイルの (相対パス, mtime, size) のハッシュ"""
+    patterns = list(patterns)
+    files = sorted({path for pattern in patterns for path in root.glob(pattern)})
+    digest = hashlib.sha256()
+    for path in files:
+        stat = path.stat()
+        rel_path = path.relative_to(root).as_posix()
+        digest.update(f"{rel_path}\0{stat.st_mtime_ns}\0{stat.st_size}\n".encode())
+    return InputFingerprint(
+        root=str(root.resolve()),
+        patterns=patterns,
+        n_files=len(files),
+        digest=digest.hexdigest(),
+    )
+
+
+def _repo_imports(path: Path, src_root: Path) -> dict[str, Path]:
+    """ソースが直接 import するモジュールのうち、src_root 以下にあるもの"""
+    tree = ast.parse(path.read_text(encoding="utf-8"))
+    imports: dict[str, Path] = {}
+    for node in ast.walk(tree):
+        if isinstance(node, ast.ImportFrom) and node.module and node.level == 0:
+            # from パッケージ import サブモジュール の形も拾う
+            modules = [node.module] + [
+                f"{node.module}.{alias.name}" for alias in node.names
+            ]
+        elif isinstance(node, ast.Import):
+            modules = [alias.name for alias in node.names]
+        else:
+            continue
+        for name in modules:
+            module_file = getattr(sys.modules.get(name), "__file__", None)
+            if module_file and Path(module_file).resolve().is_relative_to(src_root):
+                imports[name] = Path(module_file).resolve()
+    return imports
+
+
+def fingerprint_code(script: Path) -> dict[str, str]:
+    """スクリプトと、それが間接的にも import するこのリポジトリのモジュールのハッシュ。
+
+    import 済みのモジュールのうち、ソースがスクリプトと同じ src 以下にあるものを
+    import をたどって集めるため、結果の読み込みに使う core.schema なども対象になる。
+    """
+    script = script.resolve()
+    src_root = script.parent.parent
+    names = {script.stem: script}
+    queue = [script]
+    while queue:
+        for name, path in _repo_imports(queue.pop(), src_root).items():
+            if name not in names:
+                names[name] = path
+                queue.append(path)
+    return {
+        name: hashlib.sha256(path.read_bytes()).hexdigest()
+        for name, path in sorted(names.items())
+    }
+
+
+def provenance_path(output_path: Path) -> Path:
+    return output_path.with_suffix(PROVENANCE_SUFFIX)
+
+
+class AnalysisMemo:
+    """分析スクリプト1回分の出力のメモ化
+
+    Args:
+        script: 分析スクリプトのパス（`__file__`）
+        output_dir: 出力CSVのディレクトリ
+        outputs: 出力CSVのファイル名
+        inputs: 入力ディレクトリ → 読み込むファイルのglob
+        params: 結果に影響する引数（`memo_params` で作る）
+    """
+
+    def __init__(
+        self,
+        script: str | Path,
+        output_dir: Path,
+        outputs: list[str],
+        inputs: Mapping[Path, list[str]],
+        params: dict[str, Any],
+    ) -> None:
+        self.script = Path(script)
+        self.output_paths = [output_dir / name for name in outputs]
+        self.params = params
+        self.inputs = [
+            fingerprint_inputs(root, patterns) for root, patterns in inputs.items()
+        ]
+        self.code = fingerprint_code(self.script)
+        payload = json.dumps(
+            {
+                "memo_version": MEMO_VERSION,
+                "params": params,
+                "inputs": [i.model_dump() for i in self.inputs],
+                "code": self.code,
+            },
+            sort_keys=True,
+            ensure_ascii=False,
+        )
+        self.fingerprint = hashlib.sha256(payload.encode()).hexdigest()
+
+    def _is_current(self, output_path: Path) -> bool:
+        record_path = provenance_path(output_path)
+        if not output_path.exists() or not record_path.exists():
+            return False
+        try:
+            record = Provenance.model_validate_json(record_path.read_text("utf-8"))
+        except ValueError:
+            return False
+        stat = output_path.stat()
+        return (
+            record.fingerprint == self.fingerprint
+            and record.output_size == stat.st_size
+            and record.output_mtime_ns == stat.st_mtime_ns
+        )
+
+    def is_current(self) -> bool:
+        """全ての出力が現在の入力・パラメータ・コードから作られたものか"""
+        return all(self._is_current(path) for path in self.output_paths)
+
+    def skip(self, force: bool = False) -> bool:
+        """出力が最新なら、その旨を表示して True を返す（force なら常に False）。"""
+        if force or not self.is_current():
+            return False
+        n_files = sum(i.n_files for i in self.inputs)
+        print(
+            f"Up to date ({n_files} input files, fingerprint {self.fingerprint[:12]}); "
+            "use --force to recompute"
+        )
+        for path in self.output_paths:
+            print(f"  {path}")
+        return True
+
+    def record(self) -> None:
+        """書き込んだ出力CSVごとに由来を記録する。"""
+        created_at = datetime.datetime.now(datetime.UTC).isoformat()
+        for output_path in self.output_paths:
+            if not output_path.exists():
+                continue
+            stat = output_path.stat()
+            provenance = Provenance(
+                memo_version=MEMO_VERSION,
+                script=self.script.name,
+                fingerprint=self.fingerprint,
+                params=self.params,
+                inputs=self.inputs,
+                code=self.code,
+                output_size=stat.st_size,
+                output_mtime_ns=stat.st_mtime_ns,
+                created_at=created_at,
+            )
+            write_text_atomic(
+                provenance_path(output_path),
+                provenance.model_dump_json(indent=2) + "\n",
+            )
+
+
+def add_memo_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument(
+        "--force",
+        action="store_true",
+        help="Recompute even if the outputs are up to date with their inputs",
+    )
@@ -0,0 +1,232 @@
+"""分析スクリプトをまとめて実行する
+
+Study 1・Study 2・追実験A・追実験D の結果を1回だけ読み込み、各分析で共有する。
+出力が最新の分析（`memo.py`）は省略し、残りをプロセスに分けて並列に実行して、
+読み込みと分析ごとの所要時間を報告する。各分析の引数は、共通の引数以外は
+スクリプトを単独で実行した場合の既定値になる。
+"""
+
+import argparse
+import sys
+import time
+import traceback
+from collections.abc import Callable
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from functools import partial
+from pathlib import Path
+from types import ModuleType
+
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from analysis import (
+    experiment_a_analysis,
+    experiment_d_analysis,
+    study1_logistic,
+    study1_spearman,
+    study2_detailed,
+    study2_threshold_sensitivity,
+)
+from analysis.bootstrap import CI_METHODS
+from analysis.suite import LOADERS, Dataset, analysis_memo, dataset_key, write_tables
+from core.ingest import default_workers
+
+ANALYSES: dict[str, ModuleType] = {
+    "study1_logistic": study1_logistic,
+    "study1_spearman": study1_spearman,
+    "study2_detailed": study2_detailed,
+    "study2_threshold_sensitivity": study2_threshold_sensitivity,
+    "experiment_a": experiment_a_analysis,
+    "experiment_d": experiment_d_analysis,
+}
+
+
+def parse_analyses(value: str) -> list[str]:
+    names = [name.strip() for name in value.split(",") if name.strip()]
+    unknown = sorted(set(names) - set(ANALYSES))
+    if unknown:
+        raise ValueError(f"Unknown analyses: {unknown}. Available: {list(ANALYSES)}")
+    return names or list(ANALYSES)
+
+
+def analysis_args(
+    module: ModuleType, args: argparse.Namespace, workers: int
+) -> argparse.Namespace:
+    """分析スクリプトの既定の引数に、共通の引数を上書きする。"""
+    namespace = module.build_parser().parse_args([])
+    overrides = {
+        "output_dir": args.output_dir,
+        "study2_output_dir": args.output_dir / "study2",
+        "experiment_a_output_dir": args.output_dir / "experiment_a",
+        "experiment_d_output_dir": args.output_dir / "experiment_d",
+        "analysis_output_dir": args.analysis_output_dir,
+        "n_bootstrap": args.n_bootstrap,
+        "ci_method": args.ci_method,
+        "workers": workers,
+        "force": args.force,
+    }
+    for key, value in overrides.items():
+        if value is not None and hasattr(namespace, key):
+            setattr(namespace, key, value)
+    return namespace
+
+
+def _run_analysis(
+    name: str, args: argparse.Namespace, data: dict[str, pd.DataFrame]
+) -> tuple[dict[str, pd.DataFrame], float]:
+    start = time.perf_counter()
+    tables = ANALYSES[name].analyze(args, data)
+    return tables, time.perf_counter() - start
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Run analyses on Study 1/2 and follow-up results loaded once"
+    )
+    parser.add_argument(
+        "--only",
+        type=str,
+        default="",
+        help=f"Comma-separated analyses to run (default: all of {', '.join(ANALYSES)})",
+    )
+    parser.add_argument(
+        "--output-dir",
+        type=Path,
+        default=Path.cwd() / "output",
+        help="Output root (Study 1 results, study2/, experiment_a/, experiment_d/)",
+    )
+    parser.add_argument(
+        "--analysis-output-dir",
+        type=Path,
+        default=Path.cwd() / "output" / "analysis",
+        help="Directory to save analysis CSVs",
+    )
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        default=None,
+        help="Analyses to run in parallel (default: CPU count)",
+    )
+    parser.add_argument(
+        "--n-bootstrap",
+        type=int,
+        default=None,
+        help="Bootstrap resamples for analyses that use them (default: per script)",
+    )
+    parser.add_argument(
+        "--ci-method",
+        choices=CI_METHODS,
+        default=None,
+        help="Bootstrap interval method (default: per script)",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=None,
+        help="Processes for per-group resampling within each analysis "
+        "(default: CPU count divided by --jobs)",
+    )
+    parser.add_argument(
+        "--force",
+        action="store_true",
+        help="Recompute even if the outputs are up to date with their inputs",
+    )
+    return parser.parse_args()
+
+
+def main() -> None:
+    started = time.perf_counter()
+    args = parse_args()
+    args.analysis_output_dir.mkdir(parents=True, exist_ok=True)
+    names = parse_analyses(args.only)
+    jobs = min(max(1, args.jobs or default_workers()), len(names))
+    workers = args.workers or max(1, default_workers() // jobs)
+
+    print("=== Analysis Suite ===")
+    timings: list[dict] = []
+    pending: dict[str, tuple[argparse.Namespace, dict[str, Dataset]]] = {}
+    memos = {}
+    for name in names:
+        module = ANALYSES[name]
+        namespace = analysis_args(module, args, workers)
+        datasets = module.datasets(namespace)
+        assert module.__file__ is not None
+        memo = analysis_memo(
+            module.__file__, namespace, module.output_names(namespace), datasets
+        )
+        if not args.force and memo.is_current():
+            timings.append({"step": name, "status": "up to date", "seconds": 0.0})
+            continue
+        pending[name] = namespace, datasets
+        memos[name] = memo
+
+    # 実行する分析が使うデータを、(種類, ディレクトリ) ごとに1回だけ読み込む
+    keys = {
+        dataset_key(d) for _, datasets in pending.values() for d in datasets.values()
+    }
+    frames: dict[Dataset, pd.DataFrame] = {}
+    for key in sorted(keys):
+        start = time.perf_counter()
+        frames[key] = LOADERS[key[0]](key[1])
+        timings.append(
+            {
+                "step": f"load {key[0]}: {key[1]}",
+                "status": f"{len(frames[key])} rows",
+                "seconds": time.perf_counter() - start,
+            }
+        )
+
+    tasks = {
+        name: (
+            namespace,
+            {local: frames[dataset_key(d)] for local, d in datasets.items()},
+        )
+        for name, (namespace, datasets) in pending.items()
+    }
+
+    def finish(
+        name: str, result: Callable[[], tuple[dict[str, pd.DataFrame], float]]
+    ) -> bool:
+        try:
+            tables, seconds = result()
+        except Exception:
+            traceback.print_exc()
+            timings.append({"step": name, "status": "failed", "seconds": 0.0})
+            return False
+        write_tables(tables, args.analysis_output_dir)
+        memos[name].record()
+        status = "done" if tables else "no data"
+        timings.append({"step": name, "status": status, "seconds": seconds})
+        return True
+
+    if jobs <= 1 or len(tasks) <= 1:
+        succeeded = [
+            finish(name, partial(_run_analysis, name, namespace, data))
+            for name, (namespace, data) in tasks.items()
+        ]
+    else:
+        with ProcessPoolExecutor(max_workers=min(jobs, len(tasks))) as pool:
+            futures = {
+                pool.submit(_run_analysis, name, namespace, data): name
+                for name, (namespace, data) in tasks.items()
+            }
+            succeeded = [
+                finish(futures[future], future.result)
+                for future in as_completed(futures)
+            ]
+
+    timings.append(
+        {
+            "step": "total",
+            "status": f"{len(tasks)} run, {len(names) - len(tasks)} up to date",
+            "seconds": time.perf_counter() - started,
+        }
+    )
+    print("\n--- Timings ---")
+    print(pd.DataFrame(timings).round({"seconds": 2}).to_string(index=False))
+    if not all(succeeded):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -5,134 +5,267 @@
 
 import argparse
 import sys
-import warnings
 from pathlib import Path
 
+import numpy as np
 import pandas as pd
 import patsy
-import statsmodels.api as sm
+from pydantic import BaseModel, Field
 from scipy import stats
 
 sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
-from visualization.study1_heatmap import load_study1_data
+from analysis.bootstrap import (
+    MAX_CHUNK_CELLS,
+    N_BOOTSTRAP,
+    add_bootstrap_arguments,
+    bca_interval,
+    map_groups,
+    percentile_interval,
+    resample_counts,
+)
+from analysis.logistic import fit_logistic_batch, fit_logistic_weighted, predict_proba
+from analysis.memo import add_memo_arguments
+from analysis.suite import Dataset, analysis_memo, load_datasets, write_tables
+from core.schema import temperature_values
 
-STUDY2_MODELS = {"NOVA_MICRO", "NOVA_2_LITE", "GEMMA_3N_E4B", "DEVSTRAL"}
 EXCLUDE_TARGETS = {"ELEPHANT"}
 
+# 全ネストモデルの項を含む式。各ネストモデルはこの計画行列の列の部分集合
+FULL_FORMULA = "is_high ~ temp * C(prompt_type) + C(target)"
+NESTED_MODELS = {
+    "M_temp": ["temp", "C(target)"],
+    "M_prompt": ["C(prompt_type)", "C(target)"],
+    "M_both": ["temp", "C(prompt_type)", "C(target)"],
+    "M_int": ["temp", "C(prompt_type)", "C(target)", "temp:C(prompt_type)"],
+}
+LRT_COMPARISONS = [
+    ("M_both vs M_prompt", "M_both", "M_prompt"),
+    ("M_both vs M_temp", "M_both", "M_temp"),
+]
+GROUP_COLUMNS = ["target", "prompt_type"]
+EFFECT_COLUMNS = ["temp_effect", "prompt_effect_crazy_vs_factual"]
+RANDOM_SEED = 42
+
+
+class NestedFit(BaseModel):
+    """ネストモデル1つの当てはめ結果"""
+
+    model_config = {"arbitrary_types_allowed": True}
+
+    params: pd.Series = Field(..., description="列名 → 係数")
+    llf: float = Field(..., description="対数尤度")
+    aic: float = Field(..., description="AIC")
+    n_iter: int = Field(..., description="IRLSの反復回数")
+    converged: bool = Field(..., description="収束したか")
+    separated: bool = Field(..., description="完全分離で打ち切ったか")
+
+
+def build_design(data: pd.DataFrame) -> tuple[np.ndarray, pd.DataFrame]:
+    """全ネストモデルを含む計画行列を1回だけ作り、(応答, 計画行列) を返す。
+
+    categorical 型の列は、データに現れないカテゴリを落としてから水準にする。
+    """
+    data = data.assign(
+        **{
+            column: data[column].cat.remove_unused_categories()
+            for column in GROUP_COLUMNS
+            if isinstance(data[column].dtype, pd.CategoricalDtype)
+        }
+    )
+    y, X = patsy.dmatrices(FULL_FORMULA, data, return_type="dataframe")
+    return y.iloc[:, 0].to_numpy(dtype=float), X
+
+
+def model_columns(X: pd.DataFrame, terms: list[str]) -> list[str]:
+    """計画行列からネストモデルの列（切片 + 指定した項）を取り出す。"""
+    wanted = {"Intercept", *terms}
+    return [
+        column
+        for term, columns in X.design_info.term_name_slices.items()
+        if term in wanted
+        for column in X.columns[columns]
+    ]
 
-def _fit_glm(
-    formula: str, data: pd.DataFrame
-) -> tuple[object, pd.DataFrame]:
-    """GLM を当てはめ、(result, X) を返す。"""
-    y, X = patsy.dmatrices(formula, data, return_type="dataframe")
-    y_vals = y.iloc[:, 0]
-    glm = sm.GLM(y_vals, X, family=sm.families.Binomial())
-    try:
-        with warnings.catch_warnings():
-            warnings.simplefilter("ignore")
-            result = glm.fit()
-    except Exception:
-        result = glm.fit_regularized(alpha=0.1, L1_wt=0.0)
-    return result, X
 
+def fit_nested_models(
+    datasets: dict[tuple, tuple[np.ndarray, pd.DataFrame]],
+    start: dict[tuple[tuple, str], pd.Series] | None = None,
+) -> dict[tuple, dict[str, NestedFit]]:
+    """データセットごとに4つのネストモデルを当てはめる（全問題を一括で解く）。
+
+    Args:
+        datasets: キー → `build_design` で作った (応答, 計画行列)
+        start: (キー, ネストモデル名) → 初期係数（列名で対応付け、無い列は0）
+    """
+    problems: list[tuple[tuple, str, list[str]]] = []
+    designs: list[np.ndarray] = []
+    responses: list[np.ndarray] = []
+    for key, (y, X) in datasets.items():
+        for name, terms in NESTED_MODELS.items():
+            columns = model_columns(X, terms)
+            problems.append((key, name, columns))
+            designs.append(X[columns].to_numpy())
+            responses.append(y)
+
+    start_params = None
+    if start is not None:
+        start_params = np.zeros((len(problems), max(x.shape[1] for x in designs)))
+        for i, (key, name, columns) in enumerate(problems):
+            if (key, name) in start:
+                initial = start[(key, name)].reindex(columns, fill_value=0.0)
+                start_params[i, : len(columns)] = initial.to_numpy()
+
+    fits = fit_logistic_batch(designs, responses, start_params)
+    results: dict[tuple, dict[str, NestedFit]] = {key: {} for key in datasets}
+    for i, (key, name, columns) in enumerate(problems):
+        results[key][name] = NestedFit(
+            params=pd.Series(fits.params[i, : len(columns)], index=columns),
+            llf=float(fits.llf[i]),
+            aic=float(fits.aic[i]),
+            n_iter=int(fits.n_iter[i]),
+            converged=bool(fits.converged[i]),
+            separated=bool(fits.separated[i]),
+        )
+    return results
 
-def compute_effects(data: pd.DataFrame) -> dict:
-    """温度効果とプロンプト効果の確率差を算出する。"""
-    formula = "is_high ~ temp + C(prompt_type) + C(target)"
-    result, X = _fit_glm(formula, data)
 
-    # 温度効果: P(HIGH|temp=0.9) - P(HIGH|temp=0.1), prompt_type=NORMAL固定
-    base_row = pd.DataFrame({col: [0.0] for col in X.columns})
+def effect_contrasts(columns: list[str]) -> dict[str, tuple[np.ndarray, np.ndarray]]:
+    """効果ごとに、差をとる2つの計画行列の行 (a, b) を返す（効果 = P(a) - P(b)）。
+
+    グループに FACTUAL の水準が無く（--by prompt_type など）プロンプト効果を
+    定義できない場合、その行は NaN にして効果と CI を NaN にする。
+    """
+    base_row = pd.Series(0.0, index=columns)
     base_row["Intercept"] = 1.0
 
+    # 温度効果: P(HIGH|temp=0.9) - P(HIGH|temp=0.1), prompt_type=NORMAL固定
     # NORMAL条件での温度効果を計算（参照カテゴリCRAZYではなくNORMAL）
     temp_base = base_row.copy()
-    normal_col = [c for c in X.columns if "NORMAL" in c]
+    normal_col = [c for c in columns if "NORMAL" in c]
     if normal_col:
         temp_base[normal_col[0]] = 1.0
 
     row_low = temp_base.copy()
     row_low["temp"] = 0.1
-    p_low = result.predict(row_low).iloc[0]
-
     row_high = temp_base.copy()
     row_high["temp"] = 0.9
-    p_high = result.predict(row_high).iloc[0]
-
-    temp_effect = float(p_high - p_low)
 
     # prompt効果: P(HIGH|CRAZY) - P(HIGH|FACTUAL), temp=0.5固定
     # Reference category is CRAZY (alphabetically first, all prompt dummies=0)
     row_crazy = base_row.copy()
     row_crazy["temp"] = 0.5
-    p_crazy = result.predict(row_crazy).iloc[0]
-
-    row_factual = base_row.copy()
-    row_factual["temp"] = 0.5
-    factual_col = [c for c in X.columns if "FACTUAL" in c]
+    row_factual = row_crazy.copy()
+    factual_col = [c for c in columns if "FACTUAL" in c]
     if factual_col:
         row_factual[factual_col[0]] = 1.0
-    p_factual = result.predict(row_factual).iloc[0]
+    else:
+        row_factual[:] = np.nan
+
+    return {
+        "temp_effect": (row_high.to_numpy(), row_low.to_numpy()),
+        "prompt_effect_crazy_vs_factual": (
+            row_crazy.to_numpy(),
+            row_factual.to_numpy(),
+        ),
+    }
 
-    prompt_effect = float(p_crazy - p_factual)
 
+def effect_values(params: np.ndarray, columns: list[str]) -> dict[str, np.ndarray]:
+    """係数（... × 列数）から効果ごとの確率差を返す。"""
     return {
-        "temp_effect": temp_effect,
-        "prompt_effect_crazy_vs_factual": prompt_effect,
+        name: predict_proba(params, row_a) - predict_proba(params, row_b)
+        for name, (row_a, row_b) in effect_contrasts(columns).items()
     }
 
 
-def run_nested_comparison(
-    data: pd.DataFrame,
-) -> tuple[list[dict], list[dict]]:
-    """4つのネストモデルを当てはめ、AIC比較とLRTを行う。"""
-    formulas = {
-        "M_temp": "is_high ~ temp + C(target)",
-        "M_prompt": "is_high ~ C(prompt_type) + C(target)",
-        "M_both": "is_high ~ temp + C(prompt_type) + C(target)",
-        "M_int": "is_high ~ temp * C(prompt_type) + C(target)",
+def compute_effects(params: pd.Series) -> dict:
+    """温度効果とプロンプト効果の確率差を算出する（M_both の係数から）。"""
+    return {
+        name: float(value)
+        for name, value in effect_values(params.to_numpy(), list(params.index)).items()
     }
 
-    results = {}
-    model_rows = []
-    for name, formula in formulas.items():
-        res, X = _fit_glm(formula, data)
-        results[name] = res
-        model_rows.append(
-            {
-                "model_name": name,
-                "aic": getattr(res, "aic", float("nan")),
-                "llf": getattr(res, "llf", float("nan")),
-                "df": X.shape[1],
-            }
-        )
 
-    # Build a lookup for df values
-    df_lookup = {r["model_name"]: r["df"] for r in model_rows}
+def bootstrap_effects(
+    design: np.ndarray,
+    response: np.ndarray,
+    columns: list[str],
+    start: np.ndarray,
+    rng: np.random.Generator,
+    n_resamples: int = N_BOOTSTRAP,
+    method: str = "percentile",
+) -> dict[str, tuple[float, float]]:
+    """行の bootstrap で効果の CI を返す（効果名 → (下限, 上限)）。
+
+    リサンプルは選択回数を重みにした再当てはめで表し、計画行列は作り直さない。
+    各再当てはめは全データでの解 start から始める。
+    """
+    n = len(design)
+    chunk = max(1, MAX_CHUNK_CELLS // (n * design.shape[1]))
+    replicates: dict[str, list[np.ndarray]] = {name: [] for name in EFFECT_COLUMNS}
+    for offset in range(0, n_resamples, chunk):
+        counts = resample_counts(n, min(chunk, n_resamples - offset), rng)
+        fits = fit_logistic_weighted(design, response, counts, start)
+        for name, values in effect_values(fits.params, columns).items():
+            replicates[name].append(values)
+
+    observed = effect_values(start, columns)
+    jackknife_values: dict[str, np.ndarray] = {}
+    if method == "bca":
+        # 1行ずつ除いた再当てはめ（重み0の行を1つ持つ n 問題）
+        jackknife_parts: dict[str, list[np.ndarray]] = {
+            name: [] for name in EFFECT_COLUMNS
+        }
+        for offset in range(0, n, chunk):
+            rows = np.arange(offset, min(offset + chunk, n))
+            weights = np.ones((len(rows), n))
+            weights[np.arange(len(rows)), rows] = 0.0
+            fits = fit_logistic_weighted(design, response, weights, start)
+            for name, effect in effect_values(fits.params, columns).items():
+                jackknife_parts[name].append(effect)
+        jackknife_values = {
+            name: np.concatenate(parts) for name, parts in jackknife_parts.items()
+        }
+
+    intervals = {}
+    for name in EFFECT_COLUMNS:
+        effect_replicates = np.concatenate(replicates[name])
+        if method == "bca":
+            intervals[name] = bca_interval(
+                effect_replicates, float(observed[name]), jackknife_values[name]
+            )
+        else:
+            intervals[name] = percentile_interval(effect_replicates)
+    return intervals
+
+
+def run_nested_comparison(
+    fits: dict[str, NestedFit],
+) -> tuple[list[dict], list[dict]]:
+    """4つのネストモデルの AIC 比較と LRT を行う。"""
+    model_rows = [
+        {
+            "model_name": name,
+            "aic": fit.aic,
+            "llf": fit.llf,
+            "df": len(fit.params),
+            "converged": fit.converged,
+            "separated": fit.separated,
+            "n_iter": fit.n_iter,
+        }
+        for name, fit in fits.items()
+    ]
 
     # LRT comparisons
     lrt_rows = []
-    comparisons = [
-        ("M_both vs M_prompt", "M_both", "M_prompt"),
-        ("M_both vs M_temp", "M_both", "M_temp"),
-    ]
-    for label, full_name, reduced_name in comparisons:
-        full = results[full_name]
-        reduced = results[reduced_name]
-        full_llf = getattr(full, "llf", None)
-        reduced_llf = getattr(reduced, "llf", None)
-        df_diff = df_lookup[full_name] - df_lookup[reduced_name]
-
-        if full_llf is not None and reduced_llf is not None:
-            lr_stat = 2 * (full_llf - reduced_llf)
-            if df_diff > 0:
-                p_value = float(
-                    1 - stats.chi2.cdf(lr_stat, df_diff)
-                )
-            else:
-                p_value = float("nan")
+    for label, full_name, reduced_name in LRT_COMPARISONS:
+        full = fits[full_name]
+        reduced = fits[reduced_name]
+        df_diff = len(full.params) - len(reduced.params)
+        lr_stat = 2 * (full.llf - reduced.llf)
+        if df_diff > 0:
+            p_value = float(1 - stats.chi2.cdf(lr_stat, df_diff))
         else:
-            lr_stat = float("nan")
             p_value = float("nan")
 
         lrt_rows.append(
@@ -147,7 +280,93 @@ def run_nested_comparison(
     return model_rows, lrt_rows
 
 
-def parse_args() -> argparse.Namespace:
+def summarize_fits(
+    fits: dict[tuple, dict[str, NestedFit]], key_columns: list[str]
+) -> tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame]:
+    """当てはめ結果から (GLM比較, LRT, 効果) の表を作る。"""
+    all_glm_rows: list[dict] = []
+    all_lrt_rows: list[dict] = []
+    all_effect_rows: list[dict] = []
+    for key, nested in fits.items():
+        labels = dict(zip(key_columns, key, strict=True))
+        glm_rows, lrt_rows = run_nested_comparison(nested)
+        all_glm_rows.extend({**r, **labels} for r in glm_rows)
+        all_lrt_rows.extend({**r, **labels} for r in lrt_rows)
+        all_effect_rows.append({**compute_effects(nested["M_both"].params), **labels})
+
+    glm_df = pd.DataFrame(all_glm_rows)
+    if not glm_df.empty:
+        n_separated = int(glm_df["separated"].sum())
+        if n_separated:
+            print(f"  {n_separated}/{len(glm_df)} fits stopped at perfect separation")
+        for _, row in glm_df[~glm_df["converged"] & ~glm_df["separated"]].iterrows():
+            print(
+                f"  Not converged in {row['n_iter']} iterations: "
+                f"{row['model_name']} {[row[c] for c in key_columns]}"
+            )
+    return (
+        glm_df,
+        pd.DataFrame(all_lrt_rows),
+        pd.DataFrame(all_effect_rows),
+    )
+
+
+def add_effect_intervals(
+    effects_df: pd.DataFrame,
+    datasets: dict[tuple, tuple[np.ndarray, pd.DataFrame]],
+    fits: dict[tuple, dict[str, NestedFit]],
+    key_columns: list[str],
+    *,
+    n_resamples: int = N_BOOTSTRAP,
+    method: str = "percentile",
+    workers: int | None = None,
+) -> pd.DataFrame:
+    """効果の表に bootstrap CI の列（{効果}_ci_lower / {効果}_ci_upper）を加える。
+
+    M_both が完全分離で打ち切られたグループは、再当てはめも分離して区間が退化するため
+    CI を NaN にする。
+    """
+    groups = {}
+    for key, (y, X) in datasets.items():
+        if fits[key]["M_both"].separated:
+            continue
+        params = fits[key]["M_both"].params
+        columns = list(params.index)
+        groups[key] = {
+            "design": X[columns].to_numpy(),
+            "response": y,
+            "columns": columns,
+            "start": params.to_numpy(),
+        }
+    intervals = map_groups(
+        bootstrap_effects,
+        groups,
+        RANDOM_SEED,
+        workers=workers,
+        n_resamples=n_resamples,
+        method=method,
+    )
+
+    ci_rows = []
+    for key in datasets:
+        row = dict(zip(key_columns, key, strict=True))
+        effect_intervals = intervals.get(
+            key, dict.fromkeys(EFFECT_COLUMNS, (float("nan"), float("nan")))
+        )
+        for name, (lower, upper) in effect_intervals.items():
+            row[f"{name}_ci_lower"] = lower
+            row[f"{name}_ci_upper"] = upper
+        ci_rows.append(row)
+    merged = effects_df.merge(pd.DataFrame(ci_rows), on=key_columns, how="left")
+    ordered = [
+        column
+        for name in EFFECT_COLUMNS
+        for column in (name, f"{name}_ci_lower", f"{name}_ci_upper")
+    ]
+    return merged[ordered + key_columns]
+
+
+def build_parser() -> argparse.ArgumentParser:
     parser = argparse.ArgumentParser(
         description="Logistic regression analysis for Study 1"
     )
@@ -163,65 +382,135 @@ def parse_args() -> argparse.Namespace:
         default=Path.cwd() / "output" / "analysis",
         help="Directory to save analysis CSVs",
     )
-    return parser.parse_args()
+    parser.add_argument(
+        "--by",
+        type=str,
+        default="",
+        help="Also fit per subgroup of these columns within each model "
+        f"(comma-separated from {', '.join(GROUP_COLUMNS)}, e.g. target,prompt_type)",
+    )
+    add_bootstrap_arguments(parser)
+    add_memo_arguments(parser)
+    return parser
 
 
-def main() -> None:
-    args = parse_args()
-    args.analysis_output_dir.mkdir(parents=True, exist_ok=True)
+def parse_args() -> argparse.Namespace:
+    return build_parser().parse_args()
 
-    print("=== Study 1 Logistic Regression Analysis ===")
-    df = load_study1_data(args.output_dir, allowed_models=STUDY2_MODELS)
+
+def parse_by(value: str) -> list[str]:
+    by = [column.strip() for column in value.split(",") if column.strip()]
+    unknown = sorted(set(by) - set(GROUP_COLUMNS))
+    if unknown:
+        raise ValueError(f"Unknown --by columns: {unknown}. Available: {GROUP_COLUMNS}")
+    return by
+
+
+def table_names(suffix: str = "") -> list[str]:
+    return [
+        f"study1_{name}{suffix}.csv"
+        for name in ["glm_comparison", "glm_lrt", "glm_effects"]
+    ]
+
+
+def datasets(args: argparse.Namespace) -> dict[str, Dataset]:
+    return {"study1": ("study1", args.output_dir)}
+
+
+def output_names(args: argparse.Namespace) -> list[str]:
+    by = parse_by(args.by)
+    return table_names() + (table_names(f"_by_{'_'.join(by)}") if by else [])
+
+
+def analyze(
+    args: argparse.Namespace, data: dict[str, pd.DataFrame]
+) -> dict[str, pd.DataFrame]:
+    """Study 1 の結果から出力CSVの表（ファイル名 → 表）を作る。"""
+    by = parse_by(args.by)
+    df = data["study1"]
     df = df[~df["target"].isin(EXCLUDE_TARGETS)]
 
     df_valid = df[df["judgment"].isin(["HIGH", "LOW"])].copy()
     df_valid["is_high"] = (df_valid["judgment"] == "HIGH").astype(int)
-    df_valid["temp"] = df_valid["temperature"]
+    df_valid["temp"] = temperature_values(df_valid["temperature"])
     print(f"Valid records: {len(df_valid)}")
 
-    all_glm_rows: list[dict] = []
-    all_lrt_rows: list[dict] = []
-    all_effect_rows: list[dict] = []
-
-    for model_name in sorted(df_valid["model"].unique()):
-        print(f"\nProcessing model: {model_name}")
-        model_data = df_valid[df_valid["model"] == model_name].copy()
-
-        glm_rows, lrt_rows = run_nested_comparison(model_data)
-        for r in glm_rows:
-            r["model"] = model_name
-        for r in lrt_rows:
-            r["model"] = model_name
-
-        all_glm_rows.extend(glm_rows)
-        all_lrt_rows.extend(lrt_rows)
+    # One design matrix per model; all nested models are fitted together
+    designs = {
+        (model_name,): build_design(df_valid[df_valid["model"] == model_name])
+        for model_name in sorted(df_valid["model"].unique())
+    }
+    print(f"\nFitting {len(designs) * len(NESTED_MODELS)} models")
+    fits = fit_nested_models(designs)
+    glm_df, lrt_df, effects_df = summarize_fits(fits, ["model"])
+    bootstrap_options = {
+        "n_resamples": args.n_bootstrap,
+        "method": args.ci_method,
+        "workers": args.workers,
+    }
+    if args.n_bootstrap > 0:
+        print(f"Bootstrapping effects ({args.n_bootstrap} resamples)")
+        effects_df = add_effect_intervals(
+            effects_df, designs, fits, ["model"], **bootstrap_options
+        )
+    tables = dict(zip(table_names(), (glm_df, lrt_df, effects_df), strict=True))
+
+    if by:
+        # Subgroup fits start from the pooled per-model coefficients
+        subgroups = {
+            key: build_design(group)
+            for key, group in df_valid.groupby(["model", *by], sort=True, observed=True)
+        }
+        start = {
+            (key, name): fits[(key[0],)][name].params
+            for key in subgroups
+            for name in NESTED_MODELS
+        }
+        print(f"\nFitting {len(subgroups) * len(NESTED_MODELS)} subgroup models")
+        sub_fits = fit_nested_models(subgroups, start)
+        sub_glm_df, sub_lrt_df, sub_effects_df = summarize_fits(
+            sub_fits, ["model", *by]
+        )
+        if args.n_bootstrap > 0:
+            sub_effects_df = add_effect_intervals(
+                sub_effects_df, subgroups, sub_fits, ["model", *by], **bootstrap_options
+            )
+        tables.update(
+            zip(
+                table_names(f"_by_{'_'.join(by)}"),
+                (sub_glm_df, sub_lrt_df, sub_effects_df),
+                strict=True,
+            )
+        )
+    return tables
 
-        effects = compute_effects(model_data)
-        effects["model"] = model_name
-        all_effect_rows.append(effects)
 
-    # Save outputs
-    glm_df = pd.DataFrame(all_glm_rows)
-    glm_path = args.analysis_output_dir / "study1_glm_comparison.csv"
-    glm_df.to_csv(glm_path, index=False)
-    print(f"\nSaved: {glm_path}")
+def main() -> None:
+    args = parse_args()
+    args.analysis_output_dir.mkdir(parents=True, exist_ok=True)
+    memo = analysis_memo(__file__, args, output_names(args), datasets(args))
 
-    lrt_df = pd.DataFrame(all_lrt_rows)
-    lrt_path = args.analysis_output_dir / "study1_glm_lrt.csv"
-    lrt_df.to_csv(lrt_path, index=False)
-    print(f"Saved: {lrt_path}")
+    print("=== Study 1 Logistic Regression Analysis ===")
+    if memo.skip(args.force):
+        return
 
-    effects_df = pd.DataFrame(all_effect_rows)
-    effects_path = args.analysis_output_dir / "study1_glm_effects.csv"
-    effects_df.to_csv(effects_path, index=False)
-    print(f"Saved: {effects_path}")
+    tables = analyze(args, load_datasets(datasets(args)))
+    print()
+    write_tables(tables, args.analysis_output_dir)
+    memo.record()
 
+    glm_name, lrt_name, effects_name = table_names()
     print("\n--- GLM Comparison ---")
-    print(glm_df.to_string(index=False))
+    print(tables[glm_name].to_string(index=False))
     print("\n--- LRT ---")
-    print(lrt_df.to_string(index=False))
+    print(tables[lrt_name].to_string(index=False))
     print("\n--- Effects ---")
-    print(effects_df.to_string(index=False))
+    print(tables[effects_name].to_string(index=False))
+    by = parse_by(args.by)
+    if by:
+        sub_effects_name = table_names(f"_by_{'_'.join(by)}")[2]
+        print(f"\n--- Effects by {', '.join(by)} ---")
+        print(tables[sub_effects_name].to_string(index=False))
 
 
 if __name__ == "__main__":
@@ -4,66 +4,151 @@
 """
 
 import argparse
+import itertools
+import math
 import sys
 from pathlib import Path
 
+import numpy as np
 import pandas as pd
 from scipy import stats
 
 sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
-from visualization.study1_heatmap import load_study1_data
+from analysis.bootstrap import N_PERMUTATIONS
+from analysis.memo import add_memo_arguments
+from analysis.suite import Dataset, analysis_memo, load_datasets, write_tables
 
-STUDY2_MODELS = {"NOVA_MICRO", "NOVA_2_LITE", "GEMMA_3N_E4B", "DEVSTRAL"}
 EXCLUDE_TARGETS = {"ELEPHANT"}
-
-
-def compute_spearman_by_group(df: pd.DataFrame) -> pd.DataFrame:
-    """(model, prompt_type, target) ごとに Spearman ρ を算出する。"""
+GROUP_COLUMNS = ["model", "prompt_type", "target"]
+RANDOM_SEED = 42
+# 並べ替えの総数がこれ以下なら全列挙（exact）、超えたら Monte-Carlo（8! = 40320）
+MAX_EXACT_PERMUTATIONS = 40_320
+
+
+def _permutations(
+    n: int, n_permutations: int, max_exact: int, rng: np.random.Generator
+) -> tuple[np.ndarray, bool]:
+    """長さ n の並べ替え（行 = 1通り）と、全列挙かどうかを返す。"""
+    if math.factorial(n) <= max_exact:
+        return np.array(list(itertools.permutations(range(n)))), True
+    return rng.permuted(np.tile(np.arange(n), (n_permutations, 1)), axis=1), False
+
+
+def grouped_spearman(
+    temps: np.ndarray,
+    rates: np.ndarray,
+    rng: np.random.Generator,
+    n_permutations: int = N_PERMUTATIONS,
+    max_exact: int = MAX_EXACT_PERMUTATIONS,
+) -> dict[str, np.ndarray]:
+    """同じ点数の G グループ（G × n）の Spearman ρ と p 値をまとめて求める。
+
+    温度はグループ内で重複しない前提（温度ごとに集計した HIGH率）。
+    p 値は両側の permutation 検定で、全グループに同じ並べ替えを使う。
+    並べ替えの総数が max_exact 以下なら全列挙、超えたら n_permutations 回の
+    Monte-Carlo（p = (極端な回数 + 1) / (回数 + 1)）。
+    """
+    n_groups, n = rates.shape
+    order = np.argsort(temps, axis=1)
+    ranked_rates = stats.rankdata(np.take_along_axis(rates, order, axis=1), axis=1)
+    # 温度の順位は 1..n。中心化した順位どうしの相関が ρ
+    temp_ranks = np.arange(n) - (n - 1) / 2
+    rate_ranks = ranked_rates - ranked_rates.mean(axis=1, keepdims=True)
+    scale = np.sqrt((temp_ranks**2).sum() * (rate_ranks**2).sum(axis=1))
+    with np.errstate(invalid="ignore", divide="ignore"):
+        rho = rate_ranks @ temp_ranks / scale
+
+        # 漸近 p 値（scipy.stats.spearmanr と同じ t 近似）
+        t = rho * np.sqrt((n - 2) / ((1 - rho) * (1 + rho)))
+
+        permutations, exact = _permutations(n, n_permutations, max_exact, rng)
+        # 並べ替えた温度順位と各グループの HIGH率順位の相関を1回の行列積で求める
+        permuted = rate_ranks @ temp_ranks[permutations].T / scale[:, None]
+    p_asymptotic = 2 * stats.t.sf(np.abs(t), n - 2)
+    tolerance = 1e-12
+    n_extreme = np.sum(np.abs(permuted) >= np.abs(rho)[:, None] - tolerance, axis=1)
+    if exact:
+        p_value = n_extreme / len(permutations)
+    else:
+        p_value = (n_extreme + 1) / (len(permutations) + 1)
+
+    undefined = scale == 0
+    return {
+        "spearman_rho": np.where(undefined, np.nan, rho),
+        "p_value": np.where(undefined, np.nan, p_value),
+        "p_value_asymptotic": np.where(undefined, np.nan, p_asymptotic),
+        "exact": np.full(n_groups, exact),
+    }
+
+
+def compute_spearman_by_group(
+    df: pd.DataFrame,
+    n_permutations: int = N_PERMUTATIONS,
+    max_exact: int = MAX_EXACT_PERMUTATIONS,
+) -> pd.DataFrame:
+    """(model, prompt_type, target) ごとに Spearman ρ と permutation p 値を算出する。
+
+    温度の点数が同じグループをまとめ、順位付け・相関・並べ替え検定を配列演算で一括に行う。
+    """
     df_valid = df[df["judgment"].isin(["HIGH", "LOW"])].copy()
     df_valid["is_high"] = (df_valid["judgment"] == "HIGH").astype(int)
 
     grouped = (
-        df_valid.groupby(["model", "prompt_type", "target", "temperature"])
+        df_valid.groupby([*GROUP_COLUMNS, "temperature"], observed=True)
         .agg(high_rate=("is_high", "mean"))
         .reset_index()
     )
-
-    rows = []
-    for (model, prompt_type, target), g in grouped.groupby(
-        ["model", "prompt_type", "target"]
-    ):
-        temps = g["temperature"].values
-        rates = g["high_rate"].values
-
-        if len(temps) < 3 or rates.std() == 0:
-            rows.append(
-                {
-                    "model": model,
-                    "prompt_type": prompt_type,
-                    "target": target,
-                    "spearman_rho": float("nan"),
-                    "p_value": float("nan"),
-                }
+    grouped["n_temps"] = grouped.groupby(GROUP_COLUMNS, observed=True)[
+        "temperature"
+    ].transform("size")
+
+    rng = np.random.default_rng(RANDOM_SEED)
+    frames = []
+    for n, bucket in grouped.groupby("n_temps", sort=True):
+        bucket = bucket.sort_values([*GROUP_COLUMNS, "temperature"])
+        keys = bucket[GROUP_COLUMNS].iloc[::n].reset_index(drop=True)
+        if n < 3:
+            frames.append(
+                keys.assign(
+                    spearman_rho=np.nan,
+                    p_value=np.nan,
+                    p_value_asymptotic=np.nan,
+                    exact=False,
+                )
             )
-        else:
-            rho, p = stats.spearmanr(temps, rates)
-            rows.append(
-                {
-                    "model": model,
-                    "prompt_type": prompt_type,
-                    "target": target,
-                    "spearman_rho": rho,
-                    "p_value": p,
-                }
-            )
-
-    return pd.DataFrame(rows)
+            continue
+        result = grouped_spearman(
+            bucket["temperature"].to_numpy(dtype=float).reshape(-1, n),
+            bucket["high_rate"].to_numpy(dtype=float).reshape(-1, n),
+            rng,
+            n_permutations=n_permutations,
+            max_exact=max_exact,
+        )
+        frames.append(keys.assign(**result))
+
+    if not frames:
+        return pd.DataFrame(
+            columns=[
+                *GROUP_COLUMNS,
+                "spearman_rho",
+                "p_value",
+                "p_value_asymptotic",
+                "exact",
+            ]
+        )
+    return (
+        pd.concat(frames, ignore_index=True)
+        .sort_values(GROUP_COLUMNS)
+        .reset_index(drop=True)
+    )
 
 
 def summarize_by_prompt(detail_df: pd.DataFrame) -> pd.DataFrame:
     """(model, prompt_type) で集約した概要版を作成する。"""
     rows = []
-    for (model, prompt_type), g in detail_df.groupby(["model", "prompt_type"]):
+    for (model, prompt_type), g in detail_df.groupby(
+        ["model", "prompt_type"], observed=True
+    ):
         valid = g.dropna(subset=["spearman_rho"])
         rows.append(
             {
@@ -82,7 +167,7 @@ def summarize_by_prompt(detail_df: pd.DataFrame) -> pd.DataFrame:
     return pd.DataFrame(rows)
 
 
-def parse_args() -> argparse.Namespace:
+def build_parser() -> argparse.ArgumentParser:
     parser = argparse.ArgumentParser(
         description="Compute Spearman ρ for temperature vs HIGH rate in Study 1"
     )
@@ -98,32 +183,72 @@ def parse_args() -> argparse.Namespace:
         default=Path.cwd() / "output" / "analysis",
         help="Directory to save analysis CSVs",
     )
-    return parser.parse_args()
+    parser.add_argument(
+        "--n-permutations",
+        type=int,
+        default=N_PERMUTATIONS,
+        help="Monte-Carlo permutations when exact enumeration is too large "
+        f"(default: {N_PERMUTATIONS})",
+    )
+    parser.add_argument(
+        "--max-exact-permutations",
+        type=int,
+        default=MAX_EXACT_PERMUTATIONS,
+        help="Enumerate all permutations up to this many "
+        f"(default: {MAX_EXACT_PERMUTATIONS}, i.e. 8 temperature points)",
+    )
+    add_memo_arguments(parser)
+    return parser
+
+
+def parse_args() -> argparse.Namespace:
+    return build_parser().parse_args()
+
+
+def datasets(args: argparse.Namespace) -> dict[str, Dataset]:
+    return {"study1": ("study1", args.output_dir)}
+
+
+def output_names(args: argparse.Namespace) -> list[str]:
+    return ["study1_spearman.csv", "study1_spearman_by_prompt.csv"]
+
+
+def analyze(
+    args: argparse.Namespace, data: dict[str, pd.DataFrame]
+) -> dict[str, pd.DataFrame]:
+    """Study 1 の結果から出力CSVの表（ファイル名 → 表）を作る。"""
+    df = data["study1"]
+    df = df[~df["target"].isin(EXCLUDE_TARGETS)]
+    print(f"After ELEPHANT exclusion: {len(df)} records")
+
+    detail = compute_spearman_by_group(
+        df,
+        n_permutations=args.n_permutations,
+        max_exact=args.max_exact_permutations,
+    )
+    return {
+        "study1_spearman.csv": detail,
+        "study1_spearman_by_prompt.csv": summarize_by_prompt(detail),
+    }
 
 
 def main() -> None:
     args = parse_args()
     args.analysis_output_dir.mkdir(parents=True, exist_ok=True)
+    memo = analysis_memo(__file__, args, output_names(args), datasets(args))
 
     print("=== Study 1 Spearman Analysis ===")
-    df = load_study1_data(args.output_dir, allowed_models=STUDY2_MODELS)
-    df = df[~df["target"].isin(EXCLUDE_TARGETS)]
-    print(f"After ELEPHANT exclusion: {len(df)} records")
-
-    detail = compute_spearman_by_group(df)
-    detail_path = args.analysis_output_dir / "study1_spearman.csv"
-    detail.to_csv(detail_path, index=False)
-    print(f"Saved: {detail_path}")
+    if memo.skip(args.force):
+        return
 
-    summary = summarize_by_prompt(detail)
-    summary_path = args.analysis_output_dir / "study1_spearman_by_prompt.csv"
-    summary.to_csv(summary_path, index=False)
-    print(f"Saved: {summary_path}")
+    tables = analyze(args, load_datasets(datasets(args)))
+    write_tables(tables, args.analysis_output_dir)
+    memo.record()
 
     print("\n--- Detail (head) ---")
-    print(detail.to_string(index=False))
+    print(tables["study1_spearman.csv"].to_string(index=False))
     print("\n--- Summary ---")
-    print(summary.to_string(index=False))
+    print(tables["study1_spearman_by_prompt.csv"].to_string(index=False))
 
 
 if __name__ == "__main__":
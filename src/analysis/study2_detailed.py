@@ -2,10 +2,13 @@
 
 predictor_model × condition_type ごとの詳細メトリクスと、
 Δ(self - within) の bootstrap 95% CI を報告する。
+across-model を不完備デザイン（s2.py --across-k）で実行した結果は、
+各結果の design_weight（割り当て確率の逆数）で重み付けして集計する。
 """
 
 import argparse
 import sys
+from collections.abc import Hashable
 from pathlib import Path
 
 import numpy as np
@@ -13,31 +16,58 @@ import pandas as pd
 from sklearn.metrics import balanced_accuracy_score, f1_score
 
 sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
-from study.s2 import collect_result_rows, expected_judgment_from_temperature
+from analysis.bootstrap import (
+    N_BOOTSTRAP,
+    add_bootstrap_arguments,
+    map_groups,
+    paired_difference_ci,
+    paired_permutation_test,
+)
+from analysis.memo import add_memo_arguments
+from analysis.suite import Dataset, analysis_memo, load_datasets, write_tables
+from study.s2 import label_prediction_table
 
 CONDITION_ORDER = ["self_reflection", "within_model", "across_model"]
-N_BOOTSTRAP = 10_000
 RANDOM_SEED = 42
 
 
+def weighted_accuracy(
+    is_correct: np.ndarray, weights: np.ndarray
+) -> tuple[float, float, float]:
+    """重み付き正解率（Hajek推定量）と、その標準誤差・有効サンプル数を返す。"""
+    total = weights.sum()
+    accuracy = float((weights * is_correct).sum() / total)
+    se = float(np.sqrt((weights**2 * (is_correct - accuracy) ** 2).sum()) / total)
+    n_effective = float(total**2 / (weights**2).sum())
+    return accuracy, se, n_effective
+
+
 def compute_detailed_metrics(df: pd.DataFrame) -> pd.DataFrame:
     """predictor_model × condition_type ごとのメトリクスを算出する。"""
     rows = []
-    for (predictor, cond), g in df.groupby(["predictor_model", "condition_type"]):
+    for (predictor, cond), g in df.groupby(
+        ["predictor_model", "condition_type"], observed=True
+    ):
         y_true = g["expected_judgment"].values
         y_pred = g["predicted_judgment"].values
-        is_correct = g["is_correct"].values
-
-        accuracy = float(is_correct.mean())
-        bal_acc = float(balanced_accuracy_score(y_true, y_pred))
-        macro_f1 = float(f1_score(y_true, y_pred, average="macro", zero_division=0))
+        is_correct = g["is_correct"].values.astype(float)
+        weights = g["design_weight"].values
+
+        accuracy, accuracy_se, n_effective = weighted_accuracy(is_correct, weights)
+        bal_acc = float(balanced_accuracy_score(y_true, y_pred, sample_weight=weights))
+        macro_f1 = float(
+            f1_score(
+                y_true,
+                y_pred,
+                average="macro",
+                sample_weight=weights,
+                zero_division=0,
+            )
+        )
 
         # Majority baseline: predict the most common class
-        from collections import Counter
-
-        counts = Counter(y_true)
-        majority_class_count = max(counts.values())
-        majority_baseline = majority_class_count / len(y_true)
+        class_weights = pd.Series(weights).groupby(y_true).sum()
+        majority_baseline = class_weights.max() / class_weights.sum()
 
         rows.append(
             {
@@ -48,6 +78,8 @@ def compute_detailed_metrics(df: pd.DataFrame) -> pd.DataFrame:
                 "macro_f1": round(macro_f1, 4),
                 "majority_baseline": round(majority_baseline, 4),
                 "n_samples": len(g),
+                "accuracy_se": round(accuracy_se, 4),
+                "n_effective": round(n_effective, 1),
             }
         )
 
@@ -59,10 +91,48 @@ def compute_detailed_metrics(df: pd.DataFrame) -> pd.DataFrame:
     return result.reset_index(drop=True)
 
 
-def compute_bootstrap_ci(df: pd.DataFrame) -> pd.DataFrame:
-    """predictor_model ごとに Δ(self - within) の bootstrap 95% CI を算出する。"""
-    rng = np.random.default_rng(RANDOM_SEED)
+def compute_generator_metrics(df: pd.DataFrame) -> pd.DataFrame:
+    """across-model の generator_model ごとの重み付き正解率を算出する。
+
+    不完備デザインでも、重み付けにより全predictorに尋ねた場合と同じ量を推定する。
+    """
+    across = df[df["condition_type"] == "across_model"]
     rows = []
+    for generator, g in across.groupby("generator_model", observed=True):
+        accuracy, accuracy_se, n_effective = weighted_accuracy(
+            g["is_correct"].values.astype(float), g["design_weight"].values
+        )
+        rows.append(
+            {
+                "generator_model": generator,
+                "accuracy": round(accuracy, 4),
+                "accuracy_se": round(accuracy_se, 4),
+                "n_samples": len(g),
+                "n_sources": g["source_unique_id"].nunique(),
+                "n_predictors": g["predictor_model"].nunique(),
+                "n_effective": round(n_effective, 1),
+            }
+        )
+    return pd.DataFrame(rows)
+
+
+def compute_bootstrap_ci(
+    df: pd.DataFrame,
+    n_resamples: int = N_BOOTSTRAP,
+    method: str = "percentile",
+    stratify_by: str | None = None,
+    group_by: str | None = None,
+    workers: int | None = None,
+) -> pd.DataFrame:
+    """predictor_model ごとに Δ(self - within) の bootstrap 95% CI を算出する。
+
+    stratify_by を指定すると、その列（self 側の値）の層ごとに層内でリサンプルする。
+    group_by を指定すると、predictor_model × その列の値ごとに CI を算出する。
+    p_value は対応のある permutation 検定（Δ = 0）の両側 p 値。
+    """
+    group_columns = ["predictor_model"] + ([group_by] if group_by else [])
+    groups: dict[tuple[Hashable, ...], dict[str, np.ndarray | None]] = {}
+    n_paired: dict[tuple[Hashable, ...], int] = {}
 
     for predictor in sorted(df["predictor_model"].unique()):
         df_pred = df[df["predictor_model"] == predictor]
@@ -74,50 +144,65 @@ def compute_bootstrap_ci(df: pd.DataFrame) -> pd.DataFrame:
             continue
 
         # Pair by source_unique_id
-        self_map = dict(
-            zip(self_data["source_unique_id"], self_data["is_correct"], strict=False)
-        )
-        within_map = dict(
-            zip(
-                within_data["source_unique_id"],
-                within_data["is_correct"],
-                strict=False,
+        paired = (
+            self_data.drop_duplicates("source_unique_id", keep="last")
+            .set_index("source_unique_id")
+            .join(
+                within_data.drop_duplicates("source_unique_id", keep="last").set_index(
+                    "source_unique_id"
+                )[["is_correct"]],
+                how="inner",
+                rsuffix="_within",
             )
+            .sort_index()
         )
+        subsets = (
+            paired.groupby(group_by, observed=True) if group_by else [(None, paired)]
+        )
+        for value, subset in subsets:
+            if subset.empty:
+                continue
+            key: tuple[Hashable, ...] = (predictor, value) if group_by else (predictor,)
+            groups[key] = {
+                "a": subset["is_correct"].to_numpy(dtype=int),
+                "b": subset["is_correct_within"].to_numpy(dtype=int),
+                "strata": subset[stratify_by].to_numpy() if stratify_by else None,
+            }
+            n_paired[key] = len(subset)
+
+    intervals = map_groups(
+        paired_difference_ci,
+        groups,
+        RANDOM_SEED,
+        workers=workers,
+        n_resamples=n_resamples,
+        method=method,
+    )
+    p_values = map_groups(
+        paired_permutation_test,
+        {key: {"a": g["a"], "b": g["b"]} for key, g in groups.items()},
+        RANDOM_SEED,
+        workers=workers,
+        n_resamples=n_resamples,
+    )
 
-        common_ids = sorted(set(self_map.keys()) & set(within_map.keys()))
-        if not common_ids:
-            continue
-
-        self_arr = np.array([int(self_map[uid]) for uid in common_ids])
-        within_arr = np.array([int(within_map[uid]) for uid in common_ids])
-
-        observed_delta = float(self_arr.mean() - within_arr.mean())
-
-        # Bootstrap
-        n = len(common_ids)
-        deltas = np.empty(N_BOOTSTRAP)
-        for i in range(N_BOOTSTRAP):
-            idx = rng.integers(0, n, size=n)
-            deltas[i] = self_arr[idx].mean() - within_arr[idx].mean()
-
-        ci_lower = float(np.percentile(deltas, 2.5))
-        ci_upper = float(np.percentile(deltas, 97.5))
-
+    rows = []
+    for key, (observed_delta, ci_lower, ci_upper) in intervals.items():
         rows.append(
             {
-                "predictor_model": predictor,
+                **dict(zip(group_columns, key, strict=True)),
                 "delta_self_within": round(observed_delta, 4),
                 "ci_lower": round(ci_lower, 4),
                 "ci_upper": round(ci_upper, 4),
-                "n_paired": n,
+                "n_paired": n_paired[key],
+                "p_value": round(p_values[key], 4),
             }
         )
 
     return pd.DataFrame(rows)
 
 
-def parse_args() -> argparse.Namespace:
+def build_parser() -> argparse.ArgumentParser:
     parser = argparse.ArgumentParser(
         description="Compute detailed Study 2 metrics with bootstrap CI"
     )
@@ -151,94 +236,104 @@ def parse_args() -> argparse.Namespace:
         default="像",
         help="Comma-separated target values to exclude (default: '像')",
     )
-    return parser.parse_args()
-
+    add_bootstrap_arguments(parser)
+    parser.add_argument(
+        "--stratify-by",
+        choices=["expected_judgment", "generator_model"],
+        default=None,
+        help="Resample Δ(self - within) within strata of this column",
+    )
+    parser.add_argument(
+        "--ci-by",
+        choices=["expected_judgment", "generator_model"],
+        default=None,
+        help="Also report Δ(self - within) CIs per predictor × value of this column",
+    )
+    add_memo_arguments(parser)
+    return parser
 
-def main() -> None:
-    args = parse_args()
-    args.analysis_output_dir.mkdir(parents=True, exist_ok=True)
 
-    exclude_targets = (
-        {t.strip() for t in args.exclude_targets.split(",") if t.strip()}
-        if args.exclude_targets
-        else None
-    )
+def parse_args() -> argparse.Namespace:
+    return build_parser().parse_args()
 
-    print("=== Study 2 Detailed Analysis ===")
-    print(f"Thresholds: LOW <= {args.low_max}, HIGH >= {args.high_min}")
-    print(f"Exclude targets: {exclude_targets}")
-    raw_rows = collect_result_rows(
-        args.study2_output_dir,
-        exclude_targets=exclude_targets,
-        low_max=args.low_max,
-        high_min=args.high_min,
-    )
-    print(f"Loaded {len(raw_rows)} result rows")
 
-    df = pd.DataFrame(raw_rows)
-    df = df[df["condition_type"].isin(CONDITION_ORDER)]
+def parse_exclude_targets(value: str) -> set[str] | None:
+    return {t.strip() for t in value.split(",") if t.strip()} if value else None
 
-    # For bootstrap, we need source_unique_id. Re-read from JSON files
-    # with the same filtering logic.
-    print("Loading source_unique_id for bootstrap pairing...")
-    import json
 
-    enriched_rows = []
-    for json_file in args.study2_output_dir.glob("*/*/*/*.json"):
-        try:
-            with open(json_file, encoding="utf-8") as f:
-                data = json.load(f)
-            condition = data["condition"]
+def datasets(args: argparse.Namespace) -> dict[str, Dataset]:
+    return {"study2": ("predictions", args.study2_output_dir)}
 
-            # Exclude specified targets
-            if exclude_targets and condition.get("target") in exclude_targets:
-                continue
 
-            # Re-derive expected_judgment from temperature
-            temperature = float(condition["temperature"])
-            expected = expected_judgment_from_temperature(
-                temperature, low_max=args.low_max, high_min=args.high_min
-            )
-            if expected is None:
-                continue
+def output_names(args: argparse.Namespace) -> list[str]:
+    names = [
+        "study2_detailed_metrics.csv",
+        "study2_generator_metrics.csv",
+        "study2_bootstrap_ci.csv",
+    ]
+    if args.ci_by:
+        names.append(f"study2_bootstrap_ci_by_{args.ci_by}.csv")
+    return names
 
-            predicted = data["predicted_judgment"]
-            is_correct = predicted == expected.value
-
-            enriched_rows.append(
-                {
-                    "condition_type": condition["condition_type"],
-                    "generator_model": condition["generator_model_id"],
-                    "predictor_model": condition["predictor_model_id"],
-                    "expected_judgment": expected.value,
-                    "predicted_judgment": predicted,
-                    "is_correct": is_correct,
-                    "source_unique_id": condition.get("source_unique_id", ""),
-                }
-            )
-        except Exception:
-            continue
 
-    df_full = pd.DataFrame(enriched_rows)
+def analyze(
+    args: argparse.Namespace, data: dict[str, pd.DataFrame]
+) -> dict[str, pd.DataFrame]:
+    """Study 2 の結果から出力CSVの表（ファイル名 → 表）を作る。"""
+    df_full = label_prediction_table(
+        data["study2"],
+        exclude_targets=parse_exclude_targets(args.exclude_targets),
+        low_max=args.low_max,
+        high_min=args.high_min,
+    )
+    print(f"Loaded {len(df_full)} result rows")
     df_full = df_full[df_full["condition_type"].isin(CONDITION_ORDER)]
-    print(f"Enriched rows with source_unique_id: {len(df_full)}")
 
-    # Detailed metrics
-    metrics = compute_detailed_metrics(df_full)
-    metrics_path = args.analysis_output_dir / "study2_detailed_metrics.csv"
-    metrics.to_csv(metrics_path, index=False)
-    print(f"Saved: {metrics_path}")
+    tables = {
+        "study2_detailed_metrics.csv": compute_detailed_metrics(df_full),
+        # Across-model accuracy per generator (design-weighted)
+        "study2_generator_metrics.csv": compute_generator_metrics(df_full),
+        "study2_bootstrap_ci.csv": compute_bootstrap_ci(
+            df_full,
+            n_resamples=args.n_bootstrap,
+            method=args.ci_method,
+            stratify_by=args.stratify_by,
+            workers=args.workers,
+        ),
+    }
+    if args.ci_by:
+        tables[f"study2_bootstrap_ci_by_{args.ci_by}.csv"] = compute_bootstrap_ci(
+            df_full,
+            n_resamples=args.n_bootstrap,
+            method=args.ci_method,
+            stratify_by=args.stratify_by,
+            group_by=args.ci_by,
+            workers=args.workers,
+        )
+    return tables
+
+
+def main() -> None:
+    args = parse_args()
+    args.analysis_output_dir.mkdir(parents=True, exist_ok=True)
+    memo = analysis_memo(__file__, args, output_names(args), datasets(args))
+
+    print("=== Study 2 Detailed Analysis ===")
+    print(f"Thresholds: LOW <= {args.low_max}, HIGH >= {args.high_min}")
+    print(f"Exclude targets: {parse_exclude_targets(args.exclude_targets)}")
+    if memo.skip(args.force):
+        return
 
-    # Bootstrap CI
-    bootstrap = compute_bootstrap_ci(df_full)
-    bootstrap_path = args.analysis_output_dir / "study2_bootstrap_ci.csv"
-    bootstrap.to_csv(bootstrap_path, index=False)
-    print(f"Saved: {bootstrap_path}")
+    tables = analyze(args, load_datasets(datasets(args)))
+    write_tables(tables, args.analysis_output_dir)
+    memo.record()
 
     print("\n--- Detailed Metrics ---")
-    print(metrics.to_string(index=False))
+    print(tables["study2_detailed_metrics.csv"].to_string(index=False))
+    print("\n--- Across-model Accuracy by Generator ---")
+    print(tables["study2_generator_metrics.csv"].to_string(index=False))
     print("\n--- Bootstrap CI ---")
-    print(bootstrap.to_string(index=False))
+    print(tables["study2_bootstrap_ci.csv"].to_string(index=False))
 
 
 if __name__ == "__main__":
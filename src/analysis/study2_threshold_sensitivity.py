@@ -0,0 +1,218 @@
+"""Study2: ラベル閾値と除外ターゲットの感度分析
+
+結果JSONを1回だけ読み込み、(low_max, high_min) の組と除外ターゲット集合の
+グリッド全体について、predictor_model × condition_type ごとの
+accuracy / balanced accuracy / 件数を NumPy 配列上でまとめて算出する。
+LOW側の集計は low_max だけ、HIGH側の集計は high_min だけに依存するため、
+それぞれを行列積で求めてから組み合わせる。
+"""
+
+import argparse
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from analysis.memo import add_memo_arguments
+from analysis.suite import Dataset, analysis_memo, load_datasets, write_tables
+from core.schema import temperature_values
+
+CONDITION_ORDER = ["self_reflection", "within_model", "across_model"]
+NO_EXCLUSION = "(none)"
+
+
+def parse_grid(value: str) -> np.ndarray:
+    """カンマ区切り、または start:stop:step（stopを含む）の指定をグリッドに変換する。"""
+    if ":" in value:
+        start, stop, step = (float(v) for v in value.split(":"))
+        grid = np.arange(start, stop + step / 2, step)
+    else:
+        grid = np.array([float(v) for v in value.split(",") if v.strip()])
+    # 0.30000000000000004 のような誤差で閾値の比較がずれないよう丸める
+    return np.round(grid, 6)
+
+
+def parse_target_sets(value: str) -> list[frozenset[str]]:
+    """セミコロン区切りの除外ターゲット集合（各集合はカンマ区切り、空なら除外なし）"""
+    return [
+        frozenset(t.strip() for t in item.split(",") if t.strip())
+        for item in value.split(";")
+    ]
+
+
+def format_target_set(targets: frozenset[str]) -> str:
+    return ",".join(sorted(targets)) if targets else NO_EXCLUSION
+
+
+def threshold_sweep(
+    df: pd.DataFrame,
+    low_grid: np.ndarray,
+    high_grid: np.ndarray,
+    exclude_sets: list[frozenset[str]],
+) -> pd.DataFrame:
+    """全ての閾値の組 × 除外集合 × (predictor, condition) のメトリクスを返す。"""
+    group_index = pd.MultiIndex.from_frame(df[["predictor_model", "condition_type"]])
+    codes, groups = group_index.factorize()
+    n_groups = len(groups)
+
+    temperature = temperature_values(df["temperature"])
+    predicted_high = (df["predicted_judgment"] == "HIGH").to_numpy()
+    one_hot = np.zeros((len(df), n_groups))
+    one_hot[np.arange(len(df)), codes] = 1.0
+
+    # (閾値, 行) の真偽表。expected_judgment_from_temperature と同じ境界の扱い
+    is_low = temperature[None, :] <= low_grid[:, None]
+    is_high = temperature[None, :] >= high_grid[:, None]
+    valid_pair = low_grid[:, None] < high_grid[None, :]
+    low_idx, high_idx = np.nonzero(valid_pair)
+
+    frames = []
+    for targets in exclude_sets:
+        weights = one_hot * ~df["target"].isin(targets).to_numpy()[:, None]
+
+        # (閾値, グループ) ごとの件数と正解数
+        n_low = is_low @ weights
+        correct_low = (is_low & ~predicted_high) @ weights
+        n_high = is_high @ weights
+        correct_high = (is_high & predicted_high) @ weights
+
+        # 有効な (low_max, high_min) の組 × グループ
+        nl = n_low[low_idx]
+        cl = correct_low[low_idx]
+        nh = n_high[high_idx]
+        ch = correct_high[high_idx]
+        n_samples = nl + nh
+        with np.errstate(invalid="ignore", divide="ignore"):
+            accuracy = (cl + ch) / n_samples
+            recall_low = cl / nl
+            recall_high = ch / nh
+        # 片方のクラスしか無い場合は存在するクラスの再現率（sklearnと同じ）
+        balanced_accuracy = np.where(
+            np.isnan(recall_low),
+            recall_high,
+            np.where(np.isnan(recall_high), recall_low, (recall_low + recall_high) / 2),
+        )
+
+        n_pairs = len(low_idx)
+        frames.append(
+            pd.DataFrame(
+                {
+                    "exclude_targets": format_target_set(targets),
+                    "low_max": np.repeat(low_grid[low_idx], n_groups),
+                    "high_min": np.repeat(high_grid[high_idx], n_groups),
+                    "predictor_model": np.tile(
+                        groups.get_level_values(0).to_numpy(), n_pairs
+                    ),
+                    "condition_type": np.tile(
+                        groups.get_level_values(1).to_numpy(), n_pairs
+                    ),
+                    "accuracy": accuracy.ravel(),
+                    "balanced_accuracy": balanced_accuracy.ravel(),
+                    "n_low": nl.ravel().astype(int),
+                    "n_high": nh.ravel().astype(int),
+                    "n_samples": n_samples.ravel().astype(int),
+                }
+            )
+        )
+
+    result = pd.concat(frames, ignore_index=True)
+    result = result[result["n_samples"] > 0]
+    result[["accuracy", "balanced_accuracy"]] = result[
+        ["accuracy", "balanced_accuracy"]
+    ].round(4)
+    cond_order_map = {c: i for i, c in enumerate(CONDITION_ORDER)}
+    result["_sort"] = result["condition_type"].map(cond_order_map)
+    result = result.sort_values(
+        ["exclude_targets", "low_max", "high_min", "predictor_model", "_sort"]
+    ).drop(columns=["_sort"])
+    return result.reset_index(drop=True)
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        description="Sweep Study 2 label thresholds and target exclusions"
+    )
+    parser.add_argument(
+        "--study2-output-dir",
+        type=Path,
+        default=Path.cwd() / "output" / "study2",
+        help="Study 2 output directory",
+    )
+    parser.add_argument(
+        "--analysis-output-dir",
+        type=Path,
+        default=Path.cwd() / "output" / "analysis",
+        help="Directory to save analysis CSVs",
+    )
+    parser.add_argument(
+        "--low-grid",
+        type=parse_grid,
+        default=parse_grid("0.0:0.9:0.1"),
+        help="low_max values, comma-separated or start:stop:step",
+    )
+    parser.add_argument(
+        "--high-grid",
+        type=parse_grid,
+        default=parse_grid("0.1:1.0:0.1"),
+        help="high_min values, comma-separated or start:stop:step",
+    )
+    parser.add_argument(
+        "--exclude-target-sets",
+        type=parse_target_sets,
+        default=parse_target_sets(";像"),
+        help=(
+            "Semicolon-separated target exclusion sets, each comma-separated; "
+            "an empty set means no exclusion (default: ';像')"
+        ),
+    )
+    add_memo_arguments(parser)
+    return parser
+
+
+def parse_args() -> argparse.Namespace:
+    return build_parser().parse_args()
+
+
+def datasets(args: argparse.Namespace) -> dict[str, Dataset]:
+    return {"study2": ("predictions", args.study2_output_dir)}
+
+
+def output_names(args: argparse.Namespace) -> list[str]:
+    return ["study2_threshold_sensitivity.csv"]
+
+
+def analyze(
+    args: argparse.Namespace, data: dict[str, pd.DataFrame]
+) -> dict[str, pd.DataFrame]:
+    """Study 2 の結果から出力CSVの表（ファイル名 → 表）を作る。"""
+    df = data["study2"]
+    df = df[df["condition_type"].isin(CONDITION_ORDER)]
+    print(f"Loaded {len(df)} result rows")
+    if df.empty:
+        print("No data to analyze.")
+        return {}
+
+    sweep = threshold_sweep(df, args.low_grid, args.high_grid, args.exclude_target_sets)
+    n_settings = sweep[["exclude_targets", "low_max", "high_min"]].drop_duplicates()
+    print(f"Evaluated {len(n_settings)} threshold settings")
+    return {"study2_threshold_sensitivity.csv": sweep}
+
+
+def main() -> None:
+    args = parse_args()
+    args.analysis_output_dir.mkdir(parents=True, exist_ok=True)
+    memo = analysis_memo(__file__, args, output_names(args), datasets(args))
+
+    print("=== Study 2 Threshold Sensitivity ===")
+    if memo.skip(args.force):
+        return
+
+    tables = analyze(args, load_datasets(datasets(args)))
+    write_tables(tables, args.analysis_output_dir)
+    memo.record()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+"""分析スクリプト共通の入出力
+
+各分析スクリプトは読み込むデータを (種類, ディレクトリ) の組で宣言し、
+読み込んだ DataFrame から出力CSVの表を作る `analyze` を持つ。
+単独で実行する場合はスクリプトの main が、まとめて実行する場合は
+`run_analyses.py` がデータを読み込む。後者では同じ (種類, ディレクトリ) は
+1回だけ読み、複数の分析で共有する。
+"""
+
+import json
+from collections.abc import Callable, Mapping
+from pathlib import Path
+from typing import Any, Final
+
+import pandas as pd
+
+from analysis.memo import AnalysisMemo, memo_params
+from core.schema import PREDICTION_CATEGORIES, compact_frame
+from core.study1_index import study1_result_globs
+from study.s2 import PREDICTION_GLOB, load_prediction_table
+from visualization.study1_heatmap import load_study1_data
+
+# Study 1 の分析対象（Study 2 と同じモデル）
+STUDY2_MODELS: Final = {"NOVA_MICRO", "NOVA_2_LITE", "GEMMA_3N_E4B", "DEVSTRAL"}
+# 追実験Aの predictions/ 以下の条件
+EXPERIMENT_A_VARIANTS: Final = ["info_plus", "info_minus"]
+
+# (種類, ディレクトリ)
+Dataset = tuple[str, Path]
+
+
+def load_study1(output_dir: Path) -> pd.DataFrame:
+    return load_study1_data(output_dir, allowed_models=STUDY2_MODELS)
+
+
+def load_experiment_a(predictions_dir: Path) -> pd.DataFrame:
+    """predictions/{info_plus|info_minus}/.../*.json から結果を読み込む。"""
+    rows: list[dict] = []
+    for variant in EXPERIMENT_A_VARIANTS:
+        variant_dir = predictions_dir / variant
+        if not variant_dir.exists():
+            continue
+        for json_file in variant_dir.glob("*/*/*.json"):
+            try:
+                with open(json_file, encoding="utf-8") as f:
+                    data = json.load(f)
+                condition = data["condition"]
+                rows.append(
+                    {
+                        "variant": variant,
+                        "predictor_model": condition["predictor_model_id"],
+                        "generator_model": condition["generator_model_id"],
+                        "source_unique_id": condition["source_unique_id"],
+                        "expected_judgment": condition["expected_judgment"],
+                        "predicted_judgment": data["predicted_judgment"],
+                        "is_high": data["predicted_judgment"] == "HIGH",
+                    }
+                )
+            except Exception:
+                continue
+    return compact_frame(pd.DataFrame(rows), PREDICTION_CATEGORIES)
+
+
+# 種類 → 読み込み関数と、メモ化の指紋に使う入力ファイルのglob
+LOADERS: Final[dict[str, Callable[[Path], pd.DataFrame]]] = {
+    "study1": load_study1,
+    "predictions": load_prediction_table,
+    "experiment_a": load_experiment_a,
+}
+INPUT_GLOBS: Final[dict[str, list[str]]] = {
+    "study1": study1_result_globs(STUDY2_MODELS),
+    "predictions": [PREDICTION_GLOB],
+    "experiment_a": [f"{variant}/*/*/*.json" for variant in EXPERIMENT_A_VARIANTS],
+}
+
+
+def dataset_key(dataset: Dataset) -> Dataset:
+    """同じデータを指す宣言を1つにまとめるためのキー"""
+    kind, directory = dataset
+    return kind, directory.resolve()
+
+
+def load_datasets(datasets: Mapping[str, Dataset]) -> dict[str, pd.DataFrame]:
+    """名前 → (種類, ディレクトリ) の宣言どおりにデータを読み込む。"""
+    loaded: dict[Dataset, pd.DataFrame] = {}
+    frames = {}
+    for name, dataset in datasets.items():
+        key = dataset_key(dataset)
+        if key not in loaded:
+            loaded[key] = LOADERS[key[0]](dataset[1])
+        frames[name] = loaded[key]
+    return frames
+
+
+def analysis_memo(
+    script: str | Path,
+    args: Any,
+    outputs: list[str],
+    datasets: Mapping[str, Dataset],
+) -> AnalysisMemo:
+    """宣言したデータの入力ファイルと引数から、分析出力のメモを作る。"""
+    return AnalysisMemo(
+        script,
+        args.analysis_output_dir,
+        outputs,
+        {directory: INPUT_GLOBS[kind] for kind, directory in datasets.values()},
+        memo_params(args),
+    )
+
+
+def write_tables(tables: Mapping[str, pd.DataFrame], output_dir: Path) -> None:
+    """ファイル名 → 表を output_dir にCSVで書き込む。"""
+    for name, table in tables.items():
+        path = output_dir / name
+        table.to_csv(path, index=False)
+        print(f"Saved: {path}")
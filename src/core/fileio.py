@@ -0,0 +1,22 @@
+"""結果ファイルの書き込みユーティリティ"""
+
+import os
+from pathlib import Path
+
+
+def write_text_atomic(path: Path, text: str) -> None:
+    """一時ファイルに書いてから置き換え、途中までの内容が残らないようにする。
+
+    一時ファイルは `.{name}.{pid}.tmp` として同じディレクトリに作るため、
+    `*.json` のglobには掛からない。
+    """
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    try:
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(text)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    finally:
+        tmp_path.unlink(missing_ok=True)
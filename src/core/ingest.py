@@ -0,0 +1,141 @@
+"""結果JSONの並列読み込み
+
+数千件の小さなJSONを読むローダー（Study 1インデックスの更新、Study 2・追実験の集計）で
+共通に使う。ファイル一覧をチャンクに分けてプロセスプールで読み込み・デコードし、
+各ワーカーは行の辞書ではなく列ごとのリストを返す。段階ごと（列挙・パース・結合）の
+所要時間は `IngestReport` として返す。
+"""
+
+import json
+import logging
+import math
+import os
+import time
+from collections.abc import Callable, Iterable
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from pathlib import Path
+from typing import Final
+
+import pandas as pd
+from pydantic import BaseModel, Field
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+# これより少ない件数はプロセス起動のほうが高くつくため同じプロセスで読む
+MIN_PARALLEL_FILES: Final = 256
+# ワーカーあたりのチャンク数（偏りを均すため複数に分ける）
+CHUNKS_PER_WORKER: Final = 4
+
+# (ファイルパス, デコード済みJSON) から1行分の辞書を返す。対象外なら None
+Extractor = Callable[[Path, dict], dict | None]
+
+
+class IngestReport(BaseModel):
+    """読み込み1回分の件数と段階ごとの所要時間"""
+
+    label: str = Field(..., description="ログ表示用の名前")
+    n_files: int = Field(..., description="対象ファイル数")
+    n_rows: int = Field(..., description="抽出された行数")
+    failed: list[Path] = Field(
+        default_factory=list, description="読み込みに失敗したファイル"
+    )
+    workers: int = Field(..., description="使用したプロセス数（1なら同一プロセス）")
+    list_s: float = Field(..., description="ファイル列挙の所要時間（秒）")
+    parse_s: float = Field(..., description="読み込み・デコード・抽出の所要時間（秒）")
+    assemble_s: float = Field(..., description="列の結合の所要時間（秒）")
+
+    def summary(self) -> str:
+        return (
+            f"Ingested {self.label}: {self.n_files} files -> {self.n_rows} rows "
+            f"({len(self.failed)} failed, {self.workers} workers) "
+            f"list {self.list_s:.2f}s, parse {self.parse_s:.2f}s, "
+            f"assemble {self.assemble_s:.2f}s"
+        )
+
+
+def default_workers() -> int:
+    return os.cpu_count() or 1
+
+
+def _load_chunk(
+    paths: list[Path], extract: Extractor, columns: list[str]
+) -> tuple[dict[str, list], list[tuple[Path, str]]]:
+    """チャンク内のファイルを読み込み、列ごとのリストと失敗一覧を返す。"""
+    data_columns: dict[str, list] = {column: [] for column in columns}
+    failures: list[tuple[Path, str]] = []
+    for path in paths:
+        try:
+            with open(path, encoding="utf-8") as f:
+                row = extract(path, json.load(f))
+        except Exception as e:
+            failures.append((path, f"{type(e).__name__}: {e}"))
+            continue
+        if row is None:
+            continue
+        for column in columns:
+            data_columns[column].append(row[column])
+    return data_columns, failures
+
+
+def ingest_json(
+    paths: Iterable[Path],
+    extract: Extractor,
+    columns: list[str],
+    *,
+    label: str,
+    workers: int | None = None,
+) -> tuple[pd.DataFrame, IngestReport]:
+    """JSONファイル群を並列に読み込み、抽出結果をDataFrameで返す。
+
+    Args:
+        paths: 読み込むファイル（globのジェネレータでもよい。列挙時間も計測する）
+        extract: 1ファイル分の抽出関数。プロセス間で渡すためモジュールレベルの関数
+            （または functools.partial）にする
+        columns: 抽出結果の列
+        label: ログ表示用の名前
+        workers: プロセス数（既定: CPUコア数）
+    """
+    start = time.perf_counter()
+    path_list = sorted(paths)
+    listed = time.perf_counter()
+
+    workers = max(1, workers or default_workers())
+    if len(path_list) < MIN_PARALLEL_FILES:
+        workers = 1
+    load = partial(_load_chunk, extract=extract, columns=columns)
+    if workers == 1:
+        results = [load(path_list)]
+    else:
+        chunk_size = math.ceil(len(path_list) / (workers * CHUNKS_PER_WORKER))
+        chunks = [
+            path_list[i : i + chunk_size] for i in range(0, len(path_list), chunk_size)
+        ]
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(load, chunks))
+    parsed = time.perf_counter()
+
+    merged: dict[str, list] = {column: [] for column in columns}
+    failed: list[Path] = []
+    for data_columns, failures in results:
+        for column in columns:
+            merged[column].extend(data_columns[column])
+        for path, error in failures:
+            logger.warning(f"Failed to load {path}: {error}")
+            failed.append(path)
+    df = pd.DataFrame(merged, columns=columns)
+    assembled = time.perf_counter()
+
+    report = IngestReport(
+        label=label,
+        n_files=len(path_list),
+        n_rows=len(df),
+        failed=failed,
+        workers=workers,
+        list_s=listed - start,
+        parse_s=parsed - listed,
+        assemble_s=assembled - parsed,
+    )
+    logger.debug(report.summary())
+    return df, report
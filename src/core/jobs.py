@@ -0,0 +1,522 @@
+"""LLM呼び出しジョブの定義と実行
+
+各ランナー（Study 1/2、追実験A/D）は、未実行の呼び出しを `LlmJob` として列挙し、
+`run_jobs` で実行する。列挙と実行を分けることで、実行計画（--plan）の見積りにも
+同じジョブ一覧を使える。
+"""
+
+import logging
+import os
+import queue
+import threading
+import time
+from collections import Counter, defaultdict, deque
+from collections.abc import Callable, Iterable
+from pathlib import Path
+
+from pydantic import BaseModel, Field, ValidationError
+
+from core.fileio import write_text_atomic
+from core.llm import ENV, PROMPT_PATH, LlmExecution
+from core.progress import ProgressTracker
+from core.shutdown import GracefulShutdown
+from models.llm import ModelId
+from models.temperature_introspection import (
+    LLMConfig,
+    PackedPromptVariables,
+    PackedSentenceEditingResponse,
+    PackedTemperaturePredictionResponse,
+    SentenceEditingResponse,
+    TemperaturePredictionResponse,
+)
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+
+class LlmJob(BaseModel):
+    """1回のLLM呼び出しと、その結果の保存先をまとめたジョブ"""
+
+    model_config = {
+        "arbitrary_types_allowed": True,
+        "frozen": True,
+    }
+
+    experiment: str = Field(..., description="実験名（例: study2/within_model）")
+    config: LLMConfig = Field(..., description="呼び出すモデルと温度")
+    prompt_name: str = Field(..., description="プロンプト名")
+    response_type: type[BaseModel] = Field(..., description="構造化出力の型")
+    kwargs: BaseModel = Field(..., description="プロンプト変数")
+    output_file: Path = Field(..., description="結果の保存先")
+    build_output: Callable[[BaseModel, int], BaseModel] = Field(
+        ..., description="(レスポンス, 処理時間ms) から保存用モデルを組み立てる関数"
+    )
+    duplicates: tuple["LlmJob", ...] = Field(
+        default=(),
+        description="入力が同一のため、このジョブの呼び出し結果を共有するジョブ",
+    )
+    items: tuple["LlmJob", ...] = Field(
+        default=(),
+        description="1回の呼び出しにまとめたジョブ（packing）。空なら通常のジョブ",
+    )
+
+    def expand(self) -> tuple["LlmJob", ...]:
+        """このジョブと、結果を共有するジョブをまとめて返す。
+
+        packing したジョブの場合は、まとめた各ジョブ（と共有分）を返す。
+        """
+        if self.items:
+            return tuple(job for item in self.items for job in item.expand())
+        return (self, *self.duplicates)
+
+
+# 結果モデルがこのフィールドを持つ場合、共有した結果に呼び出し元の unique_id を記録する
+SHARED_FROM_FIELD = "shared_from"
+# 結果モデルがこのフィールドを持つ場合、packing の呼び出しが失敗して通常のプロンプトで
+# 実行した結果に True を記録する
+UNPACKED_FALLBACK_FIELD = "unpacked_fallback"
+
+
+def dedupe_key(job: LlmJob) -> tuple:
+    """同じ呼び出しになるジョブが同じ値になるキー（モデル・温度・プロンプト・入力）"""
+    return (
+        job.config.model_id,
+        job.config.temperature,
+        job.prompt_name,
+        job.response_type,
+        type(job.kwargs),
+        job.kwargs.model_dump_json(),
+    )
+
+
+def dedupe_jobs(jobs: list[LlmJob]) -> list[LlmJob]:
+    """入力が同一のジョブを1回の呼び出しにまとめる。
+
+    各グループの先頭ジョブだけを実行し、残りは `duplicates` として結果を共有する。
+    """
+    groups: dict[tuple, list[LlmJob]] = {}
+    for job in jobs:
+        groups.setdefault(dedupe_key(job), []).extend(job.expand())
+    deduped = [
+        group[0].model_copy(update={"duplicates": tuple(group[1:])})
+        for group in groups.values()
+    ]
+    n_outputs = sum(len(group) for group in groups.values())
+    if n_outputs:
+        logger.info(
+            "Deduplicated %s: %s outputs into %s calls "
+            "(dedup ratio %.3f, %s calls saved)",
+            ", ".join(sorted({job.experiment for job in jobs})),
+            n_outputs,
+            len(deduped),
+            len(deduped) / n_outputs,
+            n_outputs - len(deduped),
+        )
+    return deduped
+
+
+def is_pending(output_file: Path, skip_existing: bool) -> bool:
+    """保存先が未作成（または上書き指定）であれば True を返す。
+
+    空ファイルは書き込み途中で中断されたものとみなし、未作成扱いにする。
+    """
+    if not skip_existing or not output_file.exists():
+        return True
+    return output_file.stat().st_size == 0
+
+
+class OutputIndex:
+    """既存の出力ファイルの索引（ディレクトリごとに1回だけ列挙する）
+
+    多数の出力先を `is_pending` と同じ基準で判定するとき、ファイルごとの
+    stat の代わりに使う。
+    """
+
+    def __init__(self) -> None:
+        self._written: dict[Path, set[str]] = {}
+
+    def _scan(self, directory: Path) -> set[str]:
+        written = self._written.get(directory)
+        if written is None:
+            try:
+                with os.scandir(directory) as entries:
+                    written = {
+                        entry.name
+                        for entry in entries
+                        if entry.is_file() and entry.stat().st_size > 0
+                    }
+            except FileNotFoundError:
+                written = set()
+            self._written[directory] = written
+        return written
+
+    def is_pending(self, output_file: Path, skip_existing: bool) -> bool:
+        if not skip_existing:
+            return True
+        return output_file.name not in self._scan(output_file.parent)
+
+
+def write_output(output_file: Path, result: BaseModel) -> None:
+    """結果モデルをJSONとしてアトミックに保存する。"""
+    write_text_atomic(output_file, result.model_dump_json(indent=2))
+
+
+# packing 用のプロンプトは "{prompt_name}_packed.txt"、レスポンスは item_id 付きのリスト
+PACKED_PROMPT_SUFFIX = "_packed"
+PACKED_RESPONSE_TYPES: dict[type[BaseModel], type[BaseModel]] = {
+    TemperaturePredictionResponse: PackedTemperaturePredictionResponse,
+    SentenceEditingResponse: PackedSentenceEditingResponse,
+}
+
+
+def _pack(items: tuple[LlmJob, ...]) -> LlmJob:
+    """ジョブ群を1回の呼び出しにまとめる（1件ならそのまま返す）。"""
+    first = items[0]
+    if len(items) == 1:
+        return first
+    return first.model_copy(
+        update={
+            "prompt_name": f"{first.prompt_name}{PACKED_PROMPT_SUFFIX}",
+            "response_type": PACKED_RESPONSE_TYPES[first.response_type],
+            "kwargs": PackedPromptVariables(
+                items=[
+                    {"item_id": str(i), **item.kwargs.model_dump(mode="json")}
+                    for i, item in enumerate(items)
+                ]
+            ),
+            "duplicates": (),
+            "items": items,
+        }
+    )
+
+
+def pack_jobs(jobs: list[LlmJob], size: int) -> list[LlmJob]:
+    """同じ実験・モデル・温度・プロンプトのジョブを size 件ずつ1回の呼び出しにまとめる。
+
+    packing 用のプロンプトとレスポンス型が無いジョブはそのまま残す。
+    """
+    if size <= 1:
+        return jobs
+    groups: dict[tuple, list[LlmJob]] = {}
+    for job in jobs:
+        key = (
+            job.experiment,
+            job.config.model_id,
+            job.config.temperature,
+            job.prompt_name,
+            job.response_type,
+        )
+        groups.setdefault(key, []).append(job)
+
+    packed: list[LlmJob] = []
+    for (_, _, _, prompt_name, response_type), group in groups.items():
+        packed_prompt = PROMPT_PATH / f"{prompt_name}{PACKED_PROMPT_SUFFIX}.txt"
+        if response_type not in PACKED_RESPONSE_TYPES or not packed_prompt.exists():
+            packed.extend(group)
+            continue
+        for i in range(0, len(group), size):
+            packed.append(_pack(tuple(group[i : i + size])))
+    if jobs:
+        logger.info(
+            "Packed %s jobs into %s calls (up to %s items per call)",
+            len(jobs),
+            len(packed),
+            size,
+        )
+    return packed
+
+
+def _execute_packed(job: LlmJob) -> list[tuple[LlmJob, BaseModel | None]]:
+    """packing したジョブを実行し、各ジョブの結果に分けて保存する。
+
+    レスポンスの検証に失敗した場合（item_id の欠落を含む）は半分ずつに分けて
+    呼び直し、1件になったら通常のプロンプトで実行する。分けた呼び出しの一部が
+    失敗しても例外にはせず、失敗したジョブ（と共有分）の結果を None として返す。
+    タイムアウトや接続エラーなど検証以外の失敗は、分割せずにそのまま送出する。
+    """
+    start = time.time()
+    try:
+        response = llm_client(job.config).execute(
+            model_type=job.response_type,
+            prompt_name=job.prompt_name,
+            kwargs=job.kwargs,
+        )
+        by_id = {item.item_id: item for item in response.items}  # type: ignore
+        responses = [
+            item.response_type.model_validate(
+                by_id[str(i)].model_dump(exclude={"item_id"})
+            )
+            for i, item in enumerate(job.items)
+        ]
+    except (ValidationError, KeyError) as exc:
+        half = len(job.items) // 2
+        logger.warning(
+            "Packed call failed for %s items (%s: %s); splitting into %s + %s",
+            len(job.items),
+            type(exc).__name__,
+            exc,
+            half,
+            len(job.items) - half,
+        )
+        split_outputs: list[tuple[LlmJob, BaseModel | None]] = []
+        for part in (job.items[:half], job.items[half:]):
+            part_job = _pack(part)
+            try:
+                part_outputs = execute_job(
+                    part_job, unpacked_fallback=not part_job.items
+                )
+            except Exception:
+                logger.exception(
+                    "Failed unpacked call: experiment=%s model=%s output=%s",
+                    part_job.experiment,
+                    part_job.config.model_id.name,
+                    part_job.output_file,
+                )
+                part_outputs = [(output_job, None) for output_job in part_job.expand()]
+            split_outputs.extend(part_outputs)
+        return split_outputs
+
+    # 1件あたりの処理時間は呼び出し時間を件数で割った値とする
+    elapsed_ms = int((time.time() - start) * 1000) // len(job.items)
+    outputs: list[tuple[LlmJob, BaseModel | None]] = []
+    for item, item_response in zip(job.items, responses, strict=True):
+        outputs.extend(save_outputs(item, item_response, elapsed_ms))
+    return outputs
+
+
+_clients: dict[tuple[ModelId, float], LlmExecution] = {}
+_clients_lock = threading.Lock()
+
+
+def llm_client(config: LLMConfig) -> LlmExecution:
+    """(モデル, 温度) ごとのクライアントを使い回す（ジョブごとに作り直さない）。"""
+    key = (config.model_id, config.temperature)
+    with _clients_lock:
+        client = _clients.get(key)
+        if client is None:
+            client = _clients[key] = LlmExecution(config=config)
+        return client
+
+
+def execute_job(
+    job: LlmJob, *, unpacked_fallback: bool = False
+) -> list[tuple[LlmJob, BaseModel | None]]:
+    """ジョブを1件実行し、(ジョブ, 結果モデル) を共有分も含めて返す。
+
+    通常のジョブは失敗すると例外を送出する。packing したジョブは、一部のジョブが
+    失敗しても例外にせず、そのジョブの結果を None とする（`_execute_packed`）。
+    unpacked_fallback: packing の失敗を受けて通常のプロンプトで実行するか
+    """
+    if job.items:
+        return _execute_packed(job)
+    start = time.time()
+    response = llm_client(job.config).execute(
+        model_type=job.response_type,
+        prompt_name=job.prompt_name,
+        kwargs=job.kwargs,
+    )
+    elapsed_ms = int((time.time() - start) * 1000)
+    return list(
+        save_outputs(job, response, elapsed_ms, unpacked_fallback=unpacked_fallback)
+    )
+
+
+def _mark(result: BaseModel, field: str, value: object) -> BaseModel:
+    """結果モデルがフィールドを持つ場合だけ、その値を設定する。"""
+    if field not in type(result).model_fields:
+        return result
+    return result.model_copy(update={field: value})
+
+
+def save_outputs(
+    job: LlmJob,
+    response: BaseModel,
+    elapsed_ms: int,
+    *,
+    unpacked_fallback: bool = False,
+) -> list[tuple[LlmJob, BaseModel]]:
+    """レスポンスから結果モデルを組み立てて保存し、共有分も含めて返す。"""
+    result = job.build_output(response, elapsed_ms)
+    if unpacked_fallback:
+        result = _mark(result, UNPACKED_FALLBACK_FIELD, True)
+    write_output(job.output_file, result)
+    logger.debug(
+        f"Saved result to {job.output_file} elapsed_time: {elapsed_ms / 1000:.2f}s"
+    )
+    outputs = [(job, result)]
+    for duplicate in job.duplicates:
+        shared = _mark(
+            duplicate.build_output(response, elapsed_ms),
+            SHARED_FROM_FIELD,
+            getattr(result, "unique_id", None),
+        )
+        if unpacked_fallback:
+            shared = _mark(shared, UNPACKED_FALLBACK_FIELD, True)
+        write_output(duplicate.output_file, shared)
+        outputs.append((duplicate, shared))
+    return outputs
+
+
+# (ジョブ, 所要時間ms, 出力ごとの結果。失敗した出力の結果は None、
+#  呼び出し全体が失敗した場合は None)
+_Done = tuple[LlmJob, int, list[tuple[LlmJob, BaseModel | None]] | None]
+# 出力1件ごとの完了通知（失敗時の結果は None）
+OutputCallback = Callable[[LlmJob, BaseModel | None], None]
+# 保存した出力1件から、続けて実行するジョブを作る
+FollowUp = Callable[[LlmJob, BaseModel], Iterable[LlmJob]]
+
+
+def _run_one(job: LlmJob, done: queue.Queue[_Done]) -> None:
+    start = time.time()
+    outputs = None
+    try:
+        outputs = execute_job(job)
+    except Exception:
+        logger.exception(
+            "Failed job: experiment=%s model=%s output=%s",
+            job.experiment,
+            job.config.model_id.name,
+            job.output_file,
+        )
+    finally:
+        done.put((job, int((time.time() - start) * 1000), outputs))
+
+
+def run_jobs(
+    jobs: Iterable[LlmJob],
+    progress: ProgressTracker | None = None,
+    shutdown: GracefulShutdown | None = None,
+    concurrency: int | None = None,
+    on_output: OutputCallback | None = None,
+    max_pending: int | None = None,
+    follow_up: FollowUp | None = None,
+) -> tuple[int, int]:
+    """ジョブを実行し、保存/失敗した出力数 (saved, failed) を返す。
+
+    ジョブはモデルごとのキューに振り分け、各モデルで最大 concurrency 件
+    （既定: ENV.max_concurrency）を並行して投入する。
+    progress を渡す場合、ジョブは事前に `progress.add_jobs` で登録しておく。
+    shutdown に停止要求が来たら新規投入を止め、実行中のジョブを
+    `shutdown.drain_timeout_s` 秒まで待ってから戻る。未完了のジョブは
+    shutdown に記録され、終了時のチェックポイントに書き出される。
+    on_output は出力1件（共有分を含む）が確定するたびにディスパッチ側のスレッドで
+    呼ばれる（失敗時の結果は None）。
+
+    max_pending を指定すると jobs を先頭から必要な分だけ取り出し、
+    キュー待ちのジョブが max_pending 件を超えないようにする（ジェネレータを渡せば、
+    列挙と実行が並行して進む）。停止時に未取り出しのジョブは記録されない。
+
+    follow_up は保存した出力1件ごとに呼ばれ、返したジョブはその場でモデルごとの
+    キューに追加される（progress にも登録される）。前段の結果をディスクから
+    読み直さずに次段の呼び出しへ渡すために使う。
+    """
+    concurrency = max(1, concurrency or ENV.max_concurrency)
+    if max_pending is not None:
+        max_pending = max(1, max_pending)
+    queues: dict[ModelId, deque[LlmJob]] = defaultdict(deque)
+    pending_jobs = iter(jobs)
+    n_queued = 0
+    exhausted = False
+
+    def refill() -> None:
+        nonlocal n_queued, exhausted
+        while not exhausted and (max_pending is None or n_queued < max_pending):
+            job = next(pending_jobs, None)
+            if job is None:
+                exhausted = True
+                return
+            queues[job.config.model_id].append(job)
+            n_queued += 1
+
+    refill()
+    in_flight: dict[Path, LlmJob] = {}
+    in_flight_by_model: Counter[ModelId] = Counter()
+    done: queue.Queue[_Done] = queue.Queue()
+    drain_deadline: float | None = None
+
+    saved = 0
+    failed = 0
+    try:
+        while any(queues.values()) or in_flight or not exhausted:
+            stopping = shutdown is not None and shutdown.requested
+            if not stopping:
+                refill()
+            for model_id, model_queue in queues.items():
+                while (
+                    model_queue
+                    and in_flight_by_model[model_id] < concurrency
+                    and not stopping
+                ):
+                    job = model_queue.popleft()
+                    n_queued -= 1
+                    in_flight[job.output_file] = job
+                    in_flight_by_model[model_id] += 1
+                    # デーモンスレッドにして、打ち切ったジョブが終了を妨げないようにする
+                    threading.Thread(
+                        target=_run_one, args=(job, done), daemon=True
+                    ).start()
+
+            if stopping:
+                assert shutdown is not None
+                if drain_deadline is None:
+                    drain_deadline = time.time() + shutdown.drain_timeout_s
+                if not in_flight or time.time() >= drain_deadline:
+                    break
+            elif not in_flight and not any(queues.values()):
+                continue
+
+            try:
+                # シグナルに反応できるよう、短い間隔で待つ
+                job, latency_ms, outputs = done.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            in_flight.pop(job.output_file, None)
+            in_flight_by_model[job.config.model_id] -= 1
+            if outputs is None:
+                outputs = [(output_job, None) for output_job in job.expand()]
+            # packing したジョブは一部だけ失敗することがあるため、出力ごとに数える
+            failed_files = set()
+            for output_job, result in outputs:
+                if result is None:
+                    failed += 1
+                    failed_files.add(output_job.output_file)
+                else:
+                    saved += 1
+                if shutdown is not None:
+                    if result is None:
+                        shutdown.mark_unfinished(output_job, "failed")
+                    else:
+                        shutdown.mark_finished(output_job)
+            if progress is not None:
+                n_failed = sum(
+                    item.output_file in failed_files for item in job.items or (job,)
+                )
+                progress.record(job, latency_ms, n_failed=n_failed)
+            if follow_up is not None:
+                for output_job, result in outputs:
+                    if result is None:
+                        continue
+                    next_jobs = list(follow_up(output_job, result))
+                    if progress is not None:
+                        progress.add_jobs(next_jobs)
+                    for next_job in next_jobs:
+                        queues[next_job.config.model_id].append(next_job)
+                        n_queued += 1
+            if on_output is not None:
+                for output_job, result in outputs:
+                    on_output(output_job, result)
+    finally:
+        if shutdown is not None:
+            for job in in_flight.values():
+                for output_job in job.expand():
+                    shutdown.mark_unfinished(output_job, "abandoned")
+            for model_queue in queues.values():
+                for job in model_queue:
+                    for output_job in job.expand():
+                        shutdown.mark_unfinished(output_job, "not_started")
+        if in_flight:
+            logger.warning(
+                "Abandoned %s in-flight jobs after drain timeout", len(in_flight)
+            )
+
+    return saved, failed
@@ -53,8 +53,10 @@ class LlmExecution:
         else:
             raise ValueError("モデルの種類がLM_STUDIO, AWS_BEDROCK")
 
-    def execute[T](self, model_type: T, prompt_name: str, kwargs: BaseModel) -> T:
+    def execute[T: BaseModel](
+        self, model_type: type[T], prompt_name: str, kwargs: BaseModel
+    ) -> T:
         """LLMを実行し、結果を返す"""
-        structured_llm = self.llm.with_structured_output(model_type)  # type: ignore
+        structured_llm = self.llm.with_structured_output(model_type)
         response = structured_llm.invoke(load_prompt(prompt_name, kwargs))  # type: ignore
         return response  # type: ignore
@@ -0,0 +1,216 @@
+"""packing（複数入力を1回の呼び出しにまとめる）の設定と A/B チェック
+
+--pack K でジョブを K 件ずつまとめて実行する（`core.jobs.pack_jobs`）。
+まとめた入力の一部を通常の呼び出しでも実行し、同じ入力に対する結果を
+比べることで、packing による精度や出力のずれを定量化する。
+通常呼び出しの結果は `{出力ルート}/pack_ab/` 以下に保存し、本来の結果の
+集計には含めない。
+"""
+
+import argparse
+import json
+import logging
+from pathlib import Path
+from typing import Final
+
+import numpy as np
+import pandas as pd
+
+from core.jobs import UNPACKED_FALLBACK_FIELD, LlmJob, pack_jobs, run_jobs
+from core.progress import ProgressTracker
+from core.shutdown import GracefulShutdown
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+AB_DIRNAME: Final = "pack_ab"
+AB_REPORT_FILENAME: Final = "report.csv"
+
+
+def add_packing_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument(
+        "--pack",
+        type=int,
+        default=1,
+        help="Send up to K inputs per LLM call (default: 1, no packing)",
+    )
+    parser.add_argument(
+        "--pack-ab-fraction",
+        type=float,
+        default=0.05,
+        help="Fraction of packed inputs also run unpacked to measure drift "
+        "(default: 0.05)",
+    )
+    parser.add_argument(
+        "--pack-ab-seed",
+        type=int,
+        default=0,
+        help="Seed for choosing the A/B check inputs (default: 0)",
+    )
+
+
+def ab_control_jobs(
+    jobs: list[LlmJob],
+    output_root: Path,
+    fraction: float,
+    rng: np.random.Generator,
+) -> list[LlmJob]:
+    """packing したジョブから一部の入力を選び、通常呼び出しで実行するジョブを作る。"""
+    controls: list[LlmJob] = []
+    for job in jobs:
+        for item in job.items:
+            if rng.random() >= fraction:
+                continue
+            controls.append(
+                item.model_copy(
+                    update={
+                        "experiment": f"{item.experiment}/unpacked",
+                        "output_file": output_root
+                        / AB_DIRNAME
+                        / item.output_file.relative_to(output_root),
+                        "duplicates": (),
+                    }
+                )
+            )
+    return controls
+
+
+def ab_metrics(data: dict) -> dict[str, float]:
+    """結果JSONから、packing の有無で比べる指標を取り出す。"""
+    if "is_correct" in data:
+        return {"accuracy": float(data["is_correct"])}
+    if "info_plus" in data:
+        return {
+            "info_plus_chars": float(len(data["info_plus"])),
+            "info_minus_chars": float(len(data["info_minus"])),
+        }
+    return {}
+
+
+def _judgment(data: dict) -> str | None:
+    return data.get("predicted_judgment")
+
+
+def ab_report(controls: list[LlmJob], output_root: Path) -> pd.DataFrame:
+    """packing あり/なしの結果を入力ごとに対応付け、指標の差をまとめる。
+
+    packing の呼び出しが失敗して通常のプロンプトで実行された入力（結果の
+    unpacked_fallback が True）は、packing した側に数えない。
+    """
+    rows: list[dict] = []
+    for control in controls:
+        packed_file = output_root / control.output_file.relative_to(
+            output_root / AB_DIRNAME
+        )
+        if not packed_file.exists() or not control.output_file.exists():
+            continue
+        packed = json.loads(packed_file.read_text(encoding="utf-8"))
+        if packed.get(UNPACKED_FALLBACK_FIELD):
+            continue
+        unpacked = json.loads(control.output_file.read_text(encoding="utf-8"))
+        experiment = control.experiment.removesuffix("/unpacked")
+        agree = _judgment(packed) == _judgment(unpacked)
+        for metric, packed_value in ab_metrics(packed).items():
+            rows.append(
+                {
+                    "experiment": experiment,
+                    "metric": metric,
+                    "packed": packed_value,
+                    "unpacked": ab_metrics(unpacked)[metric],
+                    "agree": agree if _judgment(packed) is not None else np.nan,
+                }
+            )
+    if not rows:
+        return pd.DataFrame(
+            columns=[
+                "experiment",
+                "metric",
+                "n",
+                "packed_mean",
+                "unpacked_mean",
+                "delta",
+                "delta_se",
+                "agreement",
+            ]
+        )
+
+    df = pd.DataFrame(rows)
+    df["delta"] = df["packed"] - df["unpacked"]
+    report = (
+        df.groupby(["experiment", "metric"])
+        .agg(
+            n=("delta", "size"),
+            packed_mean=("packed", "mean"),
+            unpacked_mean=("unpacked", "mean"),
+            delta=("delta", "mean"),
+            delta_sd=("delta", "std"),
+            agreement=("agree", "mean"),
+        )
+        .reset_index()
+    )
+    # 同じ入力どうしの差（対応のある差）の標準誤差
+    report["delta_se"] = report["delta_sd"].fillna(0.0) / np.sqrt(report["n"])
+    return report.drop(columns=["delta_sd"])[
+        [
+            "experiment",
+            "metric",
+            "n",
+            "packed_mean",
+            "unpacked_mean",
+            "delta",
+            "delta_se",
+            "agreement",
+        ]
+    ].round(4)
+
+
+def run_ab_check(
+    controls: list[LlmJob],
+    output_root: Path,
+    progress: ProgressTracker | None = None,
+    shutdown: GracefulShutdown | None = None,
+) -> pd.DataFrame:
+    """A/B チェック用の通常呼び出しを実行し、レポートを保存して返す。"""
+    if not controls:
+        return ab_report([], output_root)
+    logger.info("Running %s unpacked calls for the packing A/B check", len(controls))
+    if progress is not None:
+        progress.add_jobs(controls)
+    run_jobs(controls, progress=progress, shutdown=shutdown)
+
+    report = ab_report(controls, output_root)
+    report_file = output_root / AB_DIRNAME / AB_REPORT_FILENAME
+    report_file.parent.mkdir(parents=True, exist_ok=True)
+    report.to_csv(report_file, index=False)
+    logger.info("Packing A/B check (packed - unpacked):\n%s", report.to_string())
+    logger.info("Saved packing A/B report: %s", report_file)
+    return report
+
+
+class Packing:
+    """ランナーの引数から packing と A/B チェック対象の選択をまとめて行う。"""
+
+    def __init__(self, args: argparse.Namespace, output_root: Path) -> None:
+        self.size = args.pack
+        self.fraction = args.pack_ab_fraction if args.pack > 1 else 0.0
+        self.output_root = output_root
+        self.rng = np.random.default_rng(args.pack_ab_seed)
+        self.controls: list[LlmJob] = []
+
+    def pack(self, jobs: list[LlmJob]) -> list[LlmJob]:
+        """ジョブをまとめ、A/B チェックの対象を選んでおく。"""
+        packed = pack_jobs(jobs, self.size)
+        if self.fraction > 0:
+            self.controls.extend(
+                ab_control_jobs(packed, self.output_root, self.fraction, self.rng)
+            )
+        return packed
+
+    def run_ab_check(
+        self,
+        progress: ProgressTracker | None = None,
+        shutdown: GracefulShutdown | None = None,
+    ) -> None:
+        if self.size <= 1 or (shutdown is not None and shutdown.requested):
+            return
+        run_ab_check(self.controls, self.output_root, progress, shutdown)
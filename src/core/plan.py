@@ -0,0 +1,216 @@
+"""実行計画（--plan）: 未実行ジョブの所要時間とコストを見積もる
+
+既存出力の `procession_time_ms` からモデルごとの1呼び出しあたりの所要時間を求め、
+未実行ジョブ数と設定済みの同時実行数から壁時計時間を見積もる。
+Bedrockモデルについてはプロンプト長と過去の出力長からトークン数とコストを概算する。
+"""
+
+import json
+import logging
+import math
+from pathlib import Path
+from typing import Final
+
+import pandas as pd
+
+from core.jobs import LlmJob
+from core.llm import ENV, load_prompt
+from models.llm import ModelId, ModelType
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+# Bedrock オンデマンド料金の概算（USD / 1M tokens: 入力, 出力）
+BEDROCK_PRICING_USD_PER_MTOK: Final[dict[ModelId, tuple[float, float]]] = {
+    ModelId.NOVA_MICRO: (0.035, 0.14),
+    ModelId.NOVA_2_LITE: (0.30, 2.50),
+    ModelId.CLAUDE_CODE_HAIKU_4_5: (1.00, 5.00),
+}
+# 日本語は概ね1文字≒1トークン（保守的な見積り）
+CHARS_PER_TOKEN: Final = 1.0
+# 履歴が全く無い場合の既定値
+DEFAULT_LATENCY_MS: Final = 10_000
+DEFAULT_OUTPUT_CHARS: Final = 300
+
+MODEL_BY_VALUE: Final = {model.value: model for model in ModelId}
+
+
+def task_kind(prompt_name: str) -> str:
+    """プロンプト名から処理の種類（生成 or 予測）を返す。"""
+    return "generation" if prompt_name == "study1" else "prediction"
+
+
+def collect_history(output_root: Path) -> pd.DataFrame:
+    """既存の結果JSONから (model, kind, latency_ms, output_chars) を集める。"""
+    rows: list[dict] = []
+    for json_file in output_root.rglob("*.json"):
+        try:
+            with open(json_file, encoding="utf-8") as f:
+                data = json.load(f)
+            condition = data.get("condition")
+            if not isinstance(condition, dict):
+                continue
+            # self_reflection はLLM呼び出しを伴わない
+            if condition.get("condition_type") == "self_reflection":
+                continue
+            # 重複排除で共有した結果は呼び出しの実測ではない
+            if data.get("shared_from"):
+                continue
+            latency_ms = data.get("procession_time_ms")
+            if not latency_ms or latency_ms <= 0:
+                continue
+            model_value = condition.get("predictor_model_id") or condition.get(
+                "model_id"
+            )
+            if model_value is None:
+                continue
+            model_id = MODEL_BY_VALUE.get(model_value)
+            if model_id is None:
+                continue
+
+            if "response" in data:
+                response = data["response"]
+                kind = "generation"
+                output_chars = len(response.get("generated_sentence", "")) + len(
+                    response.get("reasoning", "")
+                )
+            else:
+                kind = "prediction"
+                output_chars = len(data.get("reasoning", ""))
+
+            rows.append(
+                {
+                    "model": model_id.name,
+                    "kind": kind,
+                    "latency_ms": int(latency_ms),
+                    "output_chars": output_chars,
+                }
+            )
+        except Exception:
+            logger.debug(f"Skipped history file: {json_file}")
+    return pd.DataFrame(rows, columns=["model", "kind", "latency_ms", "output_chars"])
+
+
+def _lookup_history(
+    history: pd.DataFrame, model: str, kind: str
+) -> tuple[float, float, str]:
+    """(平均所要時間ms, 平均出力文字数, 参照元) を返す。"""
+    candidates = [
+        ("history", (history["model"] == model) & (history["kind"] == kind)),
+        ("history(other task)", history["model"] == model),
+        ("fallback(all models)", history["kind"] == kind),
+    ]
+    for source, mask in candidates:
+        subset = history[mask]
+        if not subset.empty:
+            return (
+                float(subset["latency_ms"].mean()),
+                float(subset["output_chars"].mean()),
+                source,
+            )
+    return float(DEFAULT_LATENCY_MS), float(DEFAULT_OUTPUT_CHARS), "default"
+
+
+def estimate_cost_usd(
+    model_id: ModelId, input_tokens: float, output_tokens: float
+) -> float:
+    """Bedrockモデルのコストを概算する。LM Studio（ローカル）は0とする。"""
+    if model_id.model_type() != ModelType.AWS_BEDROCK:
+        return 0.0
+    price_in, price_out = BEDROCK_PRICING_USD_PER_MTOK.get(model_id, (0.0, 0.0))
+    return (input_tokens * price_in + output_tokens * price_out) / 1_000_000
+
+
+def build_plan(
+    jobs: list[LlmJob],
+    history: pd.DataFrame,
+    concurrency: int,
+) -> pd.DataFrame:
+    """(experiment, model) ごとの件数・所要時間・コスト見積りを返す。"""
+    columns = [
+        "experiment",
+        "model",
+        "n_jobs",
+        "latency_s",
+        "latency_source",
+        "serial_hours",
+        "wall_hours",
+        "input_tokens",
+        "output_tokens",
+        "cost_usd",
+    ]
+    if not jobs:
+        return pd.DataFrame(columns=columns)
+
+    job_rows = [
+        {
+            "experiment": job.experiment,
+            "model_id": job.config.model_id,
+            "kind": task_kind(job.prompt_name),
+            "input_chars": len(load_prompt(job.prompt_name, job.kwargs)),
+            # packing したジョブは1回の呼び出しで複数件を出力する
+            "n_items": max(1, len(job.items)),
+        }
+        for job in jobs
+    ]
+    job_df = pd.DataFrame(job_rows)
+
+    rows = []
+    for (experiment, model_id, kind), g in job_df.groupby(
+        ["experiment", "model_id", "kind"], sort=False
+    ):
+        latency_ms, output_chars, source = _lookup_history(history, model_id.name, kind)
+        n_jobs = len(g)
+        n_items = int(g["n_items"].sum())
+        serial_s = n_items * latency_ms / 1000
+        input_tokens = float(g["input_chars"].sum()) / CHARS_PER_TOKEN
+        output_tokens = n_items * output_chars / CHARS_PER_TOKEN
+        rows.append(
+            {
+                "experiment": experiment,
+                "model": model_id.name,
+                "n_jobs": n_jobs,
+                "latency_s": round(latency_ms / 1000, 2),
+                "latency_source": source,
+                "serial_hours": round(serial_s / 3600, 3),
+                "wall_hours": round(serial_s / min(concurrency, n_jobs) / 3600, 3),
+                "input_tokens": int(input_tokens),
+                "output_tokens": int(output_tokens),
+                "cost_usd": round(
+                    estimate_cost_usd(model_id, input_tokens, output_tokens), 4
+                ),
+            }
+        )
+    return pd.DataFrame(rows, columns=columns)
+
+
+def report_plan(
+    jobs: list[LlmJob],
+    history_root: Path,
+    concurrency: int | None = None,
+) -> pd.DataFrame:
+    """未実行ジョブの見積りをログに出力し、見積り表を返す。"""
+    concurrency = max(1, concurrency or ENV.max_concurrency)
+    history = collect_history(history_root)
+    plan = build_plan(jobs, history, concurrency)
+
+    logger.info("=== Execution plan ===")
+    logger.info(f"History: {len(history)} results under {history_root}")
+    logger.info(f"Pending jobs: {len(jobs)}  concurrency per model: {concurrency}")
+    if plan.empty:
+        logger.info("Nothing to run.")
+        return plan
+
+    logger.info("\n%s", plan.to_string(index=False))
+    per_model_hours = plan.groupby("model")["wall_hours"].sum()
+    # モデルごとのキューは並行して動くため、全ジョブを一度に投入する
+    # ランナー（Study 2）は最大値、段階ごとに順に投入するランナーは合計に近づく
+    logger.info(
+        "Projected wall time: %.2f h (models sequential), %.2f h (models parallel)",
+        float(per_model_hours.sum()),
+        float(per_model_hours.max()),
+    )
+    total_cost = float(plan["cost_usd"].sum())
+    if not math.isclose(total_cost, 0.0):
+        logger.info(f"Projected Bedrock cost: ${total_cost:.2f}")
+    return plan
@@ -0,0 +1,264 @@
+"""実行中の進捗表示と進捗ファイルの出力
+
+(experiment, model) ごとに完了/失敗/残り件数、直近のスループット、レイテンシ分位点、
+ETAを集計する。一定間隔でターミナルに表を描画し、同じ内容を他ツールから
+ポーリングできるJSONファイルとして書き出す。
+"""
+
+import datetime
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from collections import deque
+from collections.abc import Iterable
+from pathlib import Path
+from types import TracebackType
+from typing import TYPE_CHECKING, Any, Final
+
+import numpy as np
+
+from core.fileio import write_text_atomic
+
+if TYPE_CHECKING:
+    from core.jobs import LlmJob
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+# スループット算出に使う直近の時間窓（秒）
+RATE_WINDOW_S: Final = 60.0
+# レイテンシ分位点に使う直近の件数
+LATENCY_WINDOW: Final = 500
+
+
+def _format_duration(seconds: float | None) -> str:
+    if seconds is None or not np.isfinite(seconds):
+        return "--:--:--"
+    seconds = int(seconds)
+    return f"{seconds // 3600:02d}:{seconds % 3600 // 60:02d}:{seconds % 60:02d}"
+
+
+class _GroupStats:
+    """(experiment, model) 単位の集計"""
+
+    def __init__(self) -> None:
+        self.total = 0
+        self.completed = 0
+        self.failed = 0
+        self.latencies_ms: deque[int] = deque(maxlen=LATENCY_WINDOW)
+        self.finished_at: deque[float] = deque()
+        self.last_finished_at: float | None = None
+
+    def record(self, now: float, latency_ms: int, completed: int, failed: int) -> None:
+        self.completed += completed
+        self.failed += failed
+        if completed:
+            self.latencies_ms.append(latency_ms)
+        self.finished_at.extend([now] * (completed + failed))
+        self.last_finished_at = now
+
+    def rate(self, now: float, elapsed_s: float) -> float:
+        while self.finished_at and now - self.finished_at[0] > RATE_WINDOW_S:
+            self.finished_at.popleft()
+        window = min(RATE_WINDOW_S, max(elapsed_s, 1e-9))
+        return len(self.finished_at) / window
+
+
+class ProgressTracker:
+    """ランナー全体の進捗を集計し、ターミナルとJSONファイルに出力する。"""
+
+    def __init__(
+        self,
+        title: str,
+        progress_file: Path | None = None,
+        refresh_interval_s: float = 2.0,
+        log_interval_s: float = 30.0,
+    ) -> None:
+        self.title = title
+        self.progress_file = progress_file
+        self.refresh_interval_s = refresh_interval_s
+        self.log_interval_s = log_interval_s
+        self.started_at = time.time()
+        self._groups: dict[tuple[str, str], _GroupStats] = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+        self._is_tty = sys.stderr.isatty()
+        self._rendered_lines = 0
+        self._last_logged_at = 0.0
+
+    def __enter__(self) -> "ProgressTracker":
+        self.start()
+        return self
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc: BaseException | None,
+        tb: TracebackType | None,
+    ) -> None:
+        self.close()
+
+    def _group(self, experiment: str, model: str) -> _GroupStats:
+        key = (experiment, model)
+        if key not in self._groups:
+            self._groups[key] = _GroupStats()
+        return self._groups[key]
+
+    def add_jobs(self, jobs: Iterable["LlmJob"]) -> None:
+        """実行予定のジョブを登録する（packing したジョブはまとめた件数で数える）。"""
+        with self._lock:
+            for job in jobs:
+                group = self._group(job.experiment, job.config.model_id.name)
+                group.total += len(job.items) or 1
+
+    def record(self, job: "LlmJob", latency_ms: int, n_failed: int = 0) -> None:
+        """ジョブ1件の完了を記録する（n_failed: 失敗した件数）。
+
+        packing したジョブは、まとめた件数を完了と失敗に振り分ける。
+        """
+        n_items = len(job.items) or 1
+        with self._lock:
+            group = self._group(job.experiment, job.config.model_id.name)
+            group.record(time.time(), latency_ms, n_items - n_failed, n_failed)
+
+    def snapshot(self) -> dict:
+        """現在の進捗を辞書で返す（進捗ファイルの内容）。"""
+        now = time.time()
+        elapsed_s = now - self.started_at
+        groups: list[dict[str, Any]] = []
+        with self._lock:
+            for (experiment, model), g in sorted(self._groups.items()):
+                pending = max(g.total - g.completed - g.failed, 0)
+                rate = g.rate(now, elapsed_s)
+                latencies = np.asarray(g.latencies_ms, dtype=float) / 1000
+                p50, p90, p99 = (
+                    np.percentile(latencies, [50, 90, 99]).tolist()
+                    if latencies.size
+                    else [None, None, None]
+                )
+                groups.append(
+                    {
+                        "experiment": experiment,
+                        "model": model,
+                        "total": g.total,
+                        "completed": g.completed,
+                        "failed": g.failed,
+                        "pending": pending,
+                        "requests_per_s": round(rate, 4),
+                        "latency_p50_s": p50,
+                        "latency_p90_s": p90,
+                        "latency_p99_s": p99,
+                        "eta_s": (pending / rate) if rate > 0 else None,
+                        # 残りがあるのに完了が途絶えている時間（停滞の検知用）
+                        "idle_s": (
+                            None
+                            if pending == 0
+                            else now - (g.last_finished_at or self.started_at)
+                        ),
+                    }
+                )
+
+        total = sum(g["total"] for g in groups)
+        completed = sum(g["completed"] for g in groups)
+        failed = sum(g["failed"] for g in groups)
+        pending = sum(g["pending"] for g in groups)
+        rate = sum(g["requests_per_s"] for g in groups)
+        return {
+            "title": self.title,
+            "pid": os.getpid(),
+            "started_at": datetime.datetime.fromtimestamp(
+                self.started_at, datetime.UTC
+            ).isoformat(),
+            "updated_at": datetime.datetime.fromtimestamp(
+                now, datetime.UTC
+            ).isoformat(),
+            "elapsed_s": elapsed_s,
+            "totals": {
+                "total": total,
+                "completed": completed,
+                "failed": failed,
+                "pending": pending,
+                "requests_per_s": round(rate, 4),
+                "eta_s": (pending / rate) if rate > 0 else None,
+            },
+            "groups": groups,
+        }
+
+    def render(self, snapshot: dict) -> str:
+        """スナップショットをターミナル表示用の表に整形する。"""
+
+        def seconds(value: float | None) -> str:
+            return f"{value:6.1f}" if value is not None else "     -"
+
+        header = (
+            f"{'experiment':<26} {'model':<22} {'done':>6} {'fail':>5} "
+            f"{'pend':>6} {'req/s':>6} {'p50':>6} {'p90':>6} {'p99':>6} "
+            f"{'idle':>6} {'ETA':>9}"
+        )
+        lines = [
+            f"[{snapshot['title']}] elapsed {_format_duration(snapshot['elapsed_s'])}",
+            header,
+        ]
+        for g in snapshot["groups"]:
+            lines.append(
+                f"{g['experiment']:<26} {g['model']:<22} {g['completed']:>6} "
+                f"{g['failed']:>5} {g['pending']:>6} {g['requests_per_s']:>6.2f} "
+                f"{seconds(g['latency_p50_s'])} {seconds(g['latency_p90_s'])} "
+                f"{seconds(g['latency_p99_s'])} {seconds(g['idle_s'])} "
+                f"{_format_duration(g['eta_s']):>9}"
+            )
+        totals = snapshot["totals"]
+        lines.append(
+            f"{'TOTAL':<49} {totals['completed']:>6} {totals['failed']:>5} "
+            f"{totals['pending']:>6} {totals['requests_per_s']:>6.2f} "
+            f"{'':>27} {_format_duration(totals['eta_s']):>9}"
+        )
+        return "\n".join(lines)
+
+    def refresh(self, force_log: bool = False) -> None:
+        """進捗ファイルを更新し、ターミナル表示を描画する。"""
+        snapshot = self.snapshot()
+        if self.progress_file is not None:
+            self._write_progress_file(snapshot)
+
+        table = self.render(snapshot)
+        if self._is_tty:
+            # 前回描画分を消してから再描画する
+            if self._rendered_lines:
+                sys.stderr.write(f"\x1b[{self._rendered_lines}F\x1b[J")
+            sys.stderr.write(table + "\n")
+            sys.stderr.flush()
+            self._rendered_lines = table.count("\n") + 1
+        elif force_log or time.time() - self._last_logged_at >= self.log_interval_s:
+            logger.info("\n%s", table)
+            self._last_logged_at = time.time()
+
+    def _write_progress_file(self, snapshot: dict) -> None:
+        assert self.progress_file is not None
+        write_text_atomic(
+            self.progress_file, json.dumps(snapshot, ensure_ascii=False, indent=2)
+        )
+
+    def _loop(self) -> None:
+        while not self._stop.wait(self.refresh_interval_s):
+            try:
+                self.refresh()
+            except Exception:
+                logger.exception("Failed to refresh progress")
+
+    def start(self) -> None:
+        """描画スレッドを開始する。"""
+        self._thread = threading.Thread(target=self._loop, name="progress", daemon=True)
+        self._thread.start()
+
+    def close(self) -> None:
+        """描画スレッドを止め、最終状態を出力する。"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.refresh(force_log=True)
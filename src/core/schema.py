@@ -0,0 +1,114 @@
+"""結果DataFrameのコンパクトな列型
+
+モデル・プロンプト種別・ターゲット・条件・判定の列は、列挙型（`ModelId` など）の
+値をカテゴリとする categorical 型で持つ（カテゴリが128未満なので各行は int8 のコード）。
+生成文や元結果のIDは、重複を1つにまとめた categorical 型（文字列への参照）で持ち、
+温度は float32 で持つ。
+
+カテゴリは文字列の昇順に並べるため、並べ替えや groupby の順は文字列の列と変わらない。
+列挙型に無い値（古い結果のモデルIDなど）が現れた場合はカテゴリに加え、値は落とさない。
+float32 の温度は閾値と比べる前に `temperature_values` で float64 に戻す。
+"""
+
+from collections.abc import Iterable, Mapping
+from enum import Enum
+from typing import Final
+
+import numpy as np
+import pandas as pd
+from pandas.api.types import union_categoricals
+
+from models.llm import ModelId
+from models.temperature_introspection import (
+    PromptType,
+    Study2ConditionType,
+    Target,
+    TemperatureJudgment,
+)
+
+TEMPERATURE_DTYPE: Final = np.float32
+# float32 の温度を float64 に戻すときに丸める桁（記録される温度の桁より十分多い）
+TEMPERATURE_DECIMALS: Final = 6
+
+
+def enum_names(enum: type[Enum]) -> list[str]:
+    return [member.name for member in enum]
+
+
+def enum_values(enum: type[Enum]) -> list[str]:
+    return [member.value for member in enum]
+
+
+# 列 → 既知のカテゴリ（None ならデータに現れた値だけをカテゴリにする）
+Categories = Mapping[str, list[str] | None]
+
+STUDY1_CATEGORIES: Final[Categories] = {
+    "model": enum_names(ModelId),
+    "target": enum_names(Target),
+    "prompt_type": enum_names(PromptType),
+    "model_id": enum_values(ModelId),
+    "target_value": enum_values(Target),
+    "prompt_type_value": enum_values(PromptType),
+    "judgment": enum_values(TemperatureJudgment),
+    "unique_id": None,
+    "generated_sentence": None,
+}
+PREDICTION_CATEGORIES: Final[Categories] = {
+    "condition_type": enum_values(Study2ConditionType),
+    "generator_model": enum_values(ModelId),
+    "predictor_model": enum_values(ModelId),
+    "source_unique_id": None,
+    "prompt_type": enum_values(PromptType),
+    "target": enum_values(Target),
+    "predicted_judgment": enum_values(TemperatureJudgment),
+    "recorded_expected_judgment": enum_values(TemperatureJudgment),
+    "expected_judgment": enum_values(TemperatureJudgment),
+    "variant": enum_values(Study2ConditionType),
+}
+
+
+def to_categorical(values: pd.Series, categories: list[str] | None) -> pd.Series:
+    """既知のカテゴリに、実際に現れた未知の値を加えた categorical 型に変換する。"""
+    observed = set(values.dropna().unique())
+    known = set(categories or [])
+    return values.astype(pd.CategoricalDtype(sorted(known | observed)))
+
+
+def compact_frame(df: pd.DataFrame, categories: Categories) -> pd.DataFrame:
+    """categories にある列を categorical 型に、temperature を float32 にする。"""
+    columns = {
+        column: to_categorical(df[column], column_categories)
+        for column, column_categories in categories.items()
+        if column in df.columns
+    }
+    if "temperature" in df.columns:
+        columns["temperature"] = df["temperature"].astype(TEMPERATURE_DTYPE)
+    return df.assign(**columns)
+
+
+def concat_compact(frames: Iterable[pd.DataFrame]) -> pd.DataFrame:
+    """`compact_frame` した DataFrame を、categorical 型を保ったまま縦に結合する。
+
+    チャンクごとにカテゴリが異なっても（未知の値があっても）カテゴリを合併する。
+    """
+    frames = list(frames)
+    if len(frames) <= 1:
+        return frames[0] if frames else pd.DataFrame()
+    columns = {
+        column: pd.Series(
+            union_categoricals(
+                [frame[column] for frame in frames], sort_categories=True
+            )
+        )
+        for column, dtype in frames[0].dtypes.items()
+        if isinstance(dtype, pd.CategoricalDtype)
+    }
+    combined = pd.concat(
+        [frame.drop(columns=list(columns)) for frame in frames], ignore_index=True
+    )
+    return combined.assign(**columns)[frames[0].columns]
+
+
+def temperature_values(temperature: pd.Series) -> np.ndarray:
+    """float32 の温度を、記録された値（0.2 など）の float64 に戻す。"""
+    return np.round(temperature.to_numpy(dtype=float), TEMPERATURE_DECIMALS)
@@ -0,0 +1,148 @@
+"""シグナルによる安全な停止とチェックポイント
+
+SIGINT/SIGTERM を受けると新規ジョブの投入を止め、実行中の呼び出しを
+一定時間だけ待ってから終了する。終了時に未完了ジョブ（未投入・失敗・打ち切り）を
+チェックポイントファイルに書き出し、次回実行時に再開状況を報告する。
+再開そのものは既存出力のスキップで行われるため、同じ引数で再実行すればよい。
+"""
+
+import datetime
+import json
+import logging
+import signal
+import sys
+import threading
+from pathlib import Path
+from types import FrameType, TracebackType
+from typing import TYPE_CHECKING
+
+from core.fileio import write_text_atomic
+
+if TYPE_CHECKING:
+    from core.jobs import LlmJob
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+HANDLED_SIGNALS = (signal.SIGINT, signal.SIGTERM)
+
+
+class GracefulShutdown:
+    """停止要求の受付と、未完了ジョブのチェックポイント書き出しを行う。"""
+
+    def __init__(
+        self,
+        checkpoint_file: Path | None = None,
+        drain_timeout_s: float = 60.0,
+    ) -> None:
+        self.checkpoint_file = checkpoint_file
+        self.drain_timeout_s = drain_timeout_s
+        self._event = threading.Event()
+        self._lock = threading.Lock()
+        self._unfinished: dict[Path, tuple[LlmJob, str]] = {}
+        self._previous_handlers: dict[int, object] = {}
+
+    @property
+    def requested(self) -> bool:
+        """停止要求を受けていれば True"""
+        return self._event.is_set()
+
+    def request(self, reason: str = "manual") -> None:
+        """停止を要求する（シグナルハンドラ以外からも呼べる）。"""
+        if not self._event.is_set():
+            logger.warning(
+                "Shutdown requested (%s): stop dispatching and drain in-flight "
+                "requests within %.0fs. Send the signal again to abort immediately.",
+                reason,
+                self.drain_timeout_s,
+            )
+        self._event.set()
+
+    def _handle_signal(self, signum: int, frame: FrameType | None) -> None:
+        if self._event.is_set():
+            # 2回目のシグナルは待たずに中断する
+            raise KeyboardInterrupt
+        self.request(signal.Signals(signum).name)
+
+    def mark_unfinished(self, job: "LlmJob", status: str) -> None:
+        """未完了ジョブを記録する（status: not_started / failed / abandoned）。"""
+        with self._lock:
+            self._unfinished[job.output_file] = (job, status)
+
+    def mark_finished(self, job: "LlmJob") -> None:
+        """完了したジョブを未完了一覧から外す。"""
+        with self._lock:
+            self._unfinished.pop(job.output_file, None)
+
+    def __enter__(self) -> "GracefulShutdown":
+        self._report_previous_checkpoint()
+        if threading.current_thread() is threading.main_thread():
+            for sig in HANDLED_SIGNALS:
+                self._previous_handlers[sig] = signal.signal(sig, self._handle_signal)
+        return self
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc: BaseException | None,
+        tb: TracebackType | None,
+    ) -> None:
+        for sig, handler in self._previous_handlers.items():
+            signal.signal(sig, handler)  # type: ignore[arg-type]
+        self._previous_handlers.clear()
+        self._write_checkpoint(interrupted=self.requested or exc_type is not None)
+
+    def _report_previous_checkpoint(self) -> None:
+        if self.checkpoint_file is None or not self.checkpoint_file.exists():
+            return
+        try:
+            with open(self.checkpoint_file, encoding="utf-8") as f:
+                previous = json.load(f)
+            logger.info(
+                "Resuming from checkpoint %s (created %s, %s pending jobs); "
+                "completed outputs are skipped.",
+                self.checkpoint_file,
+                previous.get("created_at"),
+                len(previous.get("pending", [])),
+            )
+            if previous.get("argv") != sys.argv[1:]:
+                logger.warning(
+                    "Arguments differ from the checkpointed run: %s",
+                    " ".join(previous.get("argv", [])),
+                )
+        except Exception:
+            logger.exception(f"Failed to read checkpoint: {self.checkpoint_file}")
+
+    def _write_checkpoint(self, interrupted: bool) -> None:
+        if self.checkpoint_file is None:
+            return
+        with self._lock:
+            unfinished = list(self._unfinished.values())
+        if not unfinished:
+            # 全件完了したら古いチェックポイントは不要
+            self.checkpoint_file.unlink(missing_ok=True)
+            return
+
+        checkpoint = {
+            "created_at": datetime.datetime.now(datetime.UTC).isoformat(),
+            "argv": sys.argv[1:],
+            "reason": "interrupted" if interrupted else "failed",
+            "pending": [
+                {
+                    "experiment": job.experiment,
+                    "model": job.config.model_id.name,
+                    "output_file": str(job.output_file),
+                    "status": status,
+                }
+                for job, status in unfinished
+            ],
+        }
+        write_text_atomic(
+            self.checkpoint_file,
+            json.dumps(checkpoint, ensure_ascii=False, indent=2),
+        )
+        logger.info(
+            "Saved checkpoint with %s pending jobs: %s",
+            len(unfinished),
+            self.checkpoint_file,
+        )
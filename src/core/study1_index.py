@@ -0,0 +1,340 @@
+"""Study 1 結果の永続インデックス（SQLite）
+
+`output/{MODEL}/{TARGET}/{PROMPT_TYPE}/temp_*.json` の内容を1ファイル1行で
+SQLiteに保持し、読み込み時には前回から変化したディレクトリだけを再走査する。
+結果は一時ファイル経由の置き換えで書き込まれるため、ファイルの追加・更新・削除は
+いずれも親ディレクトリのmtimeを変える。mtimeが変わったディレクトリ内でのみ
+ファイルごとの (mtime, size) を比較し、変化したJSONだけを再パースする。
+"""
+
+import logging
+import sqlite3
+from collections.abc import Iterator
+from contextlib import closing, contextmanager
+from pathlib import Path
+from typing import Final
+
+import pandas as pd
+
+from core.ingest import ingest_json
+from core.schema import STUDY1_CATEGORIES, compact_frame, concat_compact
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+INDEX_FILENAME: Final = ".study1_index.sqlite"
+# スキーマや抽出内容を変えたら上げる（既存インデックスは作り直される）
+INDEX_VERSION: Final = 1
+RESULT_GLOB: Final = "temp_*.json"
+
+COLUMNS: Final = [
+    "path",
+    "model",
+    "target",
+    "prompt_type",
+    "model_id",
+    "target_value",
+    "prompt_type_value",
+    "temperature",
+    "loop_times",
+    "unique_id",
+    "generated_sentence",
+    "reasoning",
+    "judgment",
+    "procession_time_ms",
+]
+
+_SCHEMA: Final = """
+CREATE TABLE IF NOT EXISTS directories (
+    path TEXT PRIMARY KEY,
+    mtime_ns INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY,
+    directory TEXT NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    ok INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS study1_results (
+    path TEXT PRIMARY KEY,
+    model TEXT NOT NULL,
+    target TEXT NOT NULL,
+    prompt_type TEXT NOT NULL,
+    model_id TEXT,
+    target_value TEXT,
+    prompt_type_value TEXT,
+    temperature REAL,
+    loop_times INTEGER,
+    unique_id TEXT,
+    generated_sentence TEXT,
+    reasoning TEXT,
+    judgment TEXT,
+    procession_time_ms INTEGER
+);
+CREATE INDEX IF NOT EXISTS idx_study1_results_model ON study1_results (model);
+"""
+
+
+def index_path_for(output_dir: Path) -> Path:
+    return output_dir / INDEX_FILENAME
+
+
+@contextmanager
+def _connect(index_path: Path) -> Iterator[sqlite3.Connection]:
+    with closing(sqlite3.connect(index_path, timeout=30)) as conn:
+        version = conn.execute("PRAGMA user_version").fetchone()[0]
+        if version != INDEX_VERSION:
+            conn.executescript(
+                "DROP TABLE IF EXISTS directories;"
+                "DROP TABLE IF EXISTS files;"
+                "DROP TABLE IF EXISTS study1_results;"
+            )
+            conn.execute(f"PRAGMA user_version = {INDEX_VERSION}")
+        conn.executescript(_SCHEMA)
+        with conn:
+            yield conn
+
+
+def _leaf_directories(output_dir: Path) -> Iterator[Path]:
+    """{MODEL}/{TARGET}/{PROMPT_TYPE} の3階層目ディレクトリを列挙する。"""
+    for model_dir in output_dir.iterdir():
+        if not model_dir.is_dir() or model_dir.name.startswith("."):
+            continue
+        for target_dir in model_dir.iterdir():
+            if not target_dir.is_dir():
+                continue
+            for prompt_type_dir in target_dir.iterdir():
+                if prompt_type_dir.is_dir():
+                    yield prompt_type_dir
+
+
+def study1_result_globs(models: set[str]) -> list[str]:
+    """models の Study 1 結果JSONのglob（出力ルートからの相対）"""
+    return [f"{model}/*/*/{RESULT_GLOB}" for model in sorted(models)]
+
+
+def extract_study1_row(json_file: Path, data: dict) -> dict:
+    """Study 1 結果JSON 1件からインデックスの1行を取り出す。"""
+    condition = data["condition"]
+    response = data["response"]
+    prompt_type_dir = json_file.parent
+    return {
+        "path": str(json_file),
+        "model": prompt_type_dir.parent.parent.name,
+        "target": prompt_type_dir.parent.name,
+        "prompt_type": prompt_type_dir.name,
+        "model_id": condition.get("model_id"),
+        "target_value": condition.get("target"),
+        "prompt_type_value": condition.get("prompt_type"),
+        "temperature": float(condition["temperature"]),
+        "loop_times": int(data.get("loop_times", 0)),
+        "unique_id": data.get("unique_id") or json_file.stem,
+        "generated_sentence": response.get("generated_sentence"),
+        "reasoning": response.get("reasoning", ""),
+        "judgment": response["judgment"],
+        "procession_time_ms": data.get("procession_time_ms"),
+    }
+
+
+def _scan_directory(
+    conn: sqlite3.Connection, output_dir: Path, directory: Path
+) -> tuple[list[tuple[Path, int, int]], list[str]]:
+    """ディレクトリ内で (mtime, size) が変わったファイルと、消えたファイルを返す。"""
+    rel_dir = directory.relative_to(output_dir).as_posix()
+    known = {
+        path: (mtime_ns, size)
+        for path, mtime_ns, size in conn.execute(
+            "SELECT path, mtime_ns, size FROM files WHERE directory = ?", (rel_dir,)
+        )
+    }
+
+    changed: list[tuple[Path, int, int]] = []
+    seen: set[str] = set()
+    for json_file in directory.glob(RESULT_GLOB):
+        rel_path = json_file.relative_to(output_dir).as_posix()
+        seen.add(rel_path)
+        stat = json_file.stat()
+        if known.get(rel_path) != (stat.st_mtime_ns, stat.st_size):
+            changed.append((json_file, stat.st_mtime_ns, stat.st_size))
+    removed = [path for path in known if path not in seen]
+    return changed, removed
+
+
+def _apply_changes(
+    conn: sqlite3.Connection,
+    output_dir: Path,
+    changed: list[tuple[Path, int, int]],
+    workers: int | None,
+) -> None:
+    """変更ファイルを並列に読み込み、インデックスの行を置き換える。"""
+    rows, report = ingest_json(
+        (json_file for json_file, _, _ in changed),
+        extract_study1_row,
+        COLUMNS,
+        label="study1",
+        workers=workers,
+    )
+    logger.info(report.summary())
+
+    def relative(path: Path | str) -> str:
+        return Path(path).relative_to(output_dir).as_posix()
+
+    conn.executemany(
+        "DELETE FROM study1_results WHERE path = ?",
+        [(relative(json_file),) for json_file, _, _ in changed],
+    )
+    rows["path"] = rows["path"].map(relative)
+    conn.executemany(
+        f"INSERT INTO study1_results ({', '.join(COLUMNS)}) "
+        f"VALUES ({', '.join('?' for _ in COLUMNS)})",
+        rows[COLUMNS]
+        .astype(object)
+        .where(rows[COLUMNS].notna(), None)
+        .itertuples(index=False, name=None),
+    )
+    failed = set(report.failed)
+    conn.executemany(
+        "INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?)",
+        [
+            (
+                relative(json_file),
+                relative(json_file.parent),
+                mtime_ns,
+                size,
+                0 if json_file in failed else 1,
+            )
+            for json_file, mtime_ns, size in changed
+        ],
+    )
+
+
+def _remove_paths(conn: sqlite3.Connection, paths: list[str]) -> None:
+    conn.executemany("DELETE FROM files WHERE path = ?", [(p,) for p in paths])
+    conn.executemany("DELETE FROM study1_results WHERE path = ?", [(p,) for p in paths])
+
+
+def refresh_study1_index(
+    output_dir: Path, full: bool = False, workers: int | None = None
+) -> Path:
+    """インデックスを差分更新し、インデックスファイルのパスを返す。
+
+    Args:
+        output_dir: Study 1 の出力ルート
+        full: True の場合、ディレクトリのmtimeに関わらず全ファイルを確認する
+        workers: 変更ファイルを読み込むプロセス数（既定: CPUコア数）
+    """
+    index_path = index_path_for(output_dir)
+    changed: list[tuple[Path, int, int]] = []
+    removed: list[str] = []
+    with _connect(index_path) as conn:
+        known_dirs = dict(conn.execute("SELECT path, mtime_ns FROM directories"))
+        current_dirs: dict[str, int] = {}
+        for directory in _leaf_directories(output_dir):
+            rel_dir = directory.relative_to(output_dir).as_posix()
+            # 走査前のmtimeを記録し、走査中の追加は次回に拾う
+            mtime_ns = directory.stat().st_mtime_ns
+            current_dirs[rel_dir] = mtime_ns
+            if not full and known_dirs.get(rel_dir) == mtime_ns:
+                continue
+            dir_changed, dir_removed = _scan_directory(conn, output_dir, directory)
+            changed.extend(dir_changed)
+            removed.extend(dir_removed)
+
+        for rel_dir in set(known_dirs) - set(current_dirs):
+            removed.extend(
+                row[0]
+                for row in conn.execute(
+                    "SELECT path FROM files WHERE directory = ?", (rel_dir,)
+                )
+            )
+            conn.execute("DELETE FROM directories WHERE path = ?", (rel_dir,))
+
+        if changed:
+            _apply_changes(conn, output_dir, changed, workers)
+        _remove_paths(conn, removed)
+        conn.executemany(
+            "INSERT OR REPLACE INTO directories VALUES (?, ?)",
+            [
+                (rel_dir, mtime_ns)
+                for rel_dir, mtime_ns in current_dirs.items()
+                if known_dirs.get(rel_dir) != mtime_ns
+            ],
+        )
+
+    if changed or removed:
+        logger.info(
+            "Study 1 index refreshed: %s updated, %s removed (%s)",
+            len(changed),
+            len(removed),
+            index_path,
+        )
+    return index_path
+
+
+def _select_query(
+    models: set[str] | None, columns: list[str] | None
+) -> tuple[str, list[str]]:
+    selected = columns or COLUMNS
+    unknown = set(selected) - set(COLUMNS)
+    if unknown:
+        raise ValueError(f"Unknown Study 1 index columns: {sorted(unknown)}")
+
+    query = f"SELECT {', '.join(selected)} FROM study1_results"
+    params: list[str] = []
+    if models is not None:
+        query += f" WHERE model IN ({', '.join('?' for _ in models)})"
+        params = sorted(models)
+    query += " ORDER BY path"
+    return query, params
+
+
+def read_study1_index(
+    output_dir: Path,
+    models: set[str] | None = None,
+    columns: list[str] | None = None,
+    refresh: bool = True,
+    chunksize: int = 100_000,
+) -> pd.DataFrame:
+    """インデックスからStudy 1結果を、コンパクトな列型（`core.schema`）で読み込む。
+
+    chunksize 行ずつ読んでは列型を変換するため、文字列の列を全行分持つことはない。
+
+    Args:
+        output_dir: Study 1 の出力ルート
+        models: 読み込むモデルディレクトリ名（Noneなら全件）
+        columns: 読み込む列（Noneなら全列）
+        refresh: 読み込み前に差分更新するかどうか
+        chunksize: 1回に読み込む行数
+    """
+    index_path = (
+        refresh_study1_index(output_dir) if refresh else index_path_for(output_dir)
+    )
+    query, params = _select_query(models, columns)
+    with _connect(index_path) as conn:
+        chunks = [
+            compact_frame(chunk, STUDY1_CATEGORIES)
+            for chunk in pd.read_sql_query(
+                query, conn, params=params, chunksize=chunksize
+            )
+        ]
+    return concat_compact(chunks)
+
+
+def iter_study1_index(
+    output_dir: Path,
+    models: set[str] | None = None,
+    columns: list[str] | None = None,
+    refresh: bool = True,
+    chunksize: int = 1000,
+) -> Iterator[pd.DataFrame]:
+    """read_study1_index と同じ行を、chunksize 行ずつの DataFrame で順に返す。
+
+    列型は変換しない（温度などを Study 2 の条件にそのまま書き出すため）。
+    """
+    index_path = (
+        refresh_study1_index(output_dir) if refresh else index_path_for(output_dir)
+    )
+    query, params = _select_query(models, columns)
+    with _connect(index_path) as conn:
+        yield from pd.read_sql_query(query, conn, params=params, chunksize=chunksize)
@@ -27,6 +27,11 @@ class EnvConfig(BaseModel):
         default=3,
         description="API呼び出し失敗時の最大リトライ回数",
     )
+    max_concurrency: int = Field(
+        default=1,
+        ge=1,
+        description="モデルごとの同時リクエスト数",
+    )
 
     @classmethod
     def from_env(cls) -> "EnvConfig":
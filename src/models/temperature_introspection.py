@@ -157,12 +157,52 @@ class ExperimentAEditedPair(BaseModel):
     unique_id: str = Field(
         default_factory=lambda: str(uuid4()), description="編集ペアの一意ID"
     )
+    unpacked_fallback: bool = Field(
+        default=False,
+        description="packing の呼び出しが失敗し、通常のプロンプトで編集したかどうか",
+    )
     created_at: str = Field(
         default_factory=lambda: datetime.datetime.now(datetime.UTC).isoformat(),
         description="作成日時（ISO 8601形式）",
     )
 
 
+class PackedPromptVariables(BaseModel):
+    """複数の入力を1回の呼び出しにまとめる（packing）ときのプロンプト変数"""
+
+    items: list[dict] = Field(
+        ..., description="item_id と各入力のプロンプト変数をまとめた辞書のリスト"
+    )
+
+
+class PackedTemperaturePredictionItem(TemperaturePredictionResponse):
+    """packing 時の温度予測レスポンス（1件分）"""
+
+    item_id: str = Field(..., description="入力に付けた item_id")
+
+
+class PackedTemperaturePredictionResponse(BaseModel):
+    """packing 時の温度予測レスポンス"""
+
+    items: list[PackedTemperaturePredictionItem] = Field(
+        ..., description="入力ごとの温度予測（item_id ごとに1件）"
+    )
+
+
+class PackedSentenceEditingItem(SentenceEditingResponse):
+    """packing 時の編集レスポンス（1件分）"""
+
+    item_id: str = Field(..., description="入力に付けた item_id")
+
+
+class PackedSentenceEditingResponse(BaseModel):
+    """packing 時の編集レスポンス"""
+
+    items: list[PackedSentenceEditingItem] = Field(
+        ..., description="入力ごとの Info+/Info− 編集（item_id ごとに1件）"
+    )
+
+
 class Study2BlindPromptVariables(BaseModel):
     """追実験D: Blind予測用プロンプト変数"""
 
@@ -193,6 +233,10 @@ class Study2ExperimentalCondition(BaseModel):
     target: Target = Field(..., description="生成時ターゲット")
     source_loop_times: int = Field(..., description="Study 1側のloop回数")
     source_unique_id: str = Field(..., description="Study 1側の一意ID")
+    design_weight: float = Field(
+        default=1.0,
+        description="不完備デザインでの重み（割り当て確率の逆数、全predictorなら1）",
+    )
 
 
 class Study2ExperimentalResult(BaseModel):
@@ -207,6 +251,14 @@ class Study2ExperimentalResult(BaseModel):
         default_factory=lambda: str(uuid4()), description="実験の一意な識別子"
     )
     procession_time_ms: int = Field(..., description="実験の処理時間（ミリ秒単位）")
+    shared_from: str | None = Field(
+        default=None,
+        description="同一入力の予測を共有した場合、実際に呼び出した結果の unique_id",
+    )
+    unpacked_fallback: bool = Field(
+        default=False,
+        description="packing の呼び出しが失敗し、通常のプロンプトで予測したかどうか",
+    )
     created_at: str = Field(
         default_factory=lambda: datetime.datetime.now(datetime.UTC).isoformat(),
         description="実験結果の作成日時（ISO 8601形式）",
@@ -5,15 +5,25 @@
 
 Step 4a: 編集ペア生成（editor_modelでInfo+/Info−を生成）
 Step 4b: 予測実行（各predictor_modelで温度予測）
+
+--pipeline では、編集ペアができるたびにその予測ジョブをキューへ追加し、
+editor と predictor を並行して動かす。
 """
 
 import argparse
-import json
 import logging
-import time
+from collections import Counter
+from functools import partial
 from pathlib import Path
 
-from core.llm import LlmExecution
+from pydantic import BaseModel
+
+from core.ingest import ingest_json
+from core.jobs import LlmJob, is_pending, run_jobs
+from core.packing import Packing, add_packing_arguments
+from core.plan import report_plan
+from core.progress import ProgressTracker
+from core.shutdown import GracefulShutdown
 from models.llm import ModelId
 from models.temperature_introspection import (
     ExperimentAEditedPair,
@@ -21,99 +31,142 @@ from models.temperature_introspection import (
     LLMConfig,
     PromptType,
     SentenceEditingResponse,
-    Study2ConditionType,
-    Study2ExperimentalCondition,
-    Study2ExperimentalResult,
-    Study2PromptVariables,
-    TemperaturePredictionResponse,
 )
+from study.prediction import build_variant_jobs, get_variants, run_variants
 from study.s2 import load_study1_candidates, parse_model_list
+from study.sampling import add_sample_selection_arguments, select_samples_from_args
 
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.INFO)
 
+EXPERIMENT_A_VARIANTS = get_variants(["info_plus", "info_minus"])
 
-def generate_edited_pairs(
+
+def edited_pair_path(output_dir: Path, sample: dict) -> Path:
+    return (
+        output_dir
+        / "edited"
+        / sample["generator_model"].name
+        / f"{sample['source_unique_id']}.json"
+    )
+
+
+def build_edited_pair(
+    sample: dict,
+    response: SentenceEditingResponse,
+    elapsed_ms: int,
+) -> ExperimentAEditedPair:
+    return ExperimentAEditedPair(
+        source_unique_id=sample["source_unique_id"],
+        generator_model=sample["generator_model"],
+        prompt_type=sample["prompt_type"],
+        target=sample["target"],
+        temperature=sample["temperature"],
+        expected_judgment=sample["expected_judgment"],
+        original_sentence=sample["generated_sentence"],
+        info_plus=response.info_plus,
+        info_minus=response.info_minus,
+        loop_times=sample["loop_times"],
+    )
+
+
+def build_edit_jobs(
     samples: list[dict],
     output_dir: Path,
     editor_model: ModelId,
     skip_existing: bool,
-) -> tuple[int, int, int]:
-    """Step 4a: NORMALプロンプトのサンプルからInfo+/Info−編集ペアを生成する。"""
-    saved = 0
-    skipped = 0
-    failed = 0
-
+) -> tuple[list[LlmJob], int]:
+    """Step 4a: NORMALプロンプトのサンプルから未実行の編集ジョブを列挙する。"""
     normal_samples = [s for s in samples if s["prompt_type"] == PromptType.NORMAL]
     logger.info(f"NORMAL samples for editing: {len(normal_samples)}")
 
+    jobs: list[LlmJob] = []
+    skipped = 0
     for sample in normal_samples:
-        out_file = (
-            output_dir
-            / "edited"
-            / sample["generator_model"].name
-            / f"{sample['source_unique_id']}.json"
-        )
-        if skip_existing and out_file.exists():
+        out_file = edited_pair_path(output_dir, sample)
+        if not is_pending(out_file, skip_existing):
             skipped += 1
             continue
-
-        start = time.time()
-        try:
-            model = LlmExecution(
+        jobs.append(
+            LlmJob(
+                experiment="experiment_a/edit",
                 config=LLMConfig(model_id=editor_model, temperature=0.0),
-            )
-            response = model.execute(
-                model_type=SentenceEditingResponse,
                 prompt_name="experiment_a_edit",
+                response_type=SentenceEditingResponse,
                 kwargs=ExperimentAEditPromptVariables(
                     generated_sentence=sample["generated_sentence"],
                 ),
+                output_file=out_file,
+                build_output=partial(build_edited_pair, sample),
             )
-            pair = ExperimentAEditedPair(
-                source_unique_id=sample["source_unique_id"],
-                generator_model=sample["generator_model"],
-                prompt_type=sample["prompt_type"],
-                target=sample["target"],
-                temperature=sample["temperature"],
-                expected_judgment=sample["expected_judgment"],
-                original_sentence=sample["generated_sentence"],
-                info_plus=response.info_plus,
-                info_minus=response.info_minus,
-                loop_times=sample["loop_times"],
-            )
-            out_file.parent.mkdir(parents=True, exist_ok=True)
-            with open(out_file, "w", encoding="utf-8") as f:
-                f.write(pair.model_dump_json(indent=2))
-            saved += 1
-            logger.info(
-                "Edited pair saved: generator=%s source=%s (%.1fs)",
-                sample["generator_model"].name,
-                sample["source_unique_id"],
-                time.time() - start,
-            )
-        except Exception:
-            failed += 1
-            logger.exception(
-                "Failed editing: generator=%s source=%s",
-                sample["generator_model"].name,
-                sample["source_unique_id"],
-            )
+        )
+    return jobs, skipped
 
+
+def generate_edited_pairs(
+    samples: list[dict],
+    output_dir: Path,
+    editor_model: ModelId,
+    skip_existing: bool,
+    progress: ProgressTracker | None = None,
+    shutdown: GracefulShutdown | None = None,
+    packing: Packing | None = None,
+) -> tuple[int, int, int]:
+    """Step 4a: NORMALプロンプトのサンプルからInfo+/Info−編集ペアを生成する。"""
+    jobs, skipped = build_edit_jobs(samples, output_dir, editor_model, skip_existing)
+    if packing is not None:
+        jobs = packing.pack(jobs)
+    if progress is not None:
+        progress.add_jobs(jobs)
+    saved, failed = run_jobs(jobs, progress=progress, shutdown=shutdown)
     return saved, skipped, failed
 
 
+def extract_edited_pair(json_file: Path, data: dict) -> dict:
+    return {"pair": ExperimentAEditedPair(**data)}
+
+
 def load_edited_pairs(edited_dir: Path) -> list[ExperimentAEditedPair]:
     """編集済みペアをディレクトリから読み込む。"""
-    pairs: list[ExperimentAEditedPair] = []
-    for json_file in edited_dir.glob("*/*.json"):
-        try:
-            with open(json_file, encoding="utf-8") as f:
-                data = json.load(f)
-            pairs.append(ExperimentAEditedPair(**data))
-        except Exception:
-            logger.exception(f"Failed to load edited pair: {json_file}")
-    return pairs
+    rows, report = ingest_json(
+        edited_dir.glob("*/*.json"),
+        extract_edited_pair,
+        ["pair"],
+        label="experiment_a/edited",
+    )
+    logger.info(report.summary())
+    return rows["pair"].tolist()
+
+
+def provisional_pair(sample: dict) -> ExperimentAEditedPair:
+    """未編集サンプルの見積り用ペア（元の文で代用）を作る。"""
+    return build_edited_pair(
+        sample,
+        SentenceEditingResponse(
+            info_plus=sample["generated_sentence"],
+            info_minus=sample["generated_sentence"],
+        ),
+        elapsed_ms=0,
+    )
+
+
+def build_prediction_jobs(
+    pairs: list[ExperimentAEditedPair],
+    output_dir: Path,
+    predictor_models: list[ModelId],
+    skip_existing: bool,
+    deduplicate: bool = True,
+) -> tuple[list[LlmJob], int]:
+    """Step 4b: Info+/Info−それぞれの未実行予測ジョブを列挙する。"""
+    jobs, skipped = build_variant_jobs(
+        [pair.model_dump() for pair in pairs],
+        EXPERIMENT_A_VARIANTS,
+        output_dir,
+        predictor_models,
+        skip_existing,
+        deduplicate=deduplicate,
+    )
+    return jobs, sum(skipped.values())
 
 
 def run_predictions(
@@ -121,85 +174,139 @@ def run_predictions(
     output_dir: Path,
     predictor_models: list[ModelId],
     skip_existing: bool,
+    progress: ProgressTracker | None = None,
+    shutdown: GracefulShutdown | None = None,
+    packing: Packing | None = None,
+    deduplicate: bool = True,
 ) -> tuple[int, int, int]:
     """Step 4b: Info+/Info−それぞれに対してpredictor_modelsで温度予測を実行する。"""
-    saved = 0
-    skipped = 0
-    failed = 0
+    counts = run_variants(
+        [pair.model_dump() for pair in pairs],
+        EXPERIMENT_A_VARIANTS,
+        output_dir,
+        predictor_models,
+        skip_existing,
+        progress=progress,
+        shutdown=shutdown,
+        deduplicate=deduplicate,
+        packing=packing,
+    )
+    return (
+        sum(saved for saved, _, _ in counts.values()),
+        sum(skipped for _, skipped, _ in counts.values()),
+        sum(failed for _, _, failed in counts.values()),
+    )
+
 
-    variants: list[tuple[str, Study2ConditionType]] = [
-        ("info_plus", Study2ConditionType.INFO_PLUS),
-        ("info_minus", Study2ConditionType.INFO_MINUS),
+def run_pipelined(
+    samples: list[dict],
+    output_dir: Path,
+    editor_model: ModelId,
+    predictor_models: list[ModelId] | None,
+    skip_existing: bool,
+    progress: ProgressTracker | None = None,
+    shutdown: GracefulShutdown | None = None,
+    packing: Packing | None = None,
+    deduplicate: bool = True,
+) -> Counter[str]:
+    """編集と予測を1つのキュー群で実行し、段階ごとの件数を返す。
+
+    編集ジョブの結果はメモリ上でそのまま予測ジョブに渡す（ディスクへの保存は
+    永続化のためだけに行う）。既存の編集ペアの予測も同じキューに入れる。
+    packing は最初に投入するジョブにだけ適用する（編集後の予測は1件ずつ実行する）。
+    """
+    edit_jobs, edit_skipped = build_edit_jobs(
+        samples, output_dir, editor_model, skip_existing
+    )
+    editing = {job.output_file for job in edit_jobs}
+    edited_dir = output_dir / "edited"
+    pairs = [
+        pair
+        for pair in (load_edited_pairs(edited_dir) if edited_dir.exists() else [])
+        if edited_pair_path(output_dir, pair.model_dump()) not in editing
     ]
+    predictor_models = predictor_models or sorted(
+        {pair.generator_model for pair in pairs}
+        | {sample["generator_model"] for sample in samples},
+        key=lambda x: x.name,
+    )
+    logger.info(f"Edited pairs on disk: {len(pairs)}")
+    logger.info(f"Predictor models: {[m.name for m in predictor_models]}")
 
-    for pair in pairs:
-        for variant_key, condition_type in variants:
-            sentence = pair.info_plus if variant_key == "info_plus" else pair.info_minus
-
-            for predictor in predictor_models:
-                out_file = (
-                    output_dir
-                    / "predictions"
-                    / variant_key
-                    / pair.generator_model.name
-                    / predictor.name
-                    / f"{pair.source_unique_id}.json"
-                )
-                if skip_existing and out_file.exists():
-                    skipped += 1
-                    continue
-
-                start = time.time()
-                try:
-                    model = LlmExecution(
-                        config=LLMConfig(model_id=predictor, temperature=0.0),
-                    )
-                    response = model.execute(
-                        model_type=TemperaturePredictionResponse,
-                        prompt_name="study2_prediction",
-                        kwargs=Study2PromptVariables(
-                            generated_sentence=sentence,
-                            prompt_type=pair.prompt_type.value,
-                            target=pair.target.value,
-                        ),
-                    )
-                    condition = Study2ExperimentalCondition(
-                        condition_type=condition_type,
-                        generator_model_id=pair.generator_model,
-                        predictor_model_id=predictor,
-                        temperature=pair.temperature,
-                        expected_judgment=pair.expected_judgment,
-                        prompt_type=pair.prompt_type,
-                        target=pair.target,
-                        source_loop_times=pair.loop_times,
-                        source_unique_id=pair.source_unique_id,
-                    )
-                    result = Study2ExperimentalResult(
-                        condition=condition,
-                        generated_sentence=sentence,
-                        reasoning=response.reasoning,
-                        predicted_judgment=response.judgment,
-                        is_correct=(
-                            response.judgment == pair.expected_judgment
-                        ),
-                        procession_time_ms=int((time.time() - start) * 1000),
-                    )
-                    out_file.parent.mkdir(parents=True, exist_ok=True)
-                    with open(out_file, "w", encoding="utf-8") as f:
-                        f.write(result.model_dump_json(indent=2))
-                    saved += 1
-                except Exception:
-                    failed += 1
-                    logger.exception(
-                        "Failed prediction: variant=%s generator=%s "
-                        "predictor=%s source=%s",
-                        variant_key,
-                        pair.generator_model.name,
-                        predictor.name,
-                        pair.source_unique_id,
-                    )
+    counts: Counter[str] = Counter(
+        {"editing_skipped": edit_skipped, "predictions_skipped": 0}
+    )
+    prediction_jobs, counts["predictions_skipped"] = build_prediction_jobs(
+        pairs, output_dir, predictor_models, skip_existing, deduplicate
+    )
 
-    return saved, skipped, failed
+    def predict_edited(job: LlmJob, result: BaseModel) -> list[LlmJob]:
+        if not isinstance(result, ExperimentAEditedPair):
+            return []
+        jobs, skipped = build_prediction_jobs(
+            [result], output_dir, predictor_models, skip_existing, deduplicate
+        )
+        counts["predictions_skipped"] += skipped
+        return jobs
+
+    def count_output(job: LlmJob, result: BaseModel | None) -> None:
+        stage = "editing" if job.experiment == "experiment_a/edit" else "predictions"
+        counts[f"{stage}_{'saved' if result is not None else 'failed'}"] += 1
+
+    jobs = edit_jobs + prediction_jobs
+    if packing is not None:
+        jobs = packing.pack(jobs)
+    if progress is not None:
+        progress.add_jobs(jobs)
+    run_jobs(
+        jobs,
+        progress=progress,
+        shutdown=shutdown,
+        on_output=count_output,
+        follow_up=predict_edited,
+    )
+    return counts
+
+
+def plan_experiment_a(
+    samples: list[dict],
+    output_dir: Path,
+    editor_model: ModelId,
+    predictor_models: list[ModelId] | None,
+    skip_existing: bool,
+) -> list[LlmJob]:
+    """編集・予測の未実行ジョブを列挙する（未編集分は元の文で代用）。"""
+    edit_jobs, _ = build_edit_jobs(samples, output_dir, editor_model, skip_existing)
+    edited_dir = output_dir / "edited"
+    pairs = load_edited_pairs(edited_dir) if edited_dir.exists() else []
+    edited_ids = {pair.source_unique_id for pair in pairs}
+    pairs += [
+        provisional_pair(sample)
+        for sample in samples
+        if sample["prompt_type"] == PromptType.NORMAL
+        and sample["source_unique_id"] not in edited_ids
+        and not edited_pair_path(output_dir, sample).exists()
+    ]
+    generator_models = sorted(
+        {pair.generator_model for pair in pairs},
+        key=lambda x: x.name,
+    )
+    prediction_jobs, _ = build_prediction_jobs(
+        pairs, output_dir, predictor_models or generator_models, skip_existing
+    )
+    return edit_jobs + prediction_jobs
+
+
+def select_edit_samples(samples: list[dict], args: argparse.Namespace) -> list[dict]:
+    """編集対象（NORMAL）の候補から、件数上限・呼び出し予算に収まる層化サンプルを選ぶ。"""
+    normal_samples = [s for s in samples if s["prompt_type"] == PromptType.NORMAL]
+    n_predictors = len(
+        args.predictor_models or {s["generator_model"] for s in normal_samples}
+    )
+    # 編集1回 + Info+/Info− それぞれ各predictor 1回ずつ
+    return select_samples_from_args(
+        normal_samples, args, calls_per_sample=lambda sample: 1 + 2 * n_predictors
+    )
 
 
 def parse_args() -> argparse.Namespace:
@@ -248,12 +355,8 @@ def parse_args() -> argparse.Namespace:
         default=None,
         help="Comma-separated predictor model enum names",
     )
-    parser.add_argument(
-        "--limit-samples",
-        type=int,
-        default=None,
-        help="Use only first N candidate samples for quick checks",
-    )
+    add_sample_selection_arguments(parser)
+    add_packing_arguments(parser)
     parser.add_argument(
         "--skip-edit",
         action="store_true",
@@ -264,6 +367,27 @@ def parse_args() -> argparse.Namespace:
         action="store_true",
         help="Overwrite existing outputs",
     )
+    parser.add_argument(
+        "--no-dedup",
+        action="store_true",
+        help="Call the predictor for every pair even if inputs are identical",
+    )
+    parser.add_argument(
+        "--pipeline",
+        action="store_true",
+        help="Start predictions for each edited pair as soon as it is produced",
+    )
+    parser.add_argument(
+        "--plan",
+        action="store_true",
+        help="Only estimate time and cost of pending jobs (no LLM calls)",
+    )
+    parser.add_argument(
+        "--progress-file",
+        type=Path,
+        default=None,
+        help="Progress JSON path (default: <output-dir>/progress.json)",
+    )
     return parser.parse_args()
 
 
@@ -276,6 +400,50 @@ def main() -> None:
 
     skip_existing = not args.force
 
+    if args.plan:
+        samples = []
+        if not args.skip_edit:
+            samples = load_study1_candidates(
+                output_dir=args.study1_output_dir,
+                low_max=args.low_max,
+                high_min=args.high_min,
+                generator_models=args.generator_models,
+            )
+            samples = select_edit_samples(samples, args)
+        jobs = plan_experiment_a(
+            samples=samples,
+            output_dir=args.output_dir,
+            editor_model=args.editor_model,
+            predictor_models=args.predictor_models,
+            skip_existing=skip_existing,
+        )
+        report_plan(
+            Packing(args, args.output_dir).pack(jobs),
+            history_root=args.study1_output_dir,
+        )
+        return
+
+    progress_file = args.progress_file or args.output_dir / "progress.json"
+    checkpoint_file = args.output_dir / "checkpoint.json"
+    with (
+        GracefulShutdown(checkpoint_file) as shutdown,
+        ProgressTracker("experiment_a", progress_file) as progress,
+    ):
+        packing = Packing(args, args.output_dir)
+        run_experiment_a(args, skip_existing, progress, shutdown, packing)
+        packing.run_ab_check(progress, shutdown)
+
+    logger.info("=== Experiment A execution completed ===")
+
+
+def run_experiment_a(
+    args: argparse.Namespace,
+    skip_existing: bool,
+    progress: ProgressTracker,
+    shutdown: GracefulShutdown,
+    packing: Packing | None = None,
+) -> None:
+    """編集（Step 4a）と予測（Step 4b）を順に実行する。"""
     if not args.skip_edit:
         samples = load_study1_candidates(
             output_dir=args.study1_output_dir,
@@ -283,13 +451,37 @@ def main() -> None:
             high_min=args.high_min,
             generator_models=args.generator_models,
         )
-        if args.limit_samples is not None:
-            samples = samples[: args.limit_samples]
+        samples = select_edit_samples(samples, args)
 
         if not samples:
             logger.info("No eligible Study 1 samples found.")
             return
 
+        if args.pipeline:
+            logger.info("=== Experiment A: Editing + Predictions (pipelined) ===")
+            logger.info(f"Candidate samples: {len(samples)}")
+            logger.info(f"Editor model: {args.editor_model.name}")
+            counts = run_pipelined(
+                samples=samples,
+                output_dir=args.output_dir,
+                editor_model=args.editor_model,
+                predictor_models=args.predictor_models,
+                skip_existing=skip_existing,
+                progress=progress,
+                shutdown=shutdown,
+                packing=packing,
+                deduplicate=not args.no_dedup,
+            )
+            for stage in ("editing", "predictions"):
+                logger.info(
+                    "%s saved=%s skipped=%s failed=%s",
+                    stage,
+                    counts[f"{stage}_saved"],
+                    counts[f"{stage}_skipped"],
+                    counts[f"{stage}_failed"],
+                )
+            return
+
         logger.info("=== Experiment A: Step 4a - Editing ===")
         logger.info(f"Candidate samples: {len(samples)}")
         logger.info(f"Editor model: {args.editor_model.name}")
@@ -299,6 +491,9 @@ def main() -> None:
             output_dir=args.output_dir,
             editor_model=args.editor_model,
             skip_existing=skip_existing,
+            progress=progress,
+            shutdown=shutdown,
+            packing=packing,
         )
         logger.info(
             "editing saved=%s skipped=%s failed=%s",
@@ -307,6 +502,9 @@ def main() -> None:
             edit_failed,
         )
 
+    if shutdown.requested:
+        return
+
     # Step 4b: Predictions
     edited_dir = args.output_dir / "edited"
     if not edited_dir.exists():
@@ -333,6 +531,10 @@ def main() -> None:
         output_dir=args.output_dir,
         predictor_models=predictor_models,
         skip_existing=skip_existing,
+        progress=progress,
+        shutdown=shutdown,
+        packing=packing,
+        deduplicate=not args.no_dedup,
     )
     logger.info(
         "predictions saved=%s skipped=%s failed=%s",
@@ -341,8 +543,6 @@ def main() -> None:
         pred_failed,
     )
 
-    logger.info("=== Experiment A execution completed ===")
-
 
 if __name__ == "__main__":
     main()
@@ -6,164 +6,28 @@ Study2の予測プロンプトからラベル情報を隠す（Blind）/入れ
 
 import argparse
 import logging
-import time
+from functools import partial
 from pathlib import Path
 
-from core.llm import LlmExecution
-from models.llm import ModelId
-from models.temperature_introspection import (
-    LLMConfig,
-    PromptType,
-    Study2BlindPromptVariables,
-    Study2ConditionType,
-    Study2PromptVariables,
-    TemperatureJudgment,
-    TemperaturePredictionResponse,
-)
-from study.s2 import (
-    build_result,
-    load_study1_candidates,
-    parse_model_list,
-    result_output_path,
-    save_result,
+from core.jobs import run_jobs
+from core.packing import Packing, add_packing_arguments
+from core.plan import report_plan
+from core.progress import ProgressTracker
+from core.shutdown import GracefulShutdown
+from study.prediction import (
+    VARIANTS,
+    VariantCounts,
+    build_variant_jobs,
+    get_variants,
+    variant_calls,
 )
+from study.s2 import load_study1_candidates, parse_model_list
+from study.sampling import add_sample_selection_arguments, select_samples_from_args
 
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.INFO)
 
-PROMPT_TYPE_SWAP: dict[PromptType, PromptType] = {
-    PromptType.FACTUAL: PromptType.CRAZY,
-    PromptType.CRAZY: PromptType.FACTUAL,
-    PromptType.NORMAL: PromptType.NORMAL,
-}
-
-
-def run_blind_prediction(
-    samples: list[dict],
-    output_dir: Path,
-    predictor_models: list[ModelId],
-    skip_existing: bool,
-) -> tuple[int, int, int]:
-    """Blind条件: prompt_type/targetを隠して予測を実行する。"""
-    saved = 0
-    skipped = 0
-    failed = 0
-
-    for sample in samples:
-        for predictor in predictor_models:
-            preliminary_result = build_result(
-                condition_type=Study2ConditionType.BLIND,
-                sample=sample,
-                predictor_model=predictor,
-                reasoning="",
-                predicted_judgment=TemperatureJudgment.LOW,
-                processing_time_ms=0,
-            )
-            out_file = result_output_path(output_dir, preliminary_result)
-            if skip_existing and out_file.exists():
-                skipped += 1
-                continue
-
-            start = time.time()
-            try:
-                model = LlmExecution(
-                    config=LLMConfig(model_id=predictor, temperature=0.0),
-                )
-                response = model.execute(
-                    model_type=TemperaturePredictionResponse,
-                    prompt_name="study2_prediction_blind",
-                    kwargs=Study2BlindPromptVariables(
-                        generated_sentence=sample["generated_sentence"],
-                    ),
-                )
-                result = build_result(
-                    condition_type=Study2ConditionType.BLIND,
-                    sample=sample,
-                    predictor_model=predictor,
-                    reasoning=response.reasoning,
-                    predicted_judgment=response.judgment,
-                    processing_time_ms=int((time.time() - start) * 1000),
-                )
-                save_result(output_dir, result, skip_existing=False)
-                saved += 1
-            except Exception:
-                failed += 1
-                logger.exception(
-                    "Failed blind prediction: generator=%s predictor=%s source=%s",
-                    sample["generator_model"].name,
-                    predictor.name,
-                    sample["source_unique_id"],
-                )
-
-    return saved, skipped, failed
-
-
-def run_wrong_label_prediction(
-    samples: list[dict],
-    output_dir: Path,
-    predictor_models: list[ModelId],
-    skip_existing: bool,
-) -> tuple[int, int, int]:
-    """Wrong-label条件: prompt_typeを入れ替えて予測を実行する。"""
-    saved = 0
-    skipped = 0
-    failed = 0
-
-    for sample in samples:
-        swapped_prompt_type = PROMPT_TYPE_SWAP[sample["prompt_type"]]
-        if swapped_prompt_type == sample["prompt_type"]:
-            # NORMALはswap対象外
-            continue
-
-        for predictor in predictor_models:
-            preliminary_result = build_result(
-                condition_type=Study2ConditionType.WRONG_LABEL,
-                sample=sample,
-                predictor_model=predictor,
-                reasoning="",
-                predicted_judgment=TemperatureJudgment.LOW,
-                processing_time_ms=0,
-            )
-            out_file = result_output_path(output_dir, preliminary_result)
-            if skip_existing and out_file.exists():
-                skipped += 1
-                continue
-
-            start = time.time()
-            try:
-                model = LlmExecution(
-                    config=LLMConfig(model_id=predictor, temperature=0.0),
-                )
-                response = model.execute(
-                    model_type=TemperaturePredictionResponse,
-                    prompt_name="study2_prediction",
-                    kwargs=Study2PromptVariables(
-                        generated_sentence=sample["generated_sentence"],
-                        prompt_type=swapped_prompt_type.value,
-                        target=sample["target"].value,
-                    ),
-                )
-                result = build_result(
-                    condition_type=Study2ConditionType.WRONG_LABEL,
-                    sample=sample,
-                    predictor_model=predictor,
-                    reasoning=response.reasoning,
-                    predicted_judgment=response.judgment,
-                    processing_time_ms=int((time.time() - start) * 1000),
-                )
-                save_result(output_dir, result, skip_existing=False)
-                saved += 1
-            except Exception:
-                failed += 1
-                logger.exception(
-                    "Failed wrong_label prediction: "
-                    "generator=%s predictor=%s source=%s",
-                    sample["generator_model"].name,
-                    predictor.name,
-                    sample["source_unique_id"],
-                )
-
-    return saved, skipped, failed
+EXPERIMENT_D_VARIANTS = ["blind", "wrong_label"]
 
 
 def parse_args() -> argparse.Namespace:
@@ -206,17 +70,37 @@ def parse_args() -> argparse.Namespace:
         default=None,
         help="Comma-separated predictor model enum names",
     )
+    add_sample_selection_arguments(parser)
+    add_packing_arguments(parser)
     parser.add_argument(
-        "--limit-samples",
-        type=int,
-        default=None,
-        help="Use only first N candidate samples for quick checks",
+        "--variants",
+        type=lambda value: [v.strip() for v in value.split(",") if v.strip()],
+        default=EXPERIMENT_D_VARIANTS,
+        help="Comma-separated prediction variants to run "
+        f"(default: {','.join(EXPERIMENT_D_VARIANTS)}; "
+        f"available: {','.join(VARIANTS)})",
+    )
+    parser.add_argument(
+        "--no-dedup",
+        action="store_true",
+        help="Call the predictor for every sample even if inputs are identical",
     )
     parser.add_argument(
         "--force",
         action="store_true",
         help="Overwrite existing outputs",
     )
+    parser.add_argument(
+        "--plan",
+        action="store_true",
+        help="Only estimate time and cost of pending jobs (no LLM calls)",
+    )
+    parser.add_argument(
+        "--progress-file",
+        type=Path,
+        default=None,
+        help="Progress JSON path (default: <output-dir>/progress.json)",
+    )
     return parser.parse_args()
 
 
@@ -233,8 +117,19 @@ def main() -> None:
         high_min=args.high_min,
         generator_models=args.generator_models,
     )
-    if args.limit_samples is not None:
-        samples = samples[: args.limit_samples]
+    predictor_models = args.predictor_models or sorted(
+        {sample["generator_model"] for sample in samples},
+        key=lambda x: x.name,
+    )
+    variants = get_variants(args.variants)
+    # Blind は全サンプル、Wrong-label は NORMAL 以外のサンプルで各predictor 1回ずつ
+    samples = select_samples_from_args(
+        samples,
+        args,
+        calls_per_sample=partial(
+            variant_calls, variants=variants, predictor_models=predictor_models
+        ),
+    )
 
     if not samples:
         logger.info("No eligible Study 1 samples found.")
@@ -244,40 +139,47 @@ def main() -> None:
         {sample["generator_model"] for sample in samples},
         key=lambda x: x.name,
     )
-    predictor_models = args.predictor_models or generator_models
     skip_existing = not args.force
 
+    # 全 variant のジョブをサンプル1回の走査で作り、1つのキュー群で実行する
+    jobs, skipped = build_variant_jobs(
+        samples,
+        variants,
+        args.output_dir,
+        predictor_models,
+        skip_existing,
+        deduplicate=not args.no_dedup,
+    )
+    packing = Packing(args, args.output_dir)
+    jobs = packing.pack(jobs)
+    if args.plan:
+        report_plan(jobs, history_root=args.study1_output_dir)
+        return
+
     logger.info("=== Experiment D execution start ===")
     logger.info(f"Candidate samples: {len(samples)}")
     logger.info(f"Generator models: {[m.name for m in generator_models]}")
     logger.info(f"Predictor models: {[m.name for m in predictor_models]}")
     logger.info(f"Output dir: {args.output_dir}")
 
-    blind_saved, blind_skipped, blind_failed = run_blind_prediction(
-        samples=samples,
-        output_dir=args.output_dir,
-        predictor_models=predictor_models,
-        skip_existing=skip_existing,
-    )
-    logger.info(
-        "blind saved=%s skipped=%s failed=%s",
-        blind_saved,
-        blind_skipped,
-        blind_failed,
-    )
-
-    wl_saved, wl_skipped, wl_failed = run_wrong_label_prediction(
-        samples=samples,
-        output_dir=args.output_dir,
-        predictor_models=predictor_models,
-        skip_existing=skip_existing,
-    )
-    logger.info(
-        "wrong_label saved=%s skipped=%s failed=%s",
-        wl_saved,
-        wl_skipped,
-        wl_failed,
-    )
+    progress_file = args.progress_file or args.output_dir / "progress.json"
+    checkpoint_file = args.output_dir / "checkpoint.json"
+    with (
+        GracefulShutdown(checkpoint_file) as shutdown,
+        ProgressTracker("experiment_d", progress_file) as progress,
+    ):
+        progress.add_jobs(jobs)
+        counts = VariantCounts()
+        run_jobs(jobs, progress=progress, shutdown=shutdown, on_output=counts)
+        for variant in variants:
+            logger.info(
+                "%s saved=%s skipped=%s failed=%s",
+                variant.name,
+                counts.saved[variant.experiment],
+                skipped[variant.name],
+                counts.failed[variant.experiment],
+            )
+        packing.run_ab_check(progress, shutdown)
 
     logger.info("=== Experiment D execution completed ===")
 
@@ -0,0 +1,465 @@
+"""Study 2 形式の予測条件（variant）と予測ジョブの作成
+
+Study 2（within/across）、追実験A（Info+/Info−）、追実験D（Blind/Wrong-label）の
+予測は、どれも「サンプルの文を（必要なら変形して）predictor に渡し、
+Study2ExperimentalResult として保存する」処理で、違いはプロンプト・プロンプト変数・
+条件タイプ・予測させるpredictor・保存先だけである。これを PredictionVariant として
+VARIANTS に登録し、任意の組み合わせをサンプル1回の走査でジョブにする
+（重複排除・packing・モデルごとの並行実行は `core.jobs` で共通）。
+新しい条件は VARIANTS に1件追加すれば、各ランナーから同じ経路で実行できる。
+"""
+
+import hashlib
+from collections import Counter
+from collections.abc import Callable, Iterable
+from enum import Enum
+from functools import partial
+from pathlib import Path
+
+from pydantic import BaseModel, Field
+
+from core.jobs import LlmJob, OutputIndex, dedupe_jobs, run_jobs
+from core.packing import Packing
+from core.progress import ProgressTracker
+from core.shutdown import GracefulShutdown
+from models.llm import ModelId
+from models.temperature_introspection import (
+    LLMConfig,
+    PromptType,
+    Study2BlindPromptVariables,
+    Study2ConditionType,
+    Study2ExperimentalCondition,
+    Study2ExperimentalResult,
+    Study2PromptVariables,
+    TemperatureJudgment,
+    TemperaturePredictionResponse,
+)
+
+
+def build_result(
+    *,
+    condition_type: Study2ConditionType,
+    sample: dict,
+    predictor_model: ModelId,
+    reasoning: str,
+    predicted_judgment: TemperatureJudgment,
+    processing_time_ms: int,
+    design_weight: float = 1.0,
+) -> Study2ExperimentalResult:
+    condition = Study2ExperimentalCondition(
+        condition_type=condition_type,
+        generator_model_id=sample["generator_model"],
+        predictor_model_id=predictor_model,
+        temperature=sample["temperature"],
+        expected_judgment=sample["expected_judgment"],
+        prompt_type=sample["prompt_type"],
+        target=sample["target"],
+        source_loop_times=sample["loop_times"],
+        source_unique_id=sample["source_unique_id"],
+        design_weight=design_weight,
+    )
+    return Study2ExperimentalResult(
+        condition=condition,
+        generated_sentence=sample["generated_sentence"],
+        reasoning=reasoning,
+        predicted_judgment=predicted_judgment,
+        is_correct=(predicted_judgment == sample["expected_judgment"]),
+        procession_time_ms=processing_time_ms,
+    )
+
+
+def prediction_output_path(
+    output_dir: Path,
+    condition_type: Study2ConditionType,
+    generator_model: ModelId,
+    predictor_model: ModelId,
+    source_unique_id: str,
+) -> Path:
+    return (
+        output_dir
+        / condition_type.value
+        / generator_model.name
+        / predictor_model.name
+        / f"{source_unique_id}.json"
+    )
+
+
+def build_prediction_output(
+    condition_type: Study2ConditionType,
+    sample: dict,
+    predictor_model: ModelId,
+    response: TemperaturePredictionResponse,
+    elapsed_ms: int,
+    design_weight: float = 1.0,
+) -> Study2ExperimentalResult:
+    return build_result(
+        condition_type=condition_type,
+        sample=sample,
+        predictor_model=predictor_model,
+        reasoning=response.reasoning,
+        predicted_judgment=response.judgment,
+        processing_time_ms=elapsed_ms,
+        design_weight=design_weight,
+    )
+
+
+def study2_experiment(condition_type: Study2ConditionType) -> str:
+    return f"study2/{condition_type.value}"
+
+
+def prediction_job(
+    *,
+    experiment: str,
+    condition_type: Study2ConditionType,
+    sample: dict,
+    predictor_model: ModelId,
+    output_dir: Path,
+    prompt_name: str,
+    kwargs: BaseModel,
+    design_weight: float = 1.0,
+) -> LlmJob:
+    """サンプル1件 × predictor 1モデルの予測ジョブを作る。"""
+    return LlmJob(
+        experiment=experiment,
+        config=LLMConfig(model_id=predictor_model, temperature=0.0),
+        prompt_name=prompt_name,
+        response_type=TemperaturePredictionResponse,
+        kwargs=kwargs,
+        output_file=prediction_output_path(
+            output_dir,
+            condition_type,
+            sample["generator_model"],
+            predictor_model,
+            sample["source_unique_id"],
+        ),
+        build_output=partial(
+            build_prediction_output,
+            condition_type,
+            sample,
+            predictor_model,
+            design_weight=design_weight,
+        ),
+    )
+
+
+def sample_hash(sample: dict) -> int:
+    """generator と source_unique_id から決まるサンプルの並び順のキー"""
+    key = f"{ModelId(sample['generator_model']).name}\0{sample['source_unique_id']}"
+    return int.from_bytes(hashlib.blake2b(key.encode(), digest_size=8).digest())
+
+
+class AcrossDesign:
+    """across条件でサンプルに尋ねるpredictorの割り当て
+
+    k を指定すると、generator以外の m 個のpredictorから k 個ずつを巡回的に割り当てる。
+    generatorごとに、サンプルを正解ラベル（LOW → HIGH）とハッシュ（`sample_hash`）の
+    順に並べて巡回するため、各predictorが受け持つ件数の差は generator ごとにも
+    generator × ラベルごとにも1以内になり、割り当ては処理順（バッチ/ストリーミング、
+    window の区切り）によらない。各組の割り当て確率は k/m なので重みは m/k。
+    k が無い場合は全predictor（重み1）。
+    """
+
+    def __init__(
+        self, predictor_models: list[ModelId], k: int | None, samples: list[dict]
+    ) -> None:
+        self.predictor_models = predictor_models
+        self.k = k
+        self.offsets: dict[tuple[ModelId, str], int] = {}
+        if k is None:
+            return
+        label_order = {TemperatureJudgment.LOW: 0, TemperatureJudgment.HIGH: 1}
+        by_generator: dict[ModelId, list[dict]] = {}
+        for sample in samples:
+            by_generator.setdefault(sample["generator_model"], []).append(sample)
+        for generator, group in by_generator.items():
+            group.sort(
+                key=lambda s: (label_order[s["expected_judgment"]], sample_hash(s))
+            )
+            for rank, sample in enumerate(group):
+                self.offsets[(generator, sample["source_unique_id"])] = rank * k
+
+    def assign(self, sample: dict) -> tuple[list[ModelId], float]:
+        generator = sample["generator_model"]
+        others = [model for model in self.predictor_models if model != generator]
+        m = len(others)
+        if self.k is None or self.k >= m:
+            return others, 1.0
+        offset = self.offsets[(generator, sample["source_unique_id"])]
+        return [others[(offset + j) % m] for j in range(self.k)], m / self.k
+
+
+class PredictorSet(str, Enum):
+    """variant ごとに予測させるpredictor"""
+
+    GENERATOR = "generator"  # 文を生成したモデル自身
+    OTHERS = "others"  # generator以外（AcrossDesign で割り当てる）
+    ALL = "all"  # 指定した全predictor
+
+
+class PredictionVariant(BaseModel):
+    """予測条件の定義"""
+
+    model_config = {"arbitrary_types_allowed": True, "frozen": True}
+
+    name: str = Field(..., description="登録名")
+    experiment: str = Field(..., description="ジョブの実験名（進捗・ログの単位）")
+    condition_type: Study2ConditionType = Field(..., description="結果の条件タイプ")
+    prompt_name: str = Field(default="study2_prediction", description="プロンプト名")
+    prompt_variables: Callable[[dict], BaseModel | None] = Field(
+        ..., description="サンプルからプロンプト変数を作る関数（None なら対象外）"
+    )
+    sentence_field: str = Field(
+        default="generated_sentence",
+        description="predictor に渡す文を持つサンプルのキー（結果の生成文にもなる）",
+    )
+    predictors: PredictorSet = Field(
+        default=PredictorSet.ALL, description="予測させるpredictor"
+    )
+    output_subdir: str = Field(
+        default="", description="出力ルートからの保存先（その下は条件タイプごと）"
+    )
+
+    def sample(self, sample: dict) -> dict:
+        """predictor に渡す文を generated_sentence に入れたサンプルを返す。"""
+        if self.sentence_field == "generated_sentence":
+            return sample
+        return {**sample, "generated_sentence": sample[self.sentence_field]}
+
+
+def labeled_prompt_variables(sample: dict) -> Study2PromptVariables:
+    return Study2PromptVariables(
+        generated_sentence=sample["generated_sentence"],
+        prompt_type=sample["prompt_type"].value,
+        target=sample["target"].value,
+    )
+
+
+def blind_prompt_variables(sample: dict) -> Study2BlindPromptVariables:
+    return Study2BlindPromptVariables(generated_sentence=sample["generated_sentence"])
+
+
+PROMPT_TYPE_SWAP: dict[PromptType, PromptType] = {
+    PromptType.FACTUAL: PromptType.CRAZY,
+    PromptType.CRAZY: PromptType.FACTUAL,
+    PromptType.NORMAL: PromptType.NORMAL,
+}
+
+
+def wrong_label_prompt_variables(sample: dict) -> Study2PromptVariables | None:
+    swapped_prompt_type = PROMPT_TYPE_SWAP[sample["prompt_type"]]
+    if swapped_prompt_type == sample["prompt_type"]:
+        # NORMALはswap対象外
+        return None
+    return Study2PromptVariables(
+        generated_sentence=sample["generated_sentence"],
+        prompt_type=swapped_prompt_type.value,
+        target=sample["target"].value,
+    )
+
+
+VARIANTS: dict[str, PredictionVariant] = {
+    variant.name: variant
+    for variant in (
+        PredictionVariant(
+            name="within_model",
+            experiment=study2_experiment(Study2ConditionType.WITHIN_MODEL),
+            condition_type=Study2ConditionType.WITHIN_MODEL,
+            prompt_variables=labeled_prompt_variables,
+            predictors=PredictorSet.GENERATOR,
+        ),
+        PredictionVariant(
+            name="across_model",
+            experiment=study2_experiment(Study2ConditionType.ACROSS_MODEL),
+            condition_type=Study2ConditionType.ACROSS_MODEL,
+            prompt_variables=labeled_prompt_variables,
+            predictors=PredictorSet.OTHERS,
+        ),
+        # 追実験A: 編集ペア（ExperimentAEditedPair の辞書）の Info+/Info− を予測する
+        PredictionVariant(
+            name="info_plus",
+            experiment="experiment_a/info_plus",
+            condition_type=Study2ConditionType.INFO_PLUS,
+            prompt_variables=labeled_prompt_variables,
+            sentence_field="info_plus",
+            output_subdir="predictions",
+        ),
+        PredictionVariant(
+            name="info_minus",
+            experiment="experiment_a/info_minus",
+            condition_type=Study2ConditionType.INFO_MINUS,
+            prompt_variables=labeled_prompt_variables,
+            sentence_field="info_minus",
+            output_subdir="predictions",
+        ),
+        # 追実験D: ラベルを隠す / 入れ替える
+        PredictionVariant(
+            name="blind",
+            experiment="experiment_d/blind",
+            condition_type=Study2ConditionType.BLIND,
+            prompt_name="study2_prediction_blind",
+            prompt_variables=blind_prompt_variables,
+        ),
+        PredictionVariant(
+            name="wrong_label",
+            experiment="experiment_d/wrong_label",
+            condition_type=Study2ConditionType.WRONG_LABEL,
+            prompt_variables=wrong_label_prompt_variables,
+        ),
+    )
+}
+
+
+def get_variants(names: Iterable[str]) -> list[PredictionVariant]:
+    variants: list[PredictionVariant] = []
+    for name in names:
+        try:
+            variants.append(VARIANTS[name])
+        except KeyError as exc:
+            raise ValueError(
+                f"Unknown prediction variant: {name}. Available: {', '.join(VARIANTS)}"
+            ) from exc
+    return variants
+
+
+def variant_calls(
+    sample: dict,
+    variants: list[PredictionVariant],
+    predictor_models: list[ModelId],
+    across_k: int | None = None,
+) -> int:
+    """サンプル1件あたりの予測呼び出し数（重複排除前）"""
+    calls = 0
+    for variant in variants:
+        if variant.prompt_variables(variant.sample(sample)) is None:
+            continue
+        if variant.predictors == PredictorSet.GENERATOR:
+            calls += 1
+        elif variant.predictors == PredictorSet.ALL:
+            calls += len(predictor_models)
+        else:
+            n_others = sum(
+                model != sample["generator_model"] for model in predictor_models
+            )
+            calls += n_others if across_k is None else min(n_others, across_k)
+    return calls
+
+
+def build_variant_jobs(
+    samples: list[dict],
+    variants: list[PredictionVariant],
+    output_dir: Path,
+    predictor_models: list[ModelId],
+    skip_existing: bool,
+    *,
+    deduplicate: bool = True,
+    across_k: int | None = None,
+    across_design: AcrossDesign | None = None,
+    index: OutputIndex | None = None,
+) -> tuple[list[LlmJob], Counter[str]]:
+    """サンプルを1回走査し、全 variant の未実行ジョブとスキップ件数を返す。
+
+    スキップ件数は variant 名ごとに数える。deduplicate の場合、predictorと入力が
+    同じジョブを variant をまたいで1回の呼び出しにまとめる。OTHERS の variant は
+    AcrossDesign で割り当てる。across_design を渡さない場合は samples と across_k から
+    作る（samples の一部ずつ呼ぶ場合は、全サンプルで作ったものを渡す）。既存出力の
+    判定はディレクトリごとの索引で行う。
+    """
+    index = index or OutputIndex()
+    if across_design is None:
+        across_design = AcrossDesign(predictor_models, across_k, samples)
+    jobs: list[LlmJob] = []
+    skipped: Counter[str] = Counter({variant.name: 0 for variant in variants})
+    for sample in samples:
+        generator = sample["generator_model"]
+        for variant in variants:
+            variant_sample = variant.sample(sample)
+            kwargs = variant.prompt_variables(variant_sample)
+            if kwargs is None:
+                continue
+            design_weight = 1.0
+            if variant.predictors == PredictorSet.GENERATOR:
+                predictors = [generator]
+            elif variant.predictors == PredictorSet.ALL:
+                predictors = predictor_models
+            else:
+                predictors, design_weight = across_design.assign(sample)
+
+            variant_dir = output_dir / variant.output_subdir
+            for predictor in predictors:
+                out_file = prediction_output_path(
+                    variant_dir,
+                    variant.condition_type,
+                    generator,
+                    predictor,
+                    sample["source_unique_id"],
+                )
+                if not index.is_pending(out_file, skip_existing):
+                    skipped[variant.name] += 1
+                    continue
+                jobs.append(
+                    prediction_job(
+                        experiment=variant.experiment,
+                        condition_type=variant.condition_type,
+                        sample=variant_sample,
+                        predictor_model=predictor,
+                        output_dir=variant_dir,
+                        prompt_name=variant.prompt_name,
+                        kwargs=kwargs,
+                        design_weight=design_weight,
+                    )
+                )
+    return (dedupe_jobs(jobs) if deduplicate and jobs else jobs), skipped
+
+
+class VariantCounts:
+    """出力1件ごとに、実験名ごとの保存/失敗件数を数える（run_jobs の on_output）。"""
+
+    def __init__(self) -> None:
+        self.saved: Counter[str] = Counter()
+        self.failed: Counter[str] = Counter()
+
+    def __call__(self, job: LlmJob, result: BaseModel | None) -> None:
+        if result is None:
+            self.failed[job.experiment] += 1
+        else:
+            self.saved[job.experiment] += 1
+
+
+def run_variants(
+    samples: list[dict],
+    variants: list[PredictionVariant],
+    output_dir: Path,
+    predictor_models: list[ModelId],
+    skip_existing: bool,
+    *,
+    progress: ProgressTracker | None = None,
+    shutdown: GracefulShutdown | None = None,
+    deduplicate: bool = True,
+    packing: Packing | None = None,
+) -> dict[str, tuple[int, int, int]]:
+    """全 variant の予測を1つのキュー群で実行する。
+
+    variant ごとの (saved, skipped, failed) を返す。
+    """
+    jobs, skipped = build_variant_jobs(
+        samples,
+        variants,
+        output_dir,
+        predictor_models,
+        skip_existing,
+        deduplicate=deduplicate,
+    )
+    if packing is not None:
+        jobs = packing.pack(jobs)
+    if progress is not None:
+        progress.add_jobs(jobs)
+    counts = VariantCounts()
+    run_jobs(jobs, progress=progress, shutdown=shutdown, on_output=counts)
+    return {
+        variant.name: (
+            counts.saved[variant.experiment],
+            skipped[variant.name],
+            counts.failed[variant.experiment],
+        )
+        for variant in variants
+    }
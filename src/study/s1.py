@@ -1,9 +1,15 @@
+import argparse
 import logging
-import time
+from functools import partial
 from itertools import product
 from pathlib import Path
 
-from core.llm import LlmExecution
+from pydantic import BaseModel
+
+from core.jobs import LlmJob, is_pending, run_jobs
+from core.plan import report_plan
+from core.progress import ProgressTracker
+from core.shutdown import GracefulShutdown
 from models.llm import ModelId
 from models.temperature_introspection import (
     PromptType,
@@ -17,47 +23,113 @@ from models.temperature_introspection import (
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.INFO)
 loop_times = range(3)  # 各条件でのループ回数
-temperatures = (round(i * 0.1, 1) for i in range(0, 10 + 1))
+temperatures = tuple(round(i * 0.1, 1) for i in range(0, 10 + 1))
 models = (ModelId.NOVA_2_LITE,)
 output_root_dir = Path.cwd() / "output"
 
-for items in product(models, temperatures, PromptType, Target, loop_times):
-    condition = Study1ExperimentalCondition(
-        model_id=items[0],
-        temperature=items[1],
-        prompt_type=items[2],
-        target=items[3],
-    )
-    logger.info(f"Executing with condition: {condition}")
-    model = LlmExecution(config=condition)
-    output_dir = (
-        output_root_dir
+
+def output_path(
+    output_dir: Path, condition: Study1ExperimentalCondition, loop: int
+) -> Path:
+    return (
+        output_dir
         / condition.model_id.name
         / condition.target.name
         / condition.prompt_type.name
+        / f"temp_{condition.temperature}_loop_{loop}.json"
     )
-    output_dir.mkdir(parents=True, exist_ok=True)
-    output_file = output_dir / f"temp_{condition.temperature}_loop_{items[4]}.json"
-    if output_file.exists():
-        continue
-    start_time = time.time()
-    response = model.execute(
-        model_type=TemperatureIntrospectionResponse,
-        prompt_name="study1",
-        kwargs=Study1PromptVariables(
-            target=condition.target.value,
-            prompt_type=condition.prompt_type.value,
-        ),
-    )
-    end_time = time.time()
-    processing_time = end_time - start_time
-    result = Study1ExperimentalResult(
+
+
+def build_result(
+    condition: Study1ExperimentalCondition,
+    loop: int,
+    response: BaseModel,
+    elapsed_ms: int,
+) -> Study1ExperimentalResult:
+    return Study1ExperimentalResult(
         condition=condition,
         response=response,  # type: ignore
-        loop_times=items[4],
-        procession_time_ms=int(processing_time * 1000),  # ミリ秒単位に変換
+        loop_times=loop,
+        procession_time_ms=elapsed_ms,
+    )
+
+
+def build_study1_jobs(output_dir: Path) -> list[LlmJob]:
+    """未実行のStudy 1条件をジョブとして列挙する。"""
+    jobs: list[LlmJob] = []
+    for items in product(models, temperatures, PromptType, Target, loop_times):
+        condition = Study1ExperimentalCondition(
+            model_id=items[0],
+            temperature=items[1],
+            prompt_type=items[2],
+            target=items[3],
+        )
+        loop = items[4]
+        output_file = output_path(output_dir, condition, loop)
+        if not is_pending(output_file, skip_existing=True):
+            continue
+
+        jobs.append(
+            LlmJob(
+                experiment="study1",
+                config=condition,
+                prompt_name="study1",
+                response_type=TemperatureIntrospectionResponse,
+                kwargs=Study1PromptVariables(
+                    target=condition.target.value,
+                    prompt_type=condition.prompt_type.value,
+                ),
+                output_file=output_file,
+                build_output=partial(build_result, condition, loop),
+            )
+        )
+    return jobs
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Study 1: temperature introspection experiment runner"
+    )
+    parser.add_argument(
+        "--output-dir",
+        type=Path,
+        default=output_root_dir,
+        help="Study 1 results root directory",
+    )
+    parser.add_argument(
+        "--plan",
+        action="store_true",
+        help="Only estimate time and cost of pending jobs (no LLM calls)",
+    )
+    parser.add_argument(
+        "--progress-file",
+        type=Path,
+        default=None,
+        help="Progress JSON path (default: <output-dir>/progress.json)",
     )
+    return parser.parse_args()
+
+
+def main() -> None:
+    logging.basicConfig(level=logging.INFO)
+    args = parse_args()
+
+    jobs = build_study1_jobs(args.output_dir)
+    if args.plan:
+        report_plan(jobs, history_root=args.output_dir)
+        return
+
+    logger.info(f"Pending Study 1 jobs: {len(jobs)}")
+    progress_file = args.progress_file or args.output_dir / "progress.json"
+    checkpoint_file = args.output_dir / "checkpoint.json"
+    with (
+        GracefulShutdown(checkpoint_file) as shutdown,
+        ProgressTracker("study1", progress_file) as progress,
+    ):
+        progress.add_jobs(jobs)
+        saved, failed = run_jobs(jobs, progress=progress, shutdown=shutdown)
+    logger.info(f"study1 saved={saved} failed={failed}")
+
 
-    with open(output_file, "w", encoding="utf-8") as f:
-        f.write(result.model_dump_json(indent=2))
-    logger.info(f"Saved result to {output_file} elapsed_time: {processing_time:.2f}s")
+if __name__ == "__main__":
+    main()
@@ -1,24 +1,49 @@
 import argparse
-import json
+import itertools
 import logging
 import time
+from collections import Counter
+from collections.abc import Callable, Iterable, Iterator
+from functools import partial
 from pathlib import Path
 
+import numpy as np
 import pandas as pd
+from pydantic import BaseModel
 
-from core.llm import LlmExecution
+from core.ingest import ingest_json
+from core.jobs import LlmJob, OutputIndex, is_pending, run_jobs, write_output
+from core.packing import Packing, add_packing_arguments
+from core.plan import report_plan
+from core.progress import ProgressTracker
+from core.schema import (
+    PREDICTION_CATEGORIES,
+    compact_frame,
+    temperature_values,
+    to_categorical,
+)
+from core.shutdown import GracefulShutdown
+from core.study1_index import iter_study1_index, read_study1_index
 from models.llm import ModelId
 from models.temperature_introspection import (
-    LLMConfig,
     PromptType,
     Study2ConditionType,
-    Study2ExperimentalCondition,
     Study2ExperimentalResult,
-    Study2PromptVariables,
     Target,
     TemperatureJudgment,
-    TemperaturePredictionResponse,
 )
+from study.prediction import (
+    AcrossDesign,
+    build_result,
+    build_variant_jobs,
+    get_variants,
+    prediction_output_path,
+    study2_experiment,
+    variant_calls,
+)
+from study.sampling import add_sample_selection_arguments, select_samples_from_args
+from study.study2_aggregates import Study2Aggregates, summarize_buckets
+from study.study2_online import OnlineStudy2Metrics
 
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.INFO)
@@ -52,104 +77,97 @@ def expected_judgment_from_temperature(
     return None
 
 
+ELIGIBLE_JUDGMENTS = {TemperatureJudgment.HIGH.value, TemperatureJudgment.LOW.value}
+STUDY2_VARIANTS = get_variants(["within_model", "across_model"])
+
+# ストリーミング実行で一度にジョブを作るサンプル数と、キュー待ちのジョブ数の上限
+STREAM_WINDOW = 256
+STREAM_MAX_PENDING = 1024
+# オンライン集計（--live-bootstrap）を書き出す間隔（結果の件数）
+LIVE_REPORT_EVERY = 200
+
+
 def load_study1_candidates(
     output_dir: Path,
     low_max: float,
     high_min: float,
     generator_models: list[ModelId] | None,
 ) -> list[dict]:
-    records: list[dict] = []
-    allow_generators = (
-        {model.value for model in generator_models} if generator_models else None
+    """Study 1 結果から予測対象の候補を抽出する（インデックス経由で読み込む）。"""
+    return list(iter_study1_candidates(output_dir, low_max, high_min, generator_models))
+
+
+def iter_study1_candidates(
+    output_dir: Path,
+    low_max: float,
+    high_min: float,
+    generator_models: list[ModelId] | None,
+    chunksize: int = 1000,
+) -> Iterator[dict]:
+    """load_study1_candidates と同じ候補を、インデックスから少しずつ読みながら返す。"""
+    for chunk in iter_study1_index(output_dir, chunksize=chunksize):
+        yield from _candidate_records(
+            chunk, output_dir, low_max, high_min, generator_models
+        )
+
+
+def study1_generator_models(output_dir: Path) -> list[ModelId]:
+    """HIGH/LOW の判定を含む Study 1 結果があるモデルを返す。"""
+    df = read_study1_index(output_dir, columns=["model_id", "judgment"])
+    values = set(df.loc[df["judgment"].isin(ELIGIBLE_JUDGMENTS), "model_id"])
+    return sorted(
+        (MODEL_BY_VALUE[value] for value in values if value in MODEL_BY_VALUE),
+        key=lambda x: x.name,
     )
-    for json_file in output_dir.glob("*/*/*/temp_*.json"):
-        try:
-            with open(json_file, encoding="utf-8") as f:
-                data = json.load(f)
-            condition = data["condition"]
-            response = data["response"]
-            model_value = condition["model_id"]
-            if allow_generators is not None and model_value not in allow_generators:
-                continue
-
-            expected_judgment = expected_judgment_from_temperature(
-                float(condition["temperature"]), low_max=low_max, high_min=high_min
-            )
-            if expected_judgment is None:
-                continue
-
-            model_id = MODEL_BY_VALUE.get(model_value)
-            prompt_type = PROMPT_TYPE_BY_VALUE.get(condition["prompt_type"])
-            target = TARGET_BY_VALUE.get(condition["target"])
-            if model_id is None or prompt_type is None or target is None:
-                continue
-
-            source_judgment = response.get("judgment")
-            if source_judgment not in {
-                TemperatureJudgment.HIGH.value,
-                TemperatureJudgment.LOW.value,
-            }:
-                continue
-
-            records.append(
-                {
-                    "source_path": str(json_file),
-                    "source_unique_id": data.get("unique_id") or json_file.stem,
-                    "generator_model": model_id,
-                    "prompt_type": prompt_type,
-                    "target": target,
-                    "temperature": float(condition["temperature"]),
-                    "loop_times": int(data.get("loop_times", 0)),
-                    "generated_sentence": response["generated_sentence"],
-                    "source_reasoning": response.get("reasoning", ""),
-                    "source_judgment": TemperatureJudgment(source_judgment),
-                    "expected_judgment": expected_judgment,
-                }
-            )
-        except Exception:
-            logger.exception(f"Failed to load {json_file}")
+
+
+def _candidate_records(
+    df: pd.DataFrame,
+    output_dir: Path,
+    low_max: float,
+    high_min: float,
+    generator_models: list[ModelId] | None,
+) -> Iterator[dict]:
+    if generator_models:
+        df = df[df["model_id"].isin({model.value for model in generator_models})]
+    df = df[df["judgment"].isin(ELIGIBLE_JUDGMENTS)]
+
+    for row in df.itertuples(index=False):
+        expected_judgment = expected_judgment_from_temperature(
+            row.temperature, low_max=low_max, high_min=high_min
+        )
+        if expected_judgment is None:
             continue
-    return records
 
+        model_id = MODEL_BY_VALUE.get(row.model_id)
+        prompt_type = PROMPT_TYPE_BY_VALUE.get(row.prompt_type_value)
+        target = TARGET_BY_VALUE.get(row.target_value)
+        if model_id is None or prompt_type is None or target is None:
+            continue
 
-def build_result(
-    *,
-    condition_type: Study2ConditionType,
-    sample: dict,
-    predictor_model: ModelId,
-    reasoning: str,
-    predicted_judgment: TemperatureJudgment,
-    processing_time_ms: int,
-) -> Study2ExperimentalResult:
-    condition = Study2ExperimentalCondition(
-        condition_type=condition_type,
-        generator_model_id=sample["generator_model"],
-        predictor_model_id=predictor_model,
-        temperature=sample["temperature"],
-        expected_judgment=sample["expected_judgment"],
-        prompt_type=sample["prompt_type"],
-        target=sample["target"],
-        source_loop_times=sample["loop_times"],
-        source_unique_id=sample["source_unique_id"],
-    )
-    return Study2ExperimentalResult(
-        condition=condition,
-        generated_sentence=sample["generated_sentence"],
-        reasoning=reasoning,
-        predicted_judgment=predicted_judgment,
-        is_correct=(predicted_judgment == sample["expected_judgment"]),
-        procession_time_ms=processing_time_ms,
-    )
+        yield {
+            "source_path": str(output_dir / row.path),
+            "source_unique_id": row.unique_id,
+            "generator_model": model_id,
+            "prompt_type": prompt_type,
+            "target": target,
+            "temperature": row.temperature,
+            "loop_times": row.loop_times,
+            "generated_sentence": row.generated_sentence,
+            "source_reasoning": row.reasoning,
+            "source_judgment": TemperatureJudgment(row.judgment),
+            "expected_judgment": expected_judgment,
+        }
 
 
 def result_output_path(output_dir: Path, result: Study2ExperimentalResult) -> Path:
     condition = result.condition
-    return (
-        output_dir
-        / condition.condition_type.value
-        / condition.generator_model_id.name
-        / condition.predictor_model_id.name
-        / f"{condition.source_unique_id}.json"
+    return prediction_output_path(
+        output_dir,
+        condition.condition_type,
+        condition.generator_model_id,
+        condition.predictor_model_id,
+        condition.source_unique_id,
     )
 
 
@@ -157,13 +175,14 @@ def save_result(
     output_dir: Path,
     result: Study2ExperimentalResult,
     skip_existing: bool,
+    aggregates: Study2Aggregates | None = None,
 ) -> bool:
     out_file = result_output_path(output_dir, result)
-    if skip_existing and out_file.exists():
+    if not is_pending(out_file, skip_existing):
         return False
-    out_file.parent.mkdir(parents=True, exist_ok=True)
-    with open(out_file, "w", encoding="utf-8") as f:
-        f.write(result.model_dump_json(indent=2))
+    write_output(out_file, result)
+    if aggregates is not None:
+        aggregates.record(out_file, result)
     return True
 
 
@@ -171,6 +190,8 @@ def run_self_reflection(
     samples: list[dict],
     output_dir: Path,
     skip_existing: bool,
+    aggregates: Study2Aggregates | None = None,
+    online: OnlineStudy2Metrics | None = None,
 ) -> tuple[int, int]:
     saved = 0
     skipped = 0
@@ -184,83 +205,124 @@ def run_self_reflection(
             predicted_judgment=sample["source_judgment"],
             processing_time_ms=int((time.time() - start) * 1000),
         )
-        if save_result(output_dir, result, skip_existing=skip_existing):
+        if save_result(
+            output_dir, result, skip_existing=skip_existing, aggregates=aggregates
+        ):
             saved += 1
+            if online is not None:
+                online.add_result(result)
         else:
             skipped += 1
     return saved, skipped
 
 
-def run_prediction(
+def calls_per_sample(
+    sample: dict, predictor_models: list[ModelId], k: int | None
+) -> int:
+    """サンプル1件あたりの予測呼び出し数（within 1回 + across の割り当て数）"""
+    return variant_calls(sample, STUDY2_VARIANTS, predictor_models, across_k=k)
+
+
+def build_study2_jobs(
     samples: list[dict],
     output_dir: Path,
     predictor_models: list[ModelId],
-    condition_type: Study2ConditionType,
     skip_existing: bool,
-) -> tuple[int, int, int]:
-    saved = 0
-    skipped = 0
-    failed = 0
+    deduplicate: bool = True,
+    across_k: int | None = None,
+) -> tuple[list[LlmJob], dict[Study2ConditionType, int]]:
+    """within/across条件をまとめた未実行ジョブと、条件ごとのスキップ件数を返す。
 
-    for sample in samples:
-        generator = sample["generator_model"]
-        if condition_type == Study2ConditionType.WITHIN_MODEL:
-            predictors = [generator]
-        else:
-            predictors = [model for model in predictor_models if model != generator]
-
-        for predictor in predictors:
-            preliminary_result = build_result(
-                condition_type=condition_type,
-                sample=sample,
-                predictor_model=predictor,
-                reasoning="",
-                predicted_judgment=TemperatureJudgment.LOW,
-                processing_time_ms=0,
-            )
-            out_file = result_output_path(output_dir, preliminary_result)
-            if skip_existing and out_file.exists():
-                skipped += 1
-                continue
-
-            start = time.time()
-            try:
-                model = LlmExecution(
-                    config=LLMConfig(model_id=predictor, temperature=0.0),
-                )
-                response = model.execute(
-                    model_type=TemperaturePredictionResponse,
-                    prompt_name="study2_prediction",
-                    kwargs=Study2PromptVariables(
-                        generated_sentence=sample["generated_sentence"],
-                        prompt_type=sample["prompt_type"].value,
-                        target=sample["target"].value,
-                    ),
-                )
-                result = build_result(
-                    condition_type=condition_type,
-                    sample=sample,
-                    predictor_model=predictor,
-                    reasoning=response.reasoning,
-                    predicted_judgment=response.judgment,
-                    processing_time_ms=int((time.time() - start) * 1000),
-                )
-                save_result(output_dir, result, skip_existing=False)
-                saved += 1
-            except Exception:
-                failed += 1
-                logger.exception(
-                    (
-                        "Failed prediction: condition=%s generator=%s "
-                        "predictor=%s source=%s"
-                    ),
-                    condition_type.value,
-                    generator.name,
-                    predictor.name,
-                    sample["source_unique_id"],
-                )
-
-    return saved, skipped, failed
+    重複排除は条件をまたいで行うため、within-modelの予測と同じ入力の
+    across-model予測も1回の呼び出しにまとめられる。
+    """
+    jobs, skipped = build_variant_jobs(
+        samples,
+        STUDY2_VARIANTS,
+        output_dir,
+        predictor_models,
+        skip_existing,
+        deduplicate=deduplicate,
+        across_k=across_k,
+    )
+    return jobs, {
+        variant.condition_type: skipped[variant.name] for variant in STUDY2_VARIANTS
+    }
+
+
+def stream_study2_jobs(
+    samples: Iterable[dict],
+    output_dir: Path,
+    predictor_models: list[ModelId],
+    skip_existing: bool,
+    skipped: Counter[Study2ConditionType],
+    *,
+    deduplicate: bool = True,
+    across_design: AcrossDesign | None = None,
+    on_samples: Callable[[list[dict]], None] | None = None,
+    window: int = STREAM_WINDOW,
+    packing: Packing | None = None,
+) -> Iterator[LlmJob]:
+    """サンプルを window 件ずつ受け取り、within/across の未実行ジョブを順に返す。
+
+    重複排除は window 内で行う（Study 1 の結果はディレクトリ順に並ぶため、
+    同じ入力のサンプルはほとんど同じ window に入る）。スキップ件数は skipped に加算し、
+    on_samples には各 window のサンプルをジョブより先に渡す。packing を渡すと
+    window 内のジョブをまとめて返す。
+    """
+    index = OutputIndex()
+    for batch in itertools.batched(samples, window):
+        window_samples = list(batch)
+        if on_samples is not None:
+            on_samples(window_samples)
+        jobs, window_skipped = build_variant_jobs(
+            window_samples,
+            STUDY2_VARIANTS,
+            output_dir,
+            predictor_models,
+            skip_existing,
+            deduplicate=deduplicate,
+            across_design=across_design,
+            index=index,
+        )
+        for variant in STUDY2_VARIANTS:
+            skipped[variant.condition_type] += window_skipped[variant.name]
+        yield from (packing.pack(jobs) if packing is not None and jobs else jobs)
+
+
+def extract_result_row(
+    json_file: Path,
+    data: dict,
+    *,
+    exclude_targets: set[str] | None,
+    low_max: float,
+    high_min: float,
+) -> dict | None:
+    condition = data["condition"]
+
+    # Exclude specified targets
+    if exclude_targets and condition.get("target") in exclude_targets:
+        return None
+
+    # Re-derive expected_judgment from temperature using new thresholds
+    temperature = float(condition["temperature"])
+    expected = expected_judgment_from_temperature(
+        temperature, low_max=low_max, high_min=high_min
+    )
+    if expected is None:
+        # Gap temperature — skip
+        return None
+
+    # Re-calculate is_correct with new expected judgment
+    predicted = data["predicted_judgment"]
+    return {
+        "condition_type": condition["condition_type"],
+        "generator_model": condition["generator_model_id"],
+        "predictor_model": condition["predictor_model_id"],
+        "expected_judgment": expected.value,
+        "predicted_judgment": predicted,
+        "is_correct": predicted == expected.value,
+    }
 
 
 def collect_result_rows(
@@ -269,44 +331,218 @@ def collect_result_rows(
     exclude_targets: set[str] | None = None,
     low_max: float = 0.2,
     high_min: float = 0.8,
-) -> list[dict]:
-    rows: list[dict] = []
-    for json_file in study2_output_dir.glob("*/*/*/*.json"):
-        try:
-            with open(json_file, encoding="utf-8") as f:
-                data = json.load(f)
-            condition = data["condition"]
-
-            # Exclude specified targets
-            if exclude_targets and condition.get("target") in exclude_targets:
-                continue
-
-            # Re-derive expected_judgment from temperature using new thresholds
-            temperature = float(condition["temperature"])
-            expected = expected_judgment_from_temperature(
-                temperature, low_max=low_max, high_min=high_min
+) -> pd.DataFrame:
+    """閾値と除外ターゲットを適用した Study 2 の結果を列形式で返す。"""
+    return label_prediction_table(
+        load_prediction_table(study2_output_dir),
+        exclude_targets=exclude_targets,
+        low_max=low_max,
+        high_min=high_min,
+    )
+
+
+PREDICTION_TABLE_DTYPES: dict[str, type] = {
+    "condition_type": str,
+    "generator_model": str,
+    "predictor_model": str,
+    "source_unique_id": str,
+    "prompt_type": str,
+    "target": str,
+    "temperature": float,
+    "design_weight": float,
+    "predicted_judgment": str,
+    "recorded_expected_judgment": str,
+}
+PREDICTION_TABLE_COLUMNS = list(PREDICTION_TABLE_DTYPES)
+# 出力ルートからの結果JSONの位置（{condition}/{generator}/{predictor}/*.json）
+PREDICTION_GLOB = "*/*/*/*.json"
+
+
+def extract_prediction_row(json_file: Path, data: dict) -> dict:
+    condition = data["condition"]
+    return {
+        "condition_type": condition["condition_type"],
+        "generator_model": condition["generator_model_id"],
+        "predictor_model": condition["predictor_model_id"],
+        "source_unique_id": condition.get("source_unique_id", ""),
+        "prompt_type": condition.get("prompt_type", ""),
+        "target": condition.get("target", ""),
+        "temperature": float(condition["temperature"]),
+        "design_weight": float(condition.get("design_weight", 1.0)),
+        "predicted_judgment": data["predicted_judgment"],
+        "recorded_expected_judgment": condition.get("expected_judgment", ""),
+    }
+
+
+def load_prediction_table(study2_output_dir: Path) -> pd.DataFrame:
+    """閾値や除外ターゲットを適用せずに、Study 2 の全結果を列形式で読み込む。
+
+    結果JSONは1回だけ読み込み、コンパクトな列型（`core.schema`）で返す。
+    recorded_expected_judgment は実行時の閾値で記録された正解ラベル。
+    追実験Dのように同じ形式の出力ディレクトリにも使える。
+    """
+    rows, report = ingest_json(
+        study2_output_dir.glob(PREDICTION_GLOB),
+        extract_prediction_row,
+        PREDICTION_TABLE_COLUMNS,
+        label=str(study2_output_dir),
+    )
+    logger.info(report.summary())
+    return compact_frame(rows.astype(PREDICTION_TABLE_DTYPES), PREDICTION_CATEGORIES)
+
+
+def label_prediction_table(
+    table: pd.DataFrame,
+    *,
+    exclude_targets: set[str] | None = None,
+    low_max: float = 0.2,
+    high_min: float = 0.8,
+) -> pd.DataFrame:
+    """温度から expected_judgment と is_correct を付け直す。
+
+    除外ターゲットと、閾値の間の温度の行は除く
+    （`expected_judgment_from_temperature` と同じ境界の扱い）。
+    """
+    if exclude_targets:
+        table = table[~table["target"].isin(exclude_targets)]
+    temperature = temperature_values(table["temperature"])
+    expected = np.where(
+        temperature <= low_max,
+        TemperatureJudgment.LOW.value,
+        np.where(temperature >= high_min, TemperatureJudgment.HIGH.value, ""),
+    )
+    labeled = table.assign(
+        expected_judgment=expected,
+        is_correct=table["predicted_judgment"].to_numpy() == expected,
+    )[expected != ""]
+    return labeled.assign(
+        expected_judgment=to_categorical(
+            labeled["expected_judgment"],
+            PREDICTION_CATEGORIES["expected_judgment"],
+        )
+    ).reset_index(drop=True)
+
+
+class LiveSummary:
+    """ジョブの完了に合わせて (condition, predictor) ごとの集計を更新する。
+
+    `run_jobs` の on_output に渡す。バケットの全ジョブが確定した時点で、
+    今回の実行分の集計行をログに出す。aggregates を渡すと、保存された結果を
+    summary.csv 用の累積集計にも加算する。
+
+    ジョブを逐次追加する場合（ストリーミング実行）は closed=False で作って
+    `track` で登録し、全ジョブの投入後に `close` を呼ぶ。
+
+    online を渡すと結果をオンライン集計にも加え、LIVE_REPORT_EVERY 件ごとに
+    `report_online` で書き出す。early_stop_min_pairs を指定すると、
+    early_stop_predictors の全員の Δ(self - within) の符号が決まった時点で
+    shutdown に停止を要求する（未実行のジョブはチェックポイントに残る）。
+    """
+
+    def __init__(
+        self,
+        jobs: Iterable[LlmJob],
+        *,
+        exclude_targets: set[str] | None,
+        low_max: float,
+        high_min: float,
+        aggregates: Study2Aggregates | None = None,
+        closed: bool = True,
+        online: OnlineStudy2Metrics | None = None,
+        shutdown: GracefulShutdown | None = None,
+        early_stop_min_pairs: int | None = None,
+        early_stop_predictors: Iterable[ModelId] = (),
+    ) -> None:
+        self.aggregates = aggregates
+        self.online = online
+        self.shutdown = shutdown
+        self.early_stop_min_pairs = early_stop_min_pairs
+        self.early_stop_predictors = {model.value for model in early_stop_predictors}
+        self.since_report = 0
+        self.extract = partial(
+            extract_result_row,
+            exclude_targets=exclude_targets,
+            low_max=low_max,
+            high_min=high_min,
+        )
+        self.remaining: Counter[tuple[str, str]] = Counter()
+        for job in jobs:
+            self.track(job)
+        self.closed = closed
+        self.correct: Counter[tuple[str, str]] = Counter()
+        self.n_samples: Counter[tuple[str, str]] = Counter()
+        self.saved: Counter[str] = Counter()
+        self.failed: Counter[str] = Counter()
+
+    @staticmethod
+    def key(job: LlmJob) -> tuple[str, str]:
+        return job.experiment, job.config.model_id.value
+
+    def track(self, job: LlmJob) -> None:
+        for output_job in job.expand():
+            self.remaining[self.key(output_job)] += 1
+
+    def close(self) -> None:
+        """全ジョブの登録が済んだことを通知し、確定済みのバケットを出力する。"""
+        self.closed = True
+        for key in sorted(self.remaining):
+            if self.remaining[key] == 0:
+                self.emit(key)
+
+    def __call__(self, job: LlmJob, result: BaseModel | None) -> None:
+        key = self.key(job)
+        self.remaining[key] -= 1
+        if result is None:
+            self.failed[job.experiment] += 1
+        elif isinstance(result, Study2ExperimentalResult):
+            self.saved[job.experiment] += 1
+            if self.aggregates is not None:
+                self.aggregates.record(job.output_file, result)
+            if self.online is not None:
+                self.online.add_result(result)
+                self.since_report += 1
+                if self.since_report >= LIVE_REPORT_EVERY:
+                    self.report_online()
+            row = self.extract(job.output_file, result.model_dump(mode="json"))
+            if row is not None:
+                self.n_samples[key] += 1
+                self.correct[key] += int(row["is_correct"])
+        if self.remaining[key] == 0 and self.closed:
+            self.emit(key)
+
+    def report_online(self, final: bool = False) -> None:
+        """オンライン集計を書き出し、早期停止の条件を満たせば停止を要求する。"""
+        assert self.online is not None
+        self.since_report = 0
+        self.online.write()
+        deltas = self.online.delta_table()
+        if not deltas.empty:
+            logger.info(
+                "Live Δ(self - within) after %s results:\n%s",
+                self.online.n_added,
+                deltas.to_string(index=False),
             )
-            if expected is None:
-                # Gap temperature — skip
-                continue
-
-            # Re-calculate is_correct with new expected judgment
-            predicted = data["predicted_judgment"]
-            is_correct = predicted == expected.value
-
-            rows.append(
-                {
-                    "condition_type": condition["condition_type"],
-                    "generator_model": condition["generator_model_id"],
-                    "predictor_model": condition["predictor_model_id"],
-                    "expected_judgment": expected.value,
-                    "predicted_judgment": predicted,
-                    "is_correct": is_correct,
-                }
+        if final or self.early_stop_min_pairs is None or self.shutdown is None:
+            return
+        decided = self.online.decided(self.early_stop_min_pairs)
+        if self.early_stop_predictors and self.early_stop_predictors <= decided:
+            self.shutdown.request(
+                f"early stop: Δ(self - within) decided for "
+                f"{len(self.early_stop_predictors)} predictors"
             )
-        except Exception:
-            logger.exception(f"Failed to read result file: {json_file}")
-    return rows
+
+    def emit(self, key: tuple[str, str]) -> None:
+        experiment, predictor = key
+        n_samples = self.n_samples[key]
+        accuracy = self.correct[key] / n_samples if n_samples else float("nan")
+        logger.info(
+            "Summary row (this run): predictor_model=%s condition=%s "
+            "accuracy=%.4f n_samples=%s",
+            predictor,
+            experiment,
+            accuracy,
+            n_samples,
+        )
 
 
 def build_summary(
@@ -322,14 +558,13 @@ def build_summary(
         low_max=low_max,
         high_min=high_min,
     )
-    if not rows:
+    if rows.empty:
         return pd.DataFrame(
             columns=["predictor_model", "condition_type", "accuracy", "n_samples"]
         )
 
-    df = pd.DataFrame(rows)
     summary = (
-        df.groupby(["predictor_model", "condition_type"])
+        rows.groupby(["predictor_model", "condition_type"], observed=True)
         .agg(accuracy=("is_correct", "mean"), n_samples=("is_correct", "count"))
         .reset_index()
         .sort_values(["predictor_model", "condition_type"])
@@ -337,6 +572,30 @@ def build_summary(
     return summary
 
 
+def verify_aggregates(aggregates: Study2Aggregates) -> pd.DataFrame:
+    """累積集計を結果JSONからの再集計と比較し、再集計したバケットを返す。"""
+    previous = aggregates.buckets() if aggregates.exists else None
+    rebuilt = aggregates.rebuild()
+    if previous is None:
+        return rebuilt
+
+    key = [column for column in rebuilt.columns if column != "n"]
+    merged = previous.merge(
+        rebuilt, on=key, how="outer", suffixes=("_running", "_rebuilt")
+    ).fillna({"n_running": 0, "n_rebuilt": 0})
+    mismatched = merged[merged["n_running"] != merged["n_rebuilt"]]
+    if mismatched.empty:
+        logger.info("Running aggregates match the full rebuild")
+    else:
+        logger.warning(
+            "Running aggregates differed from the full rebuild in %s buckets "
+            "(replaced by the rebuild):\n%s",
+            len(mismatched),
+            mismatched.to_string(index=False),
+        )
+    return rebuilt
+
+
 def parse_args() -> argparse.Namespace:
     parser = argparse.ArgumentParser(
         description="Study 2: privileged self-access experiment runner"
@@ -383,12 +642,8 @@ def parse_args() -> argparse.Namespace:
             "Default: same set as generators"
         ),
     )
-    parser.add_argument(
-        "--limit-samples",
-        type=int,
-        default=None,
-        help="Use only first N candidate samples for quick checks",
-    )
+    add_sample_selection_arguments(parser)
+    add_packing_arguments(parser)
     parser.add_argument(
         "--exclude-targets",
         type=str,
@@ -398,20 +653,74 @@ def parse_args() -> argparse.Namespace:
     parser.add_argument(
         "--summary-only",
         action="store_true",
-        help="Only regenerate summary.csv from existing JSONs (no LLM calls)",
+        help="Only regenerate summary.csv from the running aggregates (no LLM calls)",
+    )
+    parser.add_argument(
+        "--verify-summary",
+        action="store_true",
+        help="Rebuild the aggregates from all JSONs and check them against the "
+        "running aggregates",
     )
     parser.add_argument(
         "--force",
         action="store_true",
         help="Overwrite existing Study 2 outputs",
     )
+    parser.add_argument(
+        "--no-dedup",
+        action="store_true",
+        help="Call the predictor for every sample even if inputs are identical",
+    )
+    parser.add_argument(
+        "--across-k",
+        type=int,
+        default=None,
+        help="Ask only K rotating predictors per sample in across_model "
+        "(default: every other predictor)",
+    )
+    parser.add_argument(
+        "--stream",
+        action="store_true",
+        help="Stream candidates into the prediction queues instead of loading "
+        "them all first",
+    )
+    parser.add_argument(
+        "--plan",
+        action="store_true",
+        help="Only estimate time and cost of pending jobs (no LLM calls)",
+    )
+    parser.add_argument(
+        "--live-bootstrap",
+        type=int,
+        default=0,
+        help="Poisson bootstrap replicates for live metrics and Δ(self - within) "
+        "CIs written during the run (default: 0, disabled)",
+    )
+    parser.add_argument(
+        "--early-stop-min-pairs",
+        type=int,
+        default=None,
+        help="Stop the run once the 99%% CI of Δ(self - within) excludes 0 for "
+        "every predictor with at least this many pairs (requires --live-bootstrap)",
+    )
+    parser.add_argument(
+        "--progress-file",
+        type=Path,
+        default=None,
+        help="Progress JSON path (default: <study2-output-dir>/progress.json)",
+    )
     return parser.parse_args()
 
 
 def main() -> None:
+    logging.basicConfig(level=logging.INFO)
     args = parse_args()
     if args.low_max >= args.high_min:
         raise ValueError("low-max must be smaller than high-min")
+    if args.across_k is not None and args.across_k < 1:
+        raise ValueError("across-k must be at least 1")
+    if args.early_stop_min_pairs is not None and args.live_bootstrap <= 0:
+        raise ValueError("early-stop-min-pairs requires --live-bootstrap")
 
     exclude_targets = (
         {t.strip() for t in args.exclude_targets.split(",") if t.strip()}
@@ -419,15 +728,57 @@ def main() -> None:
         else None
     )
 
-    if not args.summary_only:
+    with Study2Aggregates(args.study2_output_dir) as aggregates:
+        run_study2(args, exclude_targets, aggregates)
+
+
+def build_online_metrics(
+    args: argparse.Namespace, exclude_targets: set[str] | None
+) -> OnlineStudy2Metrics | None:
+    """--live-bootstrap を指定した場合、既存の結果を加えたオンライン集計を作る。"""
+    if args.live_bootstrap <= 0:
+        return None
+    online = OnlineStudy2Metrics(
+        args.study2_output_dir,
+        exclude_targets=exclude_targets,
+        low_max=args.low_max,
+        high_min=args.high_min,
+        n_replicates=args.live_bootstrap,
+    )
+    online.add_table(load_prediction_table(args.study2_output_dir))
+    logger.info(
+        "Live metrics: %s existing results, %s bootstrap replicates",
+        online.n_added,
+        args.live_bootstrap,
+    )
+    return online
+
+
+def run_study2(
+    args: argparse.Namespace,
+    exclude_targets: set[str] | None,
+    aggregates: Study2Aggregates,
+) -> None:
+    if args.stream and not args.summary_only and not args.plan:
+        run_study2_stream(args, exclude_targets, aggregates)
+    elif not args.summary_only:
         samples = load_study1_candidates(
             output_dir=args.study1_output_dir,
             low_max=args.low_max,
             high_min=args.high_min,
             generator_models=args.generator_models,
         )
-        if args.limit_samples is not None:
-            samples = samples[: args.limit_samples]
+        predictor_models = args.predictor_models or sorted(
+            {sample["generator_model"] for sample in samples},
+            key=lambda x: x.name,
+        )
+        samples = select_samples_from_args(
+            samples,
+            args,
+            calls_per_sample=partial(
+                calls_per_sample, predictor_models=predictor_models, k=args.across_k
+            ),
+        )
 
         if not samples:
             logger.info("No eligible Study 1 samples found.")
@@ -437,58 +788,84 @@ def main() -> None:
             {sample["generator_model"] for sample in samples},
             key=lambda x: x.name,
         )
-        predictor_models = args.predictor_models or generator_models
         skip_existing = not args.force
 
+        jobs, skipped = build_study2_jobs(
+            samples=samples,
+            output_dir=args.study2_output_dir,
+            predictor_models=predictor_models,
+            skip_existing=skip_existing,
+            deduplicate=not args.no_dedup,
+            across_k=args.across_k,
+        )
+        packing = Packing(args, args.study2_output_dir)
+        jobs = packing.pack(jobs)
+        if args.plan:
+            report_plan(jobs, history_root=args.study1_output_dir)
+            return
+
         logger.info("=== Study 2 execution start ===")
         logger.info(f"Study 1 input: {args.study1_output_dir}")
         logger.info(f"Study 2 output: {args.study2_output_dir}")
         logger.info(f"Thresholds: LOW<= {args.low_max}, HIGH>= {args.high_min}")
         logger.info(f"Candidate samples: {len(samples)}")
-        logger.info(
-            f"Generator models: {[model.name for model in generator_models]}"
-        )
-        logger.info(
-            f"Predictor models: {[model.name for model in predictor_models]}"
-        )
+        logger.info(f"Generator models: {[model.name for model in generator_models]}")
+        logger.info(f"Predictor models: {[model.name for model in predictor_models]}")
 
+        # 集計が無いまま書き込むと既存の結果が数えられないため、先に作っておく
+        if not aggregates.exists:
+            aggregates.rebuild()
+        online = build_online_metrics(args, exclude_targets)
         self_saved, self_skipped = run_self_reflection(
             samples=samples,
             output_dir=args.study2_output_dir,
             skip_existing=skip_existing,
+            aggregates=aggregates,
+            online=online,
         )
         logger.info(f"self_reflection saved={self_saved} skipped={self_skipped}")
 
-        within_saved, within_skipped, within_failed = run_prediction(
-            samples=samples,
-            output_dir=args.study2_output_dir,
-            predictor_models=predictor_models,
-            condition_type=Study2ConditionType.WITHIN_MODEL,
-            skip_existing=skip_existing,
-        )
-        logger.info(
-            "within_model saved=%s skipped=%s failed=%s",
-            within_saved,
-            within_skipped,
-            within_failed,
-        )
-
-        across_saved, across_skipped, across_failed = run_prediction(
-            samples=samples,
-            output_dir=args.study2_output_dir,
-            predictor_models=predictor_models,
-            condition_type=Study2ConditionType.ACROSS_MODEL,
-            skip_existing=skip_existing,
-        )
-        logger.info(
-            "across_model saved=%s skipped=%s failed=%s",
-            across_saved,
-            across_skipped,
-            across_failed,
-        )
+        # within/across の全ジョブを1つのキュー群に投入し、各predictorを並行して動かす
+        progress_file = args.progress_file or args.study2_output_dir / "progress.json"
+        checkpoint_file = args.study2_output_dir / "checkpoint.json"
+        with (
+            GracefulShutdown(checkpoint_file) as shutdown,
+            ProgressTracker("study2", progress_file) as progress,
+        ):
+            live_summary = LiveSummary(
+                jobs,
+                exclude_targets=exclude_targets,
+                low_max=args.low_max,
+                high_min=args.high_min,
+                aggregates=aggregates,
+                online=online,
+                shutdown=shutdown,
+                early_stop_min_pairs=args.early_stop_min_pairs,
+                early_stop_predictors=generator_models,
+            )
+            progress.add_jobs(jobs)
+            run_jobs(jobs, progress=progress, shutdown=shutdown, on_output=live_summary)
+            packing.run_ab_check(progress, shutdown)
+        if online is not None:
+            live_summary.report_online(final=True)
+        for condition_type, n_skipped in skipped.items():
+            experiment = study2_experiment(condition_type)
+            logger.info(
+                "%s saved=%s skipped=%s failed=%s",
+                condition_type.value,
+                live_summary.saved[experiment],
+                n_skipped,
+                live_summary.failed[experiment],
+            )
 
-    summary = build_summary(
-        args.study2_output_dir,
+    if args.verify_summary:
+        buckets = verify_aggregates(aggregates)
+    elif aggregates.exists:
+        buckets = aggregates.buckets()
+    else:
+        buckets = aggregates.rebuild()
+    summary = summarize_buckets(
+        buckets,
         exclude_targets=exclude_targets,
         low_max=args.low_max,
         high_min=args.high_min,
@@ -503,5 +880,147 @@ def main() -> None:
     logger.info("=== Study 2 execution completed ===")
 
 
+def run_study2_stream(
+    args: argparse.Namespace,
+    exclude_targets: set[str] | None,
+    aggregates: Study2Aggregates,
+) -> None:
+    """候補の読み込み → ジョブ作成 → 予測 → 保存を、上限付きのキューでつないで実行する。
+
+    最初の候補が見つかった時点で予測を始め、キュー待ちのジョブが
+    STREAM_MAX_PENDING 件に達すると候補の読み込みを止める（バックプレッシャー）。
+    """
+    generator_models = [
+        model
+        for model in study1_generator_models(args.study1_output_dir)
+        if not args.generator_models or model in args.generator_models
+    ]
+    predictor_models = args.predictor_models or generator_models
+    if (
+        args.limit_samples is not None
+        or args.call_budget is not None
+        or args.across_k is not None
+    ):
+        # 層化抽出と across-k の割り当て（サンプルの並び順で巡回する）には全候補が必要
+        logger.info(
+            "Sample selection and --across-k load all candidates before streaming"
+        )
+        selected = load_study1_candidates(
+            output_dir=args.study1_output_dir,
+            low_max=args.low_max,
+            high_min=args.high_min,
+            generator_models=args.generator_models,
+        )
+        selected = select_samples_from_args(
+            selected,
+            args,
+            calls_per_sample=partial(
+                calls_per_sample, predictor_models=predictor_models, k=args.across_k
+            ),
+        )
+        across_design = AcrossDesign(predictor_models, args.across_k, selected)
+        samples: Iterable[dict] = selected
+    else:
+        samples = iter_study1_candidates(
+            output_dir=args.study1_output_dir,
+            low_max=args.low_max,
+            high_min=args.high_min,
+            generator_models=args.generator_models,
+        )
+        # across_k が無い場合は全predictorに尋ねるため、サンプルの並びは使わない
+        across_design = AcrossDesign(predictor_models, None, [])
+    skip_existing = not args.force
+
+    logger.info("=== Study 2 streaming execution start ===")
+    logger.info(f"Study 1 input: {args.study1_output_dir}")
+    logger.info(f"Study 2 output: {args.study2_output_dir}")
+    logger.info(f"Thresholds: LOW<= {args.low_max}, HIGH>= {args.high_min}")
+    logger.info(f"Predictor models: {[model.name for model in predictor_models]}")
+
+    if not aggregates.exists:
+        aggregates.rebuild()
+    online = build_online_metrics(args, exclude_targets)
+    self_counts: Counter[str] = Counter()
+
+    def save_self_reflection(window_samples: list[dict]) -> None:
+        saved, skipped = run_self_reflection(
+            samples=window_samples,
+            output_dir=args.study2_output_dir,
+            skip_existing=skip_existing,
+            aggregates=aggregates,
+            online=online,
+        )
+        self_counts["saved"] += saved
+        self_counts["skipped"] += skipped
+
+    skipped: Counter[Study2ConditionType] = Counter()
+    packing = Packing(args, args.study2_output_dir)
+    progress_file = args.progress_file or args.study2_output_dir / "progress.json"
+    checkpoint_file = args.study2_output_dir / "checkpoint.json"
+    with (
+        GracefulShutdown(checkpoint_file) as shutdown,
+        ProgressTracker("study2", progress_file) as progress,
+    ):
+        live_summary = LiveSummary(
+            [],
+            exclude_targets=exclude_targets,
+            low_max=args.low_max,
+            high_min=args.high_min,
+            aggregates=aggregates,
+            closed=False,
+            online=online,
+            shutdown=shutdown,
+            early_stop_min_pairs=args.early_stop_min_pairs,
+            early_stop_predictors=generator_models,
+        )
+
+        def tracked(jobs: Iterable[LlmJob]) -> Iterator[LlmJob]:
+            for job in jobs:
+                progress.add_jobs([job])
+                live_summary.track(job)
+                yield job
+
+        jobs = stream_study2_jobs(
+            samples,
+            args.study2_output_dir,
+            predictor_models,
+            skip_existing,
+            skipped,
+            deduplicate=not args.no_dedup,
+            across_design=across_design,
+            on_samples=save_self_reflection,
+            packing=packing,
+        )
+        run_jobs(
+            tracked(jobs),
+            progress=progress,
+            shutdown=shutdown,
+            on_output=live_summary,
+            max_pending=STREAM_MAX_PENDING,
+        )
+        packing.run_ab_check(progress, shutdown)
+    live_summary.close()
+    if online is not None:
+        live_summary.report_online(final=True)
+
+    logger.info(
+        "self_reflection saved=%s skipped=%s",
+        self_counts["saved"],
+        self_counts["skipped"],
+    )
+    for condition_type in (
+        Study2ConditionType.WITHIN_MODEL,
+        Study2ConditionType.ACROSS_MODEL,
+    ):
+        experiment = study2_experiment(condition_type)
+        logger.info(
+            "%s saved=%s skipped=%s failed=%s",
+            condition_type.value,
+            live_summary.saved[experiment],
+            skipped[condition_type],
+            live_summary.failed[experiment],
+        )
+
+
 if __name__ == "__main__":
     main()
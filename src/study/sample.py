@@ -22,7 +22,7 @@ response = model.execute(
         prompt_type=PromptType.FACTUAL.value,
     ),
 )
-print(response.model_dump_json())  # type: ignore
+print(response.model_dump_json())
 # response = model.sample(
 #     prompt_name="study1",
 #     kwargs=Study1PromptVariables(
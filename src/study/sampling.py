@@ -0,0 +1,177 @@
+"""予算付きの層化サンプル選択
+
+候補サンプルを generator_model → expected_judgment（ラベル）→ (prompt_type, target)
+の階層で層に分け、各階層で選択数が最も少ない層から順に1件ずつ取り出す。
+主要指標（predictorごとの accuracy と、LOW/HIGH の再現率の平均である
+balanced accuracy）の二項分散を最悪値 p=0.5 と置くと、件数の合計が一定のとき
+CI幅の合計は各群を同数にしたときに最小になる。候補が足りない層の分は
+他の層に回す。
+
+取り出し順はシードだけで決まり、予算を増やすと前の選択を含んだまま増える。
+"""
+
+import argparse
+import logging
+import math
+from collections import Counter, defaultdict
+from collections.abc import Callable
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+STRATUM_LEVELS: tuple[tuple[str, ...], ...] = (
+    ("generator_model",),
+    ("expected_judgment",),
+    ("prompt_type", "target"),
+)
+
+
+def _sort_key(value: object) -> str:
+    return str(getattr(value, "value", value))
+
+
+class _Stratum:
+    """層の木の1ノード。子の層（末端ではサンプル）を選択数の少ない順に取り出す。"""
+
+    def __init__(
+        self,
+        samples: list[dict],
+        levels: tuple[tuple[str, ...], ...],
+        rng: np.random.Generator,
+    ) -> None:
+        self.taken = 0
+        self.remaining = len(samples)
+        # 選択数が同じ層の間の順番（先頭の層ばかりが多くならないようにする）
+        self.priority = rng.random()
+        self.children: list[_Stratum] = []
+        self.items: list[dict] = []
+        if not levels:
+            self.items = [samples[i] for i in rng.permutation(len(samples))]
+            return
+
+        groups: dict[tuple[str, ...], list[dict]] = defaultdict(list)
+        for sample in samples:
+            groups[tuple(_sort_key(sample[field]) for field in levels[0])].append(
+                sample
+            )
+        self.children = [
+            _Stratum(groups[key], levels[1:], rng) for key in sorted(groups)
+        ]
+
+    def pop(self) -> dict:
+        self.taken += 1
+        self.remaining -= 1
+        if not self.children:
+            return self.items[self.taken - 1]
+        child = min(
+            (child for child in self.children if child.remaining),
+            key=lambda child: (child.taken, child.priority),
+        )
+        return child.pop()
+
+
+def select_samples(
+    samples: list[dict],
+    *,
+    max_samples: int | None = None,
+    call_budget: int | None = None,
+    calls_per_sample: Callable[[dict], int] = lambda sample: 1,
+    seed: int = 0,
+) -> list[dict]:
+    """件数上限・呼び出し予算の範囲で層化したサンプルを選ぶ（元の順序を保つ）。
+
+    Args:
+        samples: 候補サンプル（load_study1_candidates の形式）
+        max_samples: 選ぶサンプル数の上限
+        call_budget: LLM呼び出し数の上限
+        calls_per_sample: サンプル1件あたりの呼び出し数
+        seed: 層内の並びと同数の層の順番を決めるシード
+    """
+    if max_samples is None and call_budget is None:
+        return samples
+
+    root = _Stratum(samples, STRATUM_LEVELS, np.random.default_rng(seed))
+    selected: list[dict] = []
+    calls = 0
+    while root.remaining and (max_samples is None or len(selected) < max_samples):
+        sample = root.pop()
+        cost = calls_per_sample(sample)
+        if call_budget is not None and calls + cost > call_budget:
+            break
+        selected.append(sample)
+        calls += cost
+
+    position = {id(sample): i for i, sample in enumerate(samples)}
+    selected.sort(key=lambda sample: position[id(sample)])
+    log_selection(selected, n_candidates=len(samples), calls=calls, seed=seed)
+    return selected
+
+
+def log_selection(
+    selected: list[dict], n_candidates: int, calls: int, seed: int
+) -> None:
+    logger.info(
+        "Selected %s of %s candidate samples (%s calls, seed=%s)",
+        len(selected),
+        n_candidates,
+        calls,
+        seed,
+    )
+    counts = Counter(
+        (sample["generator_model"].name, sample["expected_judgment"].value)
+        for sample in selected
+    )
+    for generator in sorted({generator for generator, _ in counts}):
+        n_low = counts[(generator, "LOW")]
+        n_high = counts[(generator, "HIGH")]
+        # p=0.5 での95%CI半幅（balanced accuracy は各ラベルの再現率の平均）
+        half_width = (
+            1.96 * 0.5 * math.sqrt(0.25 / n_low + 0.25 / n_high)
+            if n_low and n_high
+            else float("nan")
+        )
+        logger.info(
+            "  %s: LOW=%s HIGH=%s (worst-case balanced accuracy CI ±%.3f)",
+            generator,
+            n_low,
+            n_high,
+            half_width,
+        )
+
+
+def add_sample_selection_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument(
+        "--limit-samples",
+        type=int,
+        default=None,
+        help="Use at most N candidate samples, stratified by generator, label, "
+        "prompt type and target",
+    )
+    parser.add_argument(
+        "--call-budget",
+        type=int,
+        default=None,
+        help="Select stratified samples whose LLM calls fit within this budget",
+    )
+    parser.add_argument(
+        "--sample-seed",
+        type=int,
+        default=0,
+        help="Seed for stratified sample selection (default: 0)",
+    )
+
+
+def select_samples_from_args(
+    samples: list[dict],
+    args: argparse.Namespace,
+    calls_per_sample: Callable[[dict], int] = lambda sample: 1,
+) -> list[dict]:
+    return select_samples(
+        samples,
+        max_samples=args.limit_samples,
+        call_budget=args.call_budget,
+        calls_per_sample=calls_per_sample,
+        seed=args.sample_seed,
+    )
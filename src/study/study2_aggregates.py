@@ -0,0 +1,233 @@
+"""Study 2 集計の差分更新
+
+結果を書き込むたびに (predictor, condition, generator, expected, predicted, target,
+temperature) のバケットごとの件数を SQLite に加算しておき、summary.csv を
+結果JSONの再走査なしに作れるようにする。正解ラベルは温度から閾値で決め直すため、
+集計時の閾値・除外ターゲットは書き込み時と異なっていてもよい。
+
+同じ出力ファイルへの上書き（--force）で二重に数えないよう、出力ファイルごとの
+バケットも保持し、変わった場合は元のバケットから差し引く。
+"""
+
+import logging
+import sqlite3
+from pathlib import Path
+from types import TracebackType
+from typing import Final
+
+import numpy as np
+import pandas as pd
+
+from core.ingest import ingest_json
+from models.temperature_introspection import Study2ExperimentalResult
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+AGGREGATES_FILENAME: Final = ".summary_aggregates.sqlite"
+# スキーマを変えたら上げる（既存の集計は結果JSONから作り直される）
+AGGREGATES_VERSION: Final = 1
+
+BUCKET_COLUMNS: Final = [
+    "predictor_model",
+    "condition_type",
+    "generator_model",
+    "expected_judgment",
+    "predicted_judgment",
+    "target",
+    "temperature",
+]
+SUMMARY_COLUMNS: Final = ["predictor_model", "condition_type", "accuracy", "n_samples"]
+
+_BUCKET_SCHEMA: Final = """
+    predictor_model TEXT NOT NULL,
+    condition_type TEXT NOT NULL,
+    generator_model TEXT NOT NULL,
+    expected_judgment TEXT NOT NULL,
+    predicted_judgment TEXT NOT NULL,
+    target TEXT NOT NULL,
+    temperature REAL NOT NULL"""
+_SCHEMA: Final = f"""
+CREATE TABLE IF NOT EXISTS outputs (
+    path TEXT PRIMARY KEY,{_BUCKET_SCHEMA}
+);
+CREATE TABLE IF NOT EXISTS buckets ({_BUCKET_SCHEMA},
+    n INTEGER NOT NULL,
+    PRIMARY KEY ({", ".join(BUCKET_COLUMNS)})
+);
+"""
+
+
+def result_bucket(result: Study2ExperimentalResult) -> tuple:
+    condition = result.condition
+    return (
+        condition.predictor_model_id.value,
+        condition.condition_type.value,
+        condition.generator_model_id.value,
+        condition.expected_judgment.value,
+        result.predicted_judgment.value,
+        condition.target.value,
+        condition.temperature,
+    )
+
+
+def extract_bucket_row(json_file: Path, data: dict) -> dict:
+    condition = data["condition"]
+    return {
+        "path": str(json_file),
+        "predictor_model": condition["predictor_model_id"],
+        "condition_type": condition["condition_type"],
+        "generator_model": condition["generator_model_id"],
+        "expected_judgment": condition["expected_judgment"],
+        "predicted_judgment": data["predicted_judgment"],
+        "target": condition["target"],
+        "temperature": float(condition["temperature"]),
+    }
+
+
+def summarize_buckets(
+    buckets: pd.DataFrame,
+    *,
+    exclude_targets: set[str] | None = None,
+    low_max: float = 0.2,
+    high_min: float = 0.8,
+) -> pd.DataFrame:
+    """バケットの件数から summary.csv と同じ表（build_summary と同じ定義）を作る。"""
+    if exclude_targets:
+        buckets = buckets[~buckets["target"].isin(exclude_targets)]
+    temperature = buckets["temperature"].to_numpy(dtype=float)
+    # expected_judgment_from_temperature と同じ境界の扱い（中間の温度は除外）
+    expected = np.where(
+        temperature <= low_max,
+        "LOW",
+        np.where(temperature >= high_min, "HIGH", ""),
+    )
+    labeled = buckets.assign(
+        correct=(buckets["predicted_judgment"].to_numpy() == expected) * buckets["n"]
+    )[expected != ""]
+    if labeled.empty:
+        return pd.DataFrame(columns=SUMMARY_COLUMNS)
+
+    summary = (
+        labeled.groupby(["predictor_model", "condition_type"])
+        .agg(correct=("correct", "sum"), n_samples=("n", "sum"))
+        .reset_index()
+    )
+    summary = summary[summary["n_samples"] > 0]
+    summary["accuracy"] = summary["correct"] / summary["n_samples"]
+    return (
+        summary[SUMMARY_COLUMNS]
+        .sort_values(["predictor_model", "condition_type"])
+        .reset_index(drop=True)
+    )
+
+
+class Study2Aggregates:
+    """Study 2 のバケット別件数ストア（output/study2/.summary_aggregates.sqlite）"""
+
+    def __init__(self, study2_output_dir: Path) -> None:
+        self.study2_output_dir = study2_output_dir
+        self.path = study2_output_dir / AGGREGATES_FILENAME
+        self._conn: sqlite3.Connection | None = None
+
+    @property
+    def exists(self) -> bool:
+        return self.path.exists()
+
+    def __enter__(self) -> "Study2Aggregates":
+        return self
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc: BaseException | None,
+        tb: TracebackType | None,
+    ) -> None:
+        self.close()
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            version = conn.execute("PRAGMA user_version").fetchone()[0]
+            if version != AGGREGATES_VERSION:
+                conn.executescript(
+                    "DROP TABLE IF EXISTS outputs; DROP TABLE IF EXISTS buckets;"
+                )
+                conn.execute(f"PRAGMA user_version = {AGGREGATES_VERSION}")
+            conn.executescript(_SCHEMA)
+            self._conn = conn
+        return self._conn
+
+    def close(self) -> None:
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    def _relative(self, output_file: Path) -> str:
+        return Path(output_file).relative_to(self.study2_output_dir).as_posix()
+
+    def _add(self, conn: sqlite3.Connection, path: str, bucket: tuple) -> None:
+        previous = conn.execute(
+            f"SELECT {', '.join(BUCKET_COLUMNS)} FROM outputs WHERE path = ?", (path,)
+        ).fetchone()
+        if previous is not None:
+            if tuple(previous) == bucket:
+                return
+            conn.execute(
+                f"UPDATE buckets SET n = n - 1 WHERE "
+                f"{' AND '.join(f'{c} = ?' for c in BUCKET_COLUMNS)}",
+                previous,
+            )
+        conn.execute(
+            f"INSERT OR REPLACE INTO outputs (path, {', '.join(BUCKET_COLUMNS)}) "
+            f"VALUES (?, {', '.join('?' for _ in BUCKET_COLUMNS)})",
+            (path, *bucket),
+        )
+        conn.execute(
+            f"INSERT INTO buckets ({', '.join(BUCKET_COLUMNS)}, n) "
+            f"VALUES ({', '.join('?' for _ in BUCKET_COLUMNS)}, 1) "
+            f"ON CONFLICT ({', '.join(BUCKET_COLUMNS)}) DO UPDATE SET n = n + 1",
+            bucket,
+        )
+
+    def record(self, output_file: Path, result: Study2ExperimentalResult) -> None:
+        """書き込んだ結果1件をバケットに加算する。"""
+        conn = self._connect()
+        with conn:
+            self._add(conn, self._relative(output_file), result_bucket(result))
+
+    def buckets(self) -> pd.DataFrame:
+        """バケットごとの件数を返す。"""
+        conn = self._connect()
+        return pd.read_sql_query(
+            f"SELECT {', '.join(BUCKET_COLUMNS)}, n FROM buckets WHERE n > 0", conn
+        )
+
+    def rebuild(self) -> pd.DataFrame:
+        """結果JSONを全件読み直して集計を作り直し、バケットの件数を返す。"""
+        rows, report = ingest_json(
+            self.study2_output_dir.glob("*/*/*/*.json"),
+            extract_bucket_row,
+            ["path", *BUCKET_COLUMNS],
+            label="study2",
+        )
+        logger.info(report.summary())
+        conn = self._connect()
+        with conn:
+            conn.execute("DELETE FROM outputs")
+            conn.execute("DELETE FROM buckets")
+            rows["path"] = rows["path"].map(self._relative)
+            conn.executemany(
+                f"INSERT INTO outputs (path, {', '.join(BUCKET_COLUMNS)}) "
+                f"VALUES (?, {', '.join('?' for _ in BUCKET_COLUMNS)})",
+                rows[["path", *BUCKET_COLUMNS]].itertuples(index=False, name=None),
+            )
+            conn.execute(
+                f"INSERT INTO buckets SELECT {', '.join(BUCKET_COLUMNS)}, COUNT(*) "
+                f"FROM outputs GROUP BY {', '.join(BUCKET_COLUMNS)}"
+            )
+        logger.info(f"Rebuilt Study 2 aggregates from {len(rows)} results: {self.path}")
+        return self.buckets()
@@ -0,0 +1,313 @@
+"""Study 2 メトリクスのオンライン更新
+
+結果1件ごとに (predictor, condition) の重み付き混同行列と、predictor ごとの
+Δ(self - within) の対を更新し、実行中でも正解率・balanced accuracy・macro-F1・
+多数派ベースライン（`study2_detailed.py` と同じ定義）と Δ を、全結果を
+読み直さずに得られるようにする。
+
+CI は Poisson bootstrap で求める。各結果（Δ では self/within の対）に Poisson(1) の
+重みを n_replicates 組持たせ、複製ごとの集計を同時に加算していく。重みは結果の
+キーと乱数シードから決めるため、結果の到着順や並列度によらず同じ CI になる。
+同じキーの結果が再び来た場合（--force での上書き）は、前の寄与を差し引いてから加える。
+
+実行中に何度も CI を見て止めると誤りの確率が名目より大きくなるため、
+早期停止の判定には表示用（95%）より広い 99% の CI を使う。
+"""
+
+import hashlib
+import logging
+from pathlib import Path
+from typing import Final
+
+import numpy as np
+import pandas as pd
+
+from core.fileio import write_text_atomic
+from core.schema import enum_values, temperature_values
+from models.temperature_introspection import (
+    Study2ConditionType,
+    Study2ExperimentalResult,
+    TemperatureJudgment,
+)
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+LIVE_METRICS_FILENAME: Final = "live_metrics.csv"
+LIVE_DELTA_FILENAME: Final = "live_delta.csv"
+LIVE_CI_LEVEL: Final = 0.95
+EARLY_STOP_LEVEL: Final = 0.99
+RANDOM_SEED: Final = 42
+
+LABELS: Final = enum_values(TemperatureJudgment)
+LABEL_INDEX: Final = {label: i for i, label in enumerate(LABELS)}
+METRIC_COLUMNS: Final = ["accuracy", "balanced_accuracy", "macro_f1"]
+CONDITION_ORDER: Final = ["self_reflection", "within_model", "across_model"]
+SELF = Study2ConditionType.SELF_REFLECTION.value
+WITHIN = Study2ConditionType.WITHIN_MODEL.value
+
+# (condition_type, generator_model, predictor_model, source_unique_id)
+ResultKey = tuple[str, str, str, str]
+
+
+def replicate_weights(key: tuple[str, ...], n_replicates: int, seed: int) -> np.ndarray:
+    """先頭が1（点推定）、残りが key から決まる Poisson(1) の重みの配列を返す。"""
+    digest = hashlib.blake2b("\0".join(key).encode(), digest_size=8).digest()
+    rng = np.random.default_rng([seed, int.from_bytes(digest)])
+    return np.concatenate(([1.0], rng.poisson(1.0, n_replicates)))
+
+
+def confusion_metrics(counts: np.ndarray) -> dict[str, np.ndarray]:
+    """(複製, 正解, 予測) の重み付き件数から、複製ごとのメトリクスを返す。
+
+    sklearn の balanced_accuracy_score / f1_score(average="macro", zero_division=0)
+    と同じく、balanced accuracy は正解に現れたクラス、macro-F1 は正解か予測に
+    現れたクラスで平均する。
+    """
+    total = counts.sum(axis=(1, 2))
+    correct = np.diagonal(counts, axis1=1, axis2=2)
+    n_true = counts.sum(axis=2)
+    n_pred = counts.sum(axis=1)
+    in_true = n_true > 0
+    in_either = (n_true + n_pred) > 0
+    with np.errstate(invalid="ignore", divide="ignore"):
+        recall = np.where(in_true, correct / n_true, 0.0)
+        f1 = np.where(in_either, 2 * correct / (n_true + n_pred), 0.0)
+        return {
+            "accuracy": correct.sum(axis=1) / total,
+            "balanced_accuracy": recall.sum(axis=1) / in_true.sum(axis=1),
+            "macro_f1": f1.sum(axis=1) / in_either.sum(axis=1),
+            "majority_baseline": n_true.max(axis=1) / total,
+        }
+
+
+def percentile_interval(replicates: np.ndarray, level: float) -> tuple[float, float]:
+    """bootstrap 複製の percentile 区間（定義できない複製は除く）"""
+    replicates = replicates[np.isfinite(replicates)]
+    if replicates.size == 0:
+        return float("nan"), float("nan")
+    alpha = (1 - level) / 2
+    lower, upper = np.quantile(replicates, [alpha, 1 - alpha])
+    return float(lower), float(upper)
+
+
+class OnlineStudy2Metrics:
+    """Study 2 の結果を1件ずつ受け取り、メトリクスと Poisson bootstrap CI を更新する。
+
+    正解ラベルは温度から閾値で決め直す（`s2.extract_result_row` と同じ扱い）。
+    除外ターゲットと、閾値の間の温度の結果は数えない。
+    """
+
+    def __init__(
+        self,
+        study2_output_dir: Path,
+        *,
+        exclude_targets: set[str] | None,
+        low_max: float,
+        high_min: float,
+        n_replicates: int,
+        seed: int = RANDOM_SEED,
+    ) -> None:
+        self.study2_output_dir = study2_output_dir
+        self.exclude_targets = exclude_targets or set()
+        self.low_max = low_max
+        self.high_min = high_min
+        self.n_replicates = n_replicates
+        self.seed = seed
+        self.n_added = 0
+        # (predictor, condition) → (複製, 正解, 予測) の重み付き件数
+        self._counts: dict[tuple[str, str], np.ndarray] = {}
+        self._n_samples: dict[tuple[str, str], int] = {}
+        # 結果のキー → (正解, 予測, design_weight)（上書き時に差し引くため）
+        self._results: dict[ResultKey, tuple[int, int, float]] = {}
+        # (predictor, source_unique_id) → condition → 正解したか
+        self._pairs: dict[tuple[str, str], dict[str, bool]] = {}
+        # predictor → 複製ごとの Σ w (self - within) と Σ w
+        self._delta_sums: dict[str, np.ndarray] = {}
+        self._delta_weights: dict[str, np.ndarray] = {}
+        self._n_pairs: dict[str, int] = {}
+
+    def _weights(self, *key: str) -> np.ndarray:
+        return replicate_weights(key, self.n_replicates, self.seed)
+
+    def _expected(self, temperature: float) -> str | None:
+        # expected_judgment_from_temperature と同じ境界の扱い
+        if temperature <= self.low_max:
+            return TemperatureJudgment.LOW.value
+        if temperature >= self.high_min:
+            return TemperatureJudgment.HIGH.value
+        return None
+
+    def add_result(self, result: Study2ExperimentalResult) -> None:
+        """書き込んだ結果1件を加える。"""
+        condition = result.condition
+        if condition.target.value in self.exclude_targets:
+            return
+        expected = self._expected(condition.temperature)
+        if expected is None:
+            return
+        self.add(
+            (
+                condition.condition_type.value,
+                condition.generator_model_id.value,
+                condition.predictor_model_id.value,
+                condition.source_unique_id,
+            ),
+            expected,
+            result.predicted_judgment.value,
+            condition.design_weight,
+        )
+
+    def add_table(self, table: pd.DataFrame) -> None:
+        """`load_prediction_table` の形式の既存結果をまとめて加える。"""
+        if table.empty:
+            return
+        table = table[~table["target"].isin(self.exclude_targets)]
+        temperature = temperature_values(table["temperature"])
+        expected = np.where(
+            temperature <= self.low_max,
+            TemperatureJudgment.LOW.value,
+            np.where(temperature >= self.high_min, TemperatureJudgment.HIGH.value, ""),
+        )
+        table = table.assign(expected_judgment=expected)[expected != ""]
+        columns = [
+            "condition_type",
+            "generator_model",
+            "predictor_model",
+            "source_unique_id",
+            "expected_judgment",
+            "predicted_judgment",
+            "design_weight",
+        ]
+        for *key, label, predicted, weight in zip(
+            *(table[column].tolist() for column in columns), strict=True
+        ):
+            self.add(tuple(key), label, predicted, weight)
+
+    def add(
+        self, key: ResultKey, expected: str, predicted: str, design_weight: float
+    ) -> None:
+        """正解ラベルを付けた結果1件を加える（同じキーの結果は置き換える）。"""
+        condition_type, _, predictor, source_unique_id = key
+        group = (predictor, condition_type)
+        weights = self._weights(*key)
+        if group not in self._counts:
+            shape = (self.n_replicates + 1, len(LABELS), len(LABELS))
+            self._counts[group] = np.zeros(shape)
+            self._n_samples[group] = 0
+        counts = self._counts[group]
+
+        previous = self._results.get(key)
+        if previous is not None:
+            i, j, weight = previous
+            counts[:, i, j] -= weight * weights
+            self._n_samples[group] -= 1
+        i, j = LABEL_INDEX[expected], LABEL_INDEX[predicted]
+        counts[:, i, j] += design_weight * weights
+        self._n_samples[group] += 1
+        self._results[key] = (i, j, design_weight)
+        self.n_added += 1
+
+        if condition_type in (SELF, WITHIN):
+            self._update_pair(
+                predictor, source_unique_id, condition_type, expected == predicted
+            )
+
+    def _update_pair(
+        self, predictor: str, source_unique_id: str, condition_type: str, correct: bool
+    ) -> None:
+        pair = self._pairs.setdefault((predictor, source_unique_id), {})
+        if predictor not in self._delta_sums:
+            self._delta_sums[predictor] = np.zeros(self.n_replicates + 1)
+            self._delta_weights[predictor] = np.zeros(self.n_replicates + 1)
+            self._n_pairs[predictor] = 0
+        weights = self._weights("pair", predictor, source_unique_id)
+        if len(pair) == 2:
+            self._delta_sums[predictor] -= (pair[SELF] - pair[WITHIN]) * weights
+            self._delta_weights[predictor] -= weights
+            self._n_pairs[predictor] -= 1
+        pair[condition_type] = correct
+        if len(pair) == 2:
+            self._delta_sums[predictor] += (pair[SELF] - pair[WITHIN]) * weights
+            self._delta_weights[predictor] += weights
+            self._n_pairs[predictor] += 1
+
+    def metrics_table(self, level: float = LIVE_CI_LEVEL) -> pd.DataFrame:
+        """(predictor, condition) ごとのメトリクスと、その bootstrap CI"""
+        rows = []
+        for (predictor, condition_type), counts in self._counts.items():
+            if self._n_samples[predictor, condition_type] == 0:
+                continue
+            metrics = confusion_metrics(counts)
+            row: dict[str, object] = {
+                "predictor_model": predictor,
+                "condition_type": condition_type,
+            }
+            for name in METRIC_COLUMNS:
+                lower, upper = percentile_interval(metrics[name][1:], level)
+                row[name] = round(float(metrics[name][0]), 4)
+                row[f"{name}_ci_lower"] = round(lower, 4)
+                row[f"{name}_ci_upper"] = round(upper, 4)
+            row["majority_baseline"] = round(float(metrics["majority_baseline"][0]), 4)
+            row["n_samples"] = self._n_samples[predictor, condition_type]
+            rows.append(row)
+        if not rows:
+            return pd.DataFrame(columns=["predictor_model", "condition_type"])
+        table = pd.DataFrame(rows)
+        cond_order_map = {c: i for i, c in enumerate(CONDITION_ORDER)}
+        table["_sort"] = table["condition_type"].map(cond_order_map)
+        return (
+            table.sort_values(["predictor_model", "_sort"])
+            .drop(columns=["_sort"])
+            .reset_index(drop=True)
+        )
+
+    def delta_table(self, level: float = LIVE_CI_LEVEL) -> pd.DataFrame:
+        """predictor ごとの Δ(self - within) と、その bootstrap CI"""
+        rows = []
+        for predictor in sorted(self._delta_sums):
+            n_paired = self._n_pairs[predictor]
+            if n_paired == 0:
+                continue
+            with np.errstate(invalid="ignore", divide="ignore"):
+                deltas = self._delta_sums[predictor] / self._delta_weights[predictor]
+            lower, upper = percentile_interval(deltas[1:], level)
+            rows.append(
+                {
+                    "predictor_model": predictor,
+                    "delta_self_within": round(float(deltas[0]), 4),
+                    "ci_lower": round(lower, 4),
+                    "ci_upper": round(upper, 4),
+                    "n_paired": n_paired,
+                }
+            )
+        return pd.DataFrame(
+            rows,
+            columns=[
+                "predictor_model",
+                "delta_self_within",
+                "ci_lower",
+                "ci_upper",
+                "n_paired",
+            ],
+        )
+
+    def decided(self, min_pairs: int, level: float = EARLY_STOP_LEVEL) -> set[str]:
+        """Δ の CI が 0 を含まなくなった（符号が決まった）predictor を返す。"""
+        deltas = self.delta_table(level)
+        decided = deltas[
+            (deltas["n_paired"] >= min_pairs)
+            & ((deltas["ci_lower"] > 0) | (deltas["ci_upper"] < 0))
+        ]
+        return set(decided["predictor_model"])
+
+    def write(self) -> None:
+        """現在のメトリクスと Δ を live_metrics.csv / live_delta.csv に書き出す。"""
+        write_text_atomic(
+            self.study2_output_dir / LIVE_METRICS_FILENAME,
+            self.metrics_table().to_csv(index=False),
+        )
+        write_text_atomic(
+            self.study2_output_dir / LIVE_DELTA_FILENAME,
+            self.delta_table().to_csv(index=False),
+        )
@@ -1,6 +1,8 @@
 """ブログ用 温度効果 vs プロンプト効果の棒グラフ
 
 モデルごとの確率差を並べて比較する。
+入力に bootstrap CI の列（{効果}_ci_lower / {効果}_ci_upper）があれば
+エラーバーで表示する。
 """
 
 import argparse
@@ -12,6 +14,14 @@ import pandas as pd
 import seaborn as sns
 
 
+def effect_errors(df: pd.DataFrame, column: str) -> np.ndarray | None:
+    """CI の列があれば、エラーバーの長さ（2 × モデル数）を返す。"""
+    lower, upper = f"{column}_ci_lower", f"{column}_ci_upper"
+    if lower not in df.columns or upper not in df.columns:
+        return None
+    return np.vstack([df[column] - df[lower], df[upper] - df[column]]).clip(min=0)
+
+
 def plot_effect_size(df: pd.DataFrame, output_path: Path) -> None:
     """温度効果 vs プロンプト効果の並列棒グラフを描画する。"""
     sns.set_theme(style="whitegrid")
@@ -19,6 +29,9 @@ def plot_effect_size(df: pd.DataFrame, output_path: Path) -> None:
 
     x = np.arange(len(df))
     width = 0.35
+    temp_err = effect_errors(df, "temp_effect")
+    prompt_err = effect_errors(df, "prompt_effect_crazy_vs_factual")
+    error_style = {"ecolor": "#333333", "capsize": 3, "elinewidth": 1}
 
     bars1 = ax.bar(
         x - width / 2,
@@ -27,6 +40,8 @@ def plot_effect_size(df: pd.DataFrame, output_path: Path) -> None:
         label="Temperature effect\n(P[HIGH|t=0.9] − P[HIGH|t=0.1])",
         color="#4393C3",
         edgecolor="white",
+        yerr=temp_err,
+        error_kw=error_style,
     )
     bars2 = ax.bar(
         x + width / 2,
@@ -35,29 +50,23 @@ def plot_effect_size(df: pd.DataFrame, output_path: Path) -> None:
         label="Prompt effect\n(P[HIGH|CRAZY] − P[HIGH|FACTUAL])",
         color="#D6604D",
         edgecolor="white",
+        yerr=prompt_err,
+        error_kw=error_style,
     )
 
-    # Value labels
-    for bar in bars1:
-        height = bar.get_height()
-        ax.text(
-            bar.get_x() + bar.get_width() / 2,
-            height + 0.01,
-            f"{height:.3f}",
-            ha="center",
-            va="bottom",
-            fontsize=8,
-        )
-    for bar in bars2:
-        height = bar.get_height()
-        ax.text(
-            bar.get_x() + bar.get_width() / 2,
-            height + 0.01,
-            f"{height:.3f}",
-            ha="center",
-            va="bottom",
-            fontsize=8,
-        )
+    # Value labels (above the error bar when a CI is shown)
+    for bars, err in [(bars1, temp_err), (bars2, prompt_err)]:
+        for i, bar in enumerate(bars):
+            height = bar.get_height()
+            top = max(height, height + err[1, i]) if err is not None else height
+            ax.text(
+                bar.get_x() + bar.get_width() / 2,
+                top + 0.01,
+                f"{height:.3f}",
+                ha="center",
+                va="bottom",
+                fontsize=8,
+            )
 
     ax.set_xlabel("Model", fontsize=11)
     ax.set_ylabel("Probability Difference", fontsize=11)
@@ -69,7 +78,10 @@ def plot_effect_size(df: pd.DataFrame, output_path: Path) -> None:
     )
     ax.set_xticks(x)
     ax.set_xticklabels(df["model"], rotation=20, ha="right", fontsize=9)
-    ax.set_ylim(-0.05, 1.15)
+    # Extend the axis below zero for negative effects and their CIs
+    lows = [df["temp_effect"], df["prompt_effect_crazy_vs_factual"]]
+    lows += [df[c] for c in df.columns if c.endswith("_ci_lower")]
+    ax.set_ylim(min(-0.05, float(pd.concat(lows).min()) - 0.05), 1.15)
     ax.legend(loc="upper left", fontsize=9)
     ax.axhline(0, color="gray", linewidth=0.8, linestyle="-")
 
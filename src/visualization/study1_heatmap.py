@@ -4,7 +4,6 @@ Figure 2(a)スタイルのヒートマップを生成する。
 """
 
 import argparse
-import json
 import math
 from pathlib import Path
 
@@ -13,6 +12,9 @@ import numpy as np
 import pandas as pd
 import seaborn as sns
 
+from core.schema import temperature_values
+from core.study1_index import read_study1_index
+
 
 def parse_model_names(value: str) -> set[str]:
     return {item.strip() for item in value.split(",") if item.strip()}
@@ -27,52 +29,19 @@ def load_study1_data(output_dir: Path, allowed_models: set[str] | None = None) -
     Returns:
         全実験結果を含むDataFrame
     """
-    records = []
-
-    # モデルディレクトリを走査
-    for model_dir in output_dir.iterdir():
-        if not model_dir.is_dir() or model_dir.name.startswith("."):
-            continue
-
-        model_name = model_dir.name
-        if allowed_models is not None and model_name not in allowed_models:
-            continue
-
-        # ターゲットディレクトリを走査
-        for target_dir in model_dir.iterdir():
-            if not target_dir.is_dir():
-                continue
-
-            target_name = target_dir.name
-
-            # プロンプトタイプディレクトリを走査
-            for prompt_type_dir in target_dir.iterdir():
-                if not prompt_type_dir.is_dir():
-                    continue
-
-                prompt_type = prompt_type_dir.name
-
-                # JSONファイルを走査
-                for json_file in prompt_type_dir.glob("temp_*.json"):
-                    try:
-                        with open(json_file, "r", encoding="utf-8") as f:
-                            data = json.load(f)
-
-                        # データを抽出
-                        record = {
-                            "model": model_name,
-                            "target": target_name,
-                            "prompt_type": prompt_type,
-                            "temperature": data["condition"]["temperature"],
-                            "judgment": data["response"]["judgment"],
-                            "loop_times": data.get("loop_times", 0),
-                        }
-                        records.append(record)
-
-                    except Exception as e:
-                        print(f"Error loading {json_file}: {e}")
-
-    df = pd.DataFrame(records)
+    # 変更のあったディレクトリだけを再読み込みするインデックスを経由する
+    df = read_study1_index(
+        output_dir,
+        models=allowed_models,
+        columns=[
+            "model",
+            "target",
+            "prompt_type",
+            "temperature",
+            "judgment",
+            "loop_times",
+        ],
+    )
     print(f"Loaded {len(df)} records from {len(df['model'].unique())} models")
     return df
 
@@ -99,7 +68,7 @@ def aggregate_high_rate(df: pd.DataFrame) -> dict[str, pd.DataFrame]:
 
         # グループ化して集計
         grouped = (
-            df_model.groupby(["prompt_type", "target", "temperature"])
+            df_model.groupby(["prompt_type", "target", "temperature"], observed=True)
             .agg({"is_high": ["sum", "count"]})
             .reset_index()
         )
@@ -111,7 +80,10 @@ def aggregate_high_rate(df: pd.DataFrame) -> dict[str, pd.DataFrame]:
         grouped["high_rate"] = grouped["high_count"] / grouped["total_count"]
 
         # 行ラベルを作成（例: "FACTUAL - ELEPHANT"）
-        grouped["row_label"] = grouped["prompt_type"] + " - " + grouped["target"]
+        grouped["row_label"] = (
+            grouped["prompt_type"].astype(str) + " - " + grouped["target"].astype(str)
+        )
+        grouped["temperature"] = temperature_values(grouped["temperature"])
 
         # ピボットテーブルを作成
         pivot = grouped.pivot(index="row_label", columns="temperature", values="high_rate")
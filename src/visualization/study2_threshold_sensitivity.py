@@ -0,0 +1,153 @@
+"""Study 2 閾値感度のヒートマップ
+
+study2_threshold_sensitivity.csv から、predictor_model × condition_type ごとに
+(low_max, high_min) のグリッド上のメトリクスをヒートマップで表示する。
+"""
+
+import argparse
+from pathlib import Path
+
+import matplotlib.pyplot as plt
+import pandas as pd
+import seaborn as sns
+
+CONDITION_ORDER = ["self_reflection", "within_model", "across_model"]
+NO_EXCLUSION = "(none)"
+
+
+def plot_threshold_heatmaps(
+    df: pd.DataFrame,
+    metric: str,
+    output_path: Path,
+    reference: tuple[float, float] | None = None,
+) -> None:
+    """predictor × condition のファセットで閾値グリッドのヒートマップを描画する。"""
+    predictors = sorted(df["predictor_model"].unique())
+    conditions = [c for c in CONDITION_ORDER if c in set(df["condition_type"])]
+    low_values = sorted(df["low_max"].unique())
+    high_values = sorted(df["high_min"].unique())
+
+    sns.set_theme(style="white")
+    fig, axes = plt.subplots(
+        len(predictors),
+        len(conditions),
+        figsize=(3.6 * len(conditions), 3.0 * len(predictors)),
+        squeeze=False,
+        sharex=True,
+        sharey=True,
+    )
+    for i, predictor in enumerate(predictors):
+        for j, condition in enumerate(conditions):
+            ax = axes[i][j]
+            subset = df[
+                (df["predictor_model"] == predictor)
+                & (df["condition_type"] == condition)
+            ]
+            pivot = subset.pivot(
+                index="low_max", columns="high_min", values=metric
+            ).reindex(index=low_values, columns=high_values)
+            sns.heatmap(
+                pivot,
+                ax=ax,
+                cmap="RdBu_r",
+                center=0.5,
+                vmin=0.3,
+                vmax=0.7,
+                cbar=j == len(conditions) - 1,
+                cbar_kws={"label": metric},
+                xticklabels=[f"{v:g}" for v in high_values],
+                yticklabels=[f"{v:g}" for v in low_values],
+            )
+            if (
+                reference is not None
+                and reference[0] in low_values
+                and (reference[1] in high_values)
+            ):
+                ax.add_patch(
+                    plt.Rectangle(
+                        (
+                            high_values.index(reference[1]),
+                            low_values.index(reference[0]),
+                        ),
+                        1,
+                        1,
+                        fill=False,
+                        edgecolor="black",
+                        linewidth=1.5,
+                    )
+                )
+            if i == 0:
+                ax.set_title(condition, fontsize=11, fontweight="bold")
+            ax.set_xlabel("high_min" if i == len(predictors) - 1 else "")
+            ax.set_ylabel(f"{predictor}\nlow_max" if j == 0 else "", fontsize=8)
+
+    exclude = df["exclude_targets"].iloc[0]
+    fig.suptitle(
+        f"Study 2: {metric} by label thresholds (excluded targets: {exclude})",
+        fontsize=13,
+        fontweight="bold",
+    )
+    plt.tight_layout()
+
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    png_path = output_path.with_suffix(".png")
+    pdf_path = output_path.with_suffix(".pdf")
+    fig.savefig(png_path, dpi=300, bbox_inches="tight")
+    fig.savefig(pdf_path, bbox_inches="tight")
+    plt.close(fig)
+
+    print(f"Saved: {png_path}")
+    print(f"Saved: {pdf_path}")
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        description="Plot Study 2 threshold sensitivity heatmaps"
+    )
+    parser.add_argument(
+        "--input",
+        type=Path,
+        default=Path.cwd() / "output" / "analysis" / "study2_threshold_sensitivity.csv",
+        help="Threshold sensitivity CSV",
+    )
+    parser.add_argument(
+        "--output",
+        type=Path,
+        default=Path.cwd() / "output" / "figures" / "study2_threshold_sensitivity",
+        help="Output path without extension",
+    )
+    parser.add_argument(
+        "--metric",
+        choices=["accuracy", "balanced_accuracy"],
+        default="balanced_accuracy",
+        help="Metric to plot",
+    )
+    parser.add_argument(
+        "--exclude-targets",
+        type=str,
+        default="像",
+        help=f"Exclusion set to plot, as in the CSV (use '{NO_EXCLUSION}' for none)",
+    )
+    parser.add_argument(
+        "--reference",
+        type=str,
+        default="0.2,0.8",
+        help="low_max,high_min cell to outline (default: 0.2,0.8)",
+    )
+    return parser.parse_args()
+
+
+def main() -> None:
+    args = parse_args()
+    df = pd.read_csv(args.input)
+    df = df[df["exclude_targets"] == args.exclude_targets]
+    if df.empty:
+        print(f"No rows for exclude_targets={args.exclude_targets!r}")
+        return
+
+    low_max, high_min = (float(v) for v in args.reference.split(","))
+    plot_threshold_heatmaps(df, args.metric, args.output, reference=(low_max, high_min))
+
+
+if __name__ == "__main__":
+    main()